@@ -0,0 +1 @@
+"""Micro-benchmarks of hot paths, run with python -m benchmarks.<name>."""
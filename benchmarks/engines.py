@@ -0,0 +1,187 @@
+"""
+Compare the threads and asyncio engines of the processor against local stub servers of Strava and Notion.
+
+Each stub request answers after a fixed latency. Every event belongs to its own athlete and integration, so that
+the Notion rate limit does not serialize the writes.
+Both engines run at each concurrency of the sweep : the number of threads per stage of the threads engine
+(PROCESS_EVENTS_MAX_WORKERS) equals the number of tasks in flight per stage of the asyncio engine
+(PROCESS_EVENTS_MAX_CONCURRENCY).
+
+Usage : python -m benchmarks.engines [--events 200] [--latency 0.05] [--concurrency 10 50 ...]
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.const import STRAVA_ACTIVITY_FIELDS
+from src.database.sqlite import SqliteDatabase
+from src.handlers.actions import CreateActivity, Pipeline
+from src.handlers.actions.async_actions import AsyncCreateActivity
+from src.handlers.actions.async_pipeline import AsyncPipeline
+from src.notion.async_client import AsyncClient as AsyncNotionClient
+from src.notion.client import Client as NotionClient
+from src.registry import ClientRegistry
+from src.strava.async_client import AsyncClient as AsyncStravaClient
+from src.strava.client import Client as StravaClient
+from src.strava.rate_limit import get_strava_rate_limit
+
+ACTIVITY = {key: None for key in STRAVA_ACTIVITY_FIELDS}
+# generous limits, the model of the Strava rate limits must not throttle the benchmark
+RATE_LIMIT_HEADERS = {"X-RateLimit-Limit": "100000,1000000", "X-RateLimit-Usage": "0,0"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer the Strava and Notion endpoints used by the actions after a latency."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+
+    def _answer(self, body: dict) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.latency)
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for header, value in RATE_LIMIT_HEADERS.items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self) -> None:
+        """Answer the get activity endpoint of Strava."""
+        match = re.search(r"/activities/(\d+)", self.path)
+        self._answer({**ACTIVITY, "id": int(match.group(1)), "name": "Morning Run"})
+
+    def do_POST(self) -> None:
+        """Answer the create page and query database endpoints of Notion."""
+        if self.path.endswith("/query"):
+            self._answer({"results": [], "has_more": False, "next_cursor": None})
+        else:
+            self._answer({"id": uuid.uuid4().hex})
+
+    def do_PATCH(self) -> None:
+        """Answer the update page endpoint of Notion."""
+        self._answer({"id": self.path.rsplit("/", 1)[-1]})
+
+    def log_message(self, *args) -> None:
+        """Do not log requests."""
+
+
+def build_database(path: str, athletes: int) -> SqliteDatabase:
+    """
+    Create a database with an athlete, an account and an integration per event.
+
+    :param path:
+    :param athletes:
+    :return:
+    """
+    database = SqliteDatabase(path)
+    for i in range(athletes):
+        athlete_id, user_email, bot_id = str(i), f"user{i}@example.com", f"bot{i}"
+        database.import_rows(
+            "strava",
+            [
+                {
+                    "athlete_id": athlete_id,
+                    "user_email": user_email,
+                    "access_token": "access",
+                    "refresh_token": "refresh",
+                    "expires_at": "9999999999",
+                    "username": f"athlete{i}",
+                }
+            ],
+        )
+        database.import_rows(
+            "notion",
+            [{"bot_id": bot_id, "user_email": user_email, "access_token": "secret"}],
+        )
+        database.import_rows(
+            "rel_strava_notion",
+            [
+                {
+                    "user_email": user_email,
+                    "athlete_id": athlete_id,
+                    "notion_bot_id": bot_id,
+                    "database_id": f"db{i}",
+                }
+            ],
+        )
+    return database
+
+
+def main(argv=None) -> None:
+    """
+    Print the time to process a batch of create events with each engine.
+
+    :param argv:
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[10, 50],
+        help="concurrencies of the sweep, each engine runs at each of them",
+    )
+    args = parser.parse_args(argv)
+
+    StubHandler.latency = args.latency
+    # the default backlog of 5 would drop the connections opened at once by the asyncio engine
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    StravaClient.base_url = AsyncStravaClient.base_url = f"{stub_url}api/"
+    NotionClient.base_url = AsyncNotionClient.base_url = stub_url
+    os.environ.setdefault("STRAVA_CLIENT_ID", "id")
+    os.environ.setdefault("STRAVA_CLIENT_SECRET", "secret")
+    os.environ["NOTION_RATE_LIMIT"] = os.environ["NOTION_RATE_BURST"] = "1000"
+    # the connection pools must not bound the concurrency of either engine
+    os.environ["HTTP_POOL_MAXSIZE"] = str(max(args.concurrency))
+    os.environ["HTTP_ASYNC_MAX_CONNECTIONS"] = str(max(args.concurrency))
+    # the model starts from the default limits, the requests sent before the first response would be spread
+    get_strava_rate_limit().update(RATE_LIMIT_HEADERS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = build_database(os.path.join(tmp, "benchmark.db"), args.events)
+        registry = ClientRegistry(lambda: database)
+        run = 0
+        for concurrency in args.concurrency:
+            pipelines = {
+                "threads": (Pipeline(database, registry, concurrency), CreateActivity),
+                "asyncio": (
+                    AsyncPipeline(database, registry, concurrency),
+                    AsyncCreateActivity,
+                ),
+            }
+            for engine, (pipeline, action) in pipelines.items():
+                # distinct activities per run, a create is skipped once its page is indexed
+                actions = [
+                    action(str(i), str(run * args.events + i), database, registry)
+                    for i in range(args.events)
+                ]
+                run += 1
+                start = time.perf_counter()
+                outcomes = pipeline.run(actions)
+                elapsed = time.perf_counter() - start
+                failed = sum(outcome["exception"] is not None for outcome in outcomes)
+                print(
+                    f"{engine:8} x {concurrency:<4}: {elapsed:.2f}s for {args.events} events "
+                    f"({args.events / elapsed:.0f} events/s, {failed} failed)"
+                )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Measure the time to build the Notion properties of an activity.
+
+Usage : python -m benchmarks.notion_properties [--activities 1000] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from src.notion.properties import build_properties, build_properties_many
+
+ACTIVITY = {
+    "name": 'Morning "tempo" run',
+    "description": "Intervals\n5 x 1km",
+    "sport_type": "Run",
+    "calories": None,
+    "start_date": "2024-01-01T07:00:00Z",
+    "id": 10000000000,
+    "average_speed": 3.2,
+    "max_speed": 5.1,
+    "total_elevation_gain": 42.0,
+    "external_id": "garmin_push_1",
+    "upload_id": 11000000000,
+    "moving_time": 3600,
+    "distance": 11520.4,
+    "username": "athlete",
+}
+
+
+def main(argv=None) -> None:
+    """
+    Print the best time per activity, one activity at a time and in bulk.
+
+    :param argv:
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--activities", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    activities = [
+        {**ACTIVITY, "id": ACTIVITY["id"] + i} for i in range(args.activities)
+    ]
+
+    single = min(
+        timeit.repeat(
+            lambda: [build_properties(a) for a in activities],
+            number=1,
+            repeat=args.repeat,
+        )
+    )
+    bulk = min(
+        timeit.repeat(
+            lambda: build_properties_many(activities), number=1, repeat=args.repeat
+        )
+    )
+    print(f"build_properties      : {single / args.activities * 1e6:.2f} us/activity")
+    print(f"build_properties_many : {bulk / args.activities * 1e6:.2f} us/activity")
+
+
+if __name__ == "__main__":
+    main()
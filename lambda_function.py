@@ -5,20 +5,18 @@ import os
 from time import time
 from typing import Any
 
-import boto3
-
-from src.database.airtable import AirtableDatabase
+from src.handlers.debounce import debounce, debounce_seconds, should_debounce
+from src.handlers.idempotency import IdempotencyGuard
 from src.handlers.oauth import add_or_update_notion, add_or_update_strava_oauth
-from src.handlers.strava_subscription import callback_validation
+from src.handlers.strava_subscription import callback_validation, get_message_group_id
 from src.notion.oauth import exchange_token
+from src.registry import get_registry
 from src.strava.oauth import exchange_code as strava_exchange_token
 from src.types.event import HttpEvent
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-SQS = boto3.client("sqs")
-
 
 def controller(event: HttpEvent, context: dict[str, Any]) -> Any:
     """
@@ -53,9 +51,33 @@ def controller(event: HttpEvent, context: dict[str, Any]) -> Any:
     elif (method == "POST") & (path == "/strava_callback"):
         t0 = time()
         message_body = event["body"]
-        SQS.send_message(
-            QueueUrl=os.environ["SQS_URL"], MessageBody=message_body, MessageGroupId="1"
+        strava_event = json.loads(message_body)
+        guard = IdempotencyGuard.from_env(get_registry().store())
+        if not guard.claim_receipt(strava_event):
+            logger.info(f"duplicate event dropped : {message_body}")
+            return {"statusCode": 200, "body": message_body}
+        shards = os.environ.get("SQS_MESSAGE_GROUP_SHARDS")
+        message_group_id = get_message_group_id(
+            strava_event, int(shards) if shards else None
         )
+        delay = debounce_seconds()
+        try:
+            if should_debounce(strava_event, delay):
+                # FIFO queues have no delay per message, see build_queues
+                debounce(
+                    strava_event,
+                    get_registry().database(),
+                    get_registry().queue("debounce"),
+                    delay,
+                )
+            else:
+                get_registry().queue("events").send(
+                    message_body, group_id=message_group_id
+                )
+        except Exception:
+            # let the retry of Strava through
+            guard.release_receipt(strava_event)
+            raise
         t1 = time()
         print(f"Send message to queue : {t1-t0}s")
         return {"statusCode": 200, "body": message_body}
@@ -86,14 +108,14 @@ def controller(event: HttpEvent, context: dict[str, Any]) -> Any:
     elif (method == "POST") & (path == "/add_strava_oauth"):
         oauth_credentials = json.loads(event["body"])
         logger.info(oauth_credentials)
-        db = AirtableDatabase()
+        db = get_registry().database()
         add_or_update_strava_oauth(
             oauth_credentials["strava"], oauth_credentials["user_email"], db
         )
     elif (method == "POST") & (path == "/add_notion"):
         oauth_credentials = json.loads(event["body"])
         logger.info(oauth_credentials)
-        db = AirtableDatabase()
+        db = get_registry().database()
         add_or_update_notion(
             oauth_credentials["notion"],
             oauth_credentials["user_email"],
@@ -1,16 +1,57 @@
 """Define the entrypoint of Lambda function."""
-import json
 import logging
-from typing import Any
+import os
+from typing import Any, Optional
 
-from src.database.airtable import AirtableDatabase
-from src.handlers.actions import CreateActivity, UpdateActivity
+import boto3
+
+from src.database.cache import CachedDatabase
+from src.handlers.process import process_records, record_retry_delay
+from src.handlers.retry import queue_url_from_arn
+from src.registry import get_registry
 from src.types.event import SqsEvent
+from src.utils.metrics import METRICS
+from src.utils.transport import get_transport
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-actions = {"create.activity": CreateActivity, "update.activity": UpdateActivity}
+SQS = boto3.client("sqs")
+
+
+def delay_retry(record: dict[str, Any], exception: BaseException) -> None:
+    """
+    Delay the next receive of a failed record, see record_retry_delay.
+
+    :param record:
+    :param exception:
+    :return:
+    """
+    try:
+        SQS.change_message_visibility(
+            QueueUrl=queue_url_from_arn(record["eventSourceARN"]),
+            ReceiptHandle=record["receiptHandle"],
+            VisibilityTimeout=record_retry_delay(record, exception),
+        )
+    except Exception:
+        logger.exception(f"failed to delay the retry of {record['messageId']}")
+
+
+def invocation_budget(context: Any) -> Optional[float]:
+    """
+    Return the number of seconds left to process the records.
+
+    A margin, PROCESS_EVENTS_DEADLINE_MARGIN seconds (5 by default), is kept to report the batch item failures
+    before the runtime stops the invocation.
+
+    :param context: Lambda context
+    :return: None if the context does not tell the remaining time
+    """
+    get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+    if get_remaining_time is None:
+        return None
+    margin = float(os.environ.get("PROCESS_EVENTS_DEADLINE_MARGIN", 5))
+    return get_remaining_time() / 1000 - margin
 
 
 def controller(event: SqsEvent, context: dict[str, Any]) -> Any:
@@ -25,26 +66,16 @@ def controller(event: SqsEvent, context: dict[str, Any]) -> Any:
         batch_item_failures = []
         sqs_batch_response = {}
         logger.info(event)
-        for record in event["Records"]:
-            message_id = record["messageId"]
-            logger.info(f"processing message : {message_id} ...")
-            body = json.loads(record["body"])
-            action = f"{body['aspect_type']}.{body['object_type']}"
-            concrete_action = actions.get(action)
-            if concrete_action is not None:
-                owner = str(body["owner_id"])
-                object_id = str(body["object_id"])
-                database_client = AirtableDatabase()
-                try:
-                    res = concrete_action(owner, object_id, database_client).run()
-                    logger.info(res)
-                except Exception as e:
-                    logger.exception(
-                        f"exception encountered while processing {message_id}"
-                    )
-                    batch_item_failures.append({"itemIdentifier": record["messageId"]})
-            else:
-                logger.warning(f"action {concrete_action} not implemented yet")
-                batch_item_failures.append({"itemIdentifier": record["messageId"]})
+        errors = process_records(event["Records"], invocation_budget(context))
+        for record, exception in zip(event["Records"], errors):
+            if exception is None:
+                continue
+            batch_item_failures.append({"itemIdentifier": record["messageId"]})
+            delay_retry(record, exception)
+        logger.info(f"connection reuse : {get_transport().stats()}")
+        database = get_registry().database()
+        if isinstance(database, CachedDatabase):
+            logger.info(f"database cache : {database.stats()}")
+        logger.info(f"metrics : {METRICS.snapshot()}")
         sqs_batch_response["batchItemFailures"] = batch_item_failures
         return sqs_batch_response
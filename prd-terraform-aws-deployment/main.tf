@@ -45,6 +45,24 @@ variable "AIRTABLE_TABLE_NOTION" {
   sensitive   = true
 }
 
+variable "AIRTABLE_TABLE_NOTION_PAGES" {
+  description = "id of the table that indexes the Notion pages of Strava activities"
+  type        = string
+  sensitive   = true
+}
+
+variable "AIRTABLE_TABLE_TOKEN_REFRESH_LEASES" {
+  description = "id of the table that stores the leases of Strava token refreshes"
+  type        = string
+  sensitive   = true
+}
+
+variable "AIRTABLE_TABLE_ACTIVITY_EVENTS" {
+  description = "id of the table that stores the time of the latest event of each activity"
+  type        = string
+  sensitive   = true
+}
+
 variable "STRAVA_CLIENT_ID" {
   description = "client id of Strava application"
   type        = string
@@ -172,6 +190,8 @@ resource "aws_lambda_function" "test_lambda" {
     variables = {
       VERIFY_TOKEN                        = var.VERIFY_TOKEN,
       SQS_URL                             = aws_sqs_queue.terraform_queue.url
+      SQS_DEBOUNCE_URL                    = aws_sqs_queue.debounce_queue.url
+      UPDATE_DEBOUNCE_SECONDS             = var.UPDATE_DEBOUNCE_SECONDS
       NOTION_CLIENT_ID                    = var.NOTION_CLIENT_ID
       NOTION_CLIENT_SECRET                = var.NOTION_CLIENT_SECRET
       NOTION_CLIENT_REDIRECT_URI          = var.NOTION_CLIENT_REDIRECT_URI
@@ -180,6 +200,11 @@ resource "aws_lambda_function" "test_lambda" {
       AIRTABLE_TABLE_STRAVA_ID            = var.AIRTABLE_TABLE_STRAVA_ID
       AIRTABLE_TABLE_REL_STRAVA_NOTION_ID = var.AIRTABLE_TABLE_REL_STRAVA_NOTION_ID
       AIRTABLE_TABLE_NOTION               = var.AIRTABLE_TABLE_NOTION
+      AIRTABLE_TABLE_NOTION_PAGES         = var.AIRTABLE_TABLE_NOTION_PAGES
+      AIRTABLE_TABLE_TOKEN_REFRESH_LEASES = var.AIRTABLE_TABLE_TOKEN_REFRESH_LEASES
+      AIRTABLE_TABLE_ACTIVITY_EVENTS      = var.AIRTABLE_TABLE_ACTIVITY_EVENTS
+      STORE_BACKEND                       = "dynamodb"
+      STORE_DYNAMODB_TABLE                = aws_dynamodb_table.store.name
       STRAVA_CLIENT_ID                    = var.STRAVA_CLIENT_ID
       STRAVA_CLIENT_SECRET                = var.STRAVA_CLIENT_SECRET
     }
@@ -218,8 +243,11 @@ resource "aws_iam_role_policy" "sqs_policy" {
   "Statement": [
     {
       "Effect": "Allow",
-      "Action": "sqs:SendMessage",
-      "Resource": "${aws_sqs_queue.terraform_queue.arn}"
+      "Action": ["sqs:SendMessage", "sqs:ChangeMessageVisibility"],
+      "Resource": [
+        "${aws_sqs_queue.terraform_queue.arn}",
+        "${aws_sqs_queue.debounce_queue.arn}"
+      ]
     }
   ]
 }
@@ -236,7 +264,7 @@ resource "aws_sqs_queue" "terraform_queue" {
   visibility_timeout_seconds  = aws_lambda_function.process_events.timeout
   redrive_policy = jsonencode({
     deadLetterTargetArn = aws_sqs_queue.terraform_queue_deadletter.arn
-    maxReceiveCount     = 1
+    maxReceiveCount     = 5 // failed records are retried with a backoff
   })
 }
 
@@ -251,6 +279,57 @@ resource "aws_sqs_queue" "terraform_queue_deadletter" {
   })
 }
 
+############ SQS standard queue : debounced updates ############
+variable "UPDATE_DEBOUNCE_SECONDS" {
+  description = "delay of activity updates, only the last update of a burst is processed (0 to disable)"
+  default     = 0
+}
+
+// FIFO queues have no delay per message
+resource "aws_sqs_queue" "debounce_queue" {
+  name                       = "${var.ENV}_debounced-strava-events"
+  max_message_size           = 262144
+  message_retention_seconds  = 3600
+  receive_wait_time_seconds  = 0
+  visibility_timeout_seconds = aws_lambda_function.process_events.timeout
+}
+
+############ DynamoDB table : key-value store ############
+// completed targets of the events and processed events, shared by the Lambda containers
+resource "aws_dynamodb_table" "store" {
+  name         = "${var.ENV}_strava-notion-store"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "key"
+
+  attribute {
+    name = "key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
+
+resource "aws_iam_role_policy" "store_policy" {
+  name = "${var.ENV}_dynamodb_store_policy"
+  role = aws_iam_role.iam_for_lambda.name
+
+  policy = <<EOF
+{
+  "Version": "2012-10-17",
+  "Statement": [
+    {
+      "Effect": "Allow",
+      "Action": ["dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:DeleteItem"],
+      "Resource": "${aws_dynamodb_table.store.arn}"
+    }
+  ]
+}
+EOF
+}
+
 ############ Lambda : process events ############
 variable "lambda_process_function_name" {
   default = "process_events"
@@ -273,6 +352,11 @@ resource "aws_lambda_function" "process_events" {
       AIRTABLE_TABLE_STRAVA_ID            = var.AIRTABLE_TABLE_STRAVA_ID
       AIRTABLE_TABLE_REL_STRAVA_NOTION_ID = var.AIRTABLE_TABLE_REL_STRAVA_NOTION_ID
       AIRTABLE_TABLE_NOTION               = var.AIRTABLE_TABLE_NOTION
+      AIRTABLE_TABLE_NOTION_PAGES         = var.AIRTABLE_TABLE_NOTION_PAGES
+      AIRTABLE_TABLE_TOKEN_REFRESH_LEASES = var.AIRTABLE_TABLE_TOKEN_REFRESH_LEASES
+      AIRTABLE_TABLE_ACTIVITY_EVENTS      = var.AIRTABLE_TABLE_ACTIVITY_EVENTS
+      STORE_BACKEND                       = "dynamodb"
+      STORE_DYNAMODB_TABLE                = aws_dynamodb_table.store.name
       STRAVA_CLIENT_ID                    = var.STRAVA_CLIENT_ID
       STRAVA_CLIENT_SECRET                = var.STRAVA_CLIENT_SECRET
     }
@@ -298,6 +382,12 @@ resource "aws_lambda_event_source_mapping" "sqs_trigger" {
   function_response_types = ["ReportBatchItemFailures"]
 }
 
+resource "aws_lambda_event_source_mapping" "sqs_debounce_trigger" {
+  event_source_arn        = aws_sqs_queue.debounce_queue.arn
+  function_name           = aws_lambda_function.process_events.arn
+  function_response_types = ["ReportBatchItemFailures"]
+}
+
 // IAM
 #Attachment of a Managed AWS IAM Policy for Lambda sqs execution
 resource "aws_iam_role_policy_attachment" "lambda_basic_sqs_queue_execution_policy" {
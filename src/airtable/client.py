@@ -1,16 +1,17 @@
 """Implement a client that handles airtables API calls."""
 import json
-from typing import Optional, Union
-
-import requests
+from typing import Iterator, Optional, Union
 
 from src.airtable.types import (
     CreateRecordsBodyParameter,
     ListRecordsQueryParameters,
     Record,
     UpdateRecordBodyParameters,
+    UpdateRecordsBodyParameters,
 )
+from src.utils.pagination import paginate
 from src.utils.requests import encode_url_params, params_dict_to_str
+from src.utils.transport import Transport, get_transport
 from src.utils.type_checking import check_keys_of_typed_dict
 
 
@@ -18,15 +19,18 @@ class Client:
     """Interface to communicate with airtable API."""
 
     base_url = "https://api.airtable.com/"
+    max_records_per_request = 10
 
-    def __init__(self, pat: str, version="v0"):
+    def __init__(self, pat: str, version="v0", transport: Optional[Transport] = None):
         """
         Init instance.
 
         :param pat: personal access token
         :param version: version label of the API
+        :param transport: HTTP transport, the shared one by default
         """
         self.pat = pat
+        self.transport = transport or get_transport()
         self.versioned_url = f"{self.base_url}{version}/"
 
     def base_headers(self) -> dict:
@@ -54,7 +58,7 @@ class Client:
         check_keys_of_typed_dict(query_parameters, ListRecordsQueryParameters)
         url = f"{self.versioned_url}{base_id}/{table_id}"
         encode_url_params(query_parameters)
-        res = requests.get(
+        res = self.transport.get(
             url,
             headers=self.base_headers(),
             params=params_dict_to_str(query_parameters),
@@ -64,6 +68,37 @@ class Client:
         else:
             return json.loads(res.content)
 
+    def iter_records(
+        self,
+        base_id: str,
+        table_id: str,
+        query_parameters: Optional[ListRecordsQueryParameters] = None,
+        fields: Optional[list[str]] = None,
+        prefetch: bool = False,
+    ) -> Iterator[Record]:
+        """
+        Iterate over the records of all pages of the List records endpoint.
+
+        Pages are fetched lazily.
+        :param base_id:
+        :param table_id:
+        :param query_parameters: query parameters, except offset which is handled by the iterator
+        :param fields: names of the fields to return, all fields if None
+        :param prefetch: fetch the next page in background
+        :return:
+        """
+
+        def fetch_page(offset: Optional[str]) -> tuple[list[Record], Optional[str]]:
+            _query_parameters = dict(query_parameters or {})
+            if fields is not None:
+                _query_parameters["fields"] = list(fields)
+            if offset is not None:
+                _query_parameters["offset"] = offset
+            page = self.list_records(base_id, table_id, _query_parameters)
+            return page["records"], page.get("offset")
+
+        return paginate(fetch_page, prefetch)
+
     def update_record(
         self,
         base_id: str,
@@ -82,7 +117,7 @@ class Client:
         """
         check_keys_of_typed_dict(body, UpdateRecordBodyParameters)
         url = f"{self.versioned_url}{base_id}/{table_id}/{record_id}"
-        res = requests.patch(url, json=body, headers=self.base_headers())
+        res = self.transport.patch(url, json=body, headers=self.base_headers())
         if res.status_code != 200:
             raise Exception(res.text)
         else:
@@ -102,8 +137,62 @@ class Client:
         """
         check_keys_of_typed_dict(body, CreateRecordsBodyParameter)
         url = f"{self.versioned_url}{base_id}/{table_id}"
-        res = requests.post(url, json=body, headers=self.base_headers())
+        res = self.transport.post(url, json=body, headers=self.base_headers())
         if res.status_code != 200:
             raise Exception(res.text)
         else:
             return json.loads(res.content)
+
+    def update_records(
+        self, base_id: str, table_id: str, body: UpdateRecordsBodyParameters
+    ) -> dict:
+        """
+        Call the Update multiple records endpoint.
+
+        With performUpsert, records are matched on the fields to merge on instead of their id and
+        the records that do not match are created.
+        :param base_id:
+        :param table_id:
+        :param body:
+        :return:
+        """
+        check_keys_of_typed_dict(body, UpdateRecordsBodyParameters)
+        if len(body["records"]) > self.max_records_per_request:
+            raise ValueError(
+                f"at most {self.max_records_per_request} records can be updated per request"
+            )
+        url = f"{self.versioned_url}{base_id}/{table_id}"
+        res = self.transport.patch(url, json=body, headers=self.base_headers())
+        if res.status_code != 200:
+            raise Exception(res.text)
+        else:
+            return json.loads(res.content)
+
+    def upsert_records(
+        self,
+        base_id: str,
+        table_id: str,
+        records: list[dict],
+        fields_to_merge_on: list[str],
+    ) -> list[Record]:
+        """
+        Create or update records matched on some fields.
+
+        Records are sent by batches of max_records_per_request.
+        :param base_id:
+        :param table_id:
+        :param records: list of fields
+        :param fields_to_merge_on: names of the fields identifying a record
+        :return:
+        """
+        upserted = []
+        for i in range(0, len(records), self.max_records_per_request):
+            body = {
+                "performUpsert": {"fieldsToMergeOn": fields_to_merge_on},
+                "records": [
+                    {"fields": fields}
+                    for fields in records[i : i + self.max_records_per_request]
+                ],
+            }
+            upserted.extend(self.update_records(base_id, table_id, body)["records"])
+        return upserted
@@ -43,6 +43,21 @@ class CreateRecordsBodyParameter(TypedDict):
     typecast: Optional[bool]
 
 
+class PerformUpsert(TypedDict):
+    """Type of the performUpsert parameter."""
+
+    fieldsToMergeOn: list[str]
+
+
+class UpdateRecordsBodyParameters(TypedDict):
+    """Type for body parameters of the update multiple records endpoint."""
+
+    performUpsert: Optional[PerformUpsert]
+    records: list[dict]
+    returnFieldsByFieldId: Optional[bool]
+    typecast: Optional[bool]
+
+
 class Record(TypedDict):
     """Type for a record."""
 
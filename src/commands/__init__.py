@@ -0,0 +1,5 @@
+"""
+Package with command line entrypoints.
+
+Each module is run with `python -m src.commands.<module>`.
+"""
@@ -0,0 +1,106 @@
+"""
+Build the index of Notion pages for the existing activities of athletes.
+
+The database backend is configured with the same environment variables as the Lambda functions.
+Usage : python -m src.commands.backfill_page_index <athlete id> [<athlete id> ...]
+"""
+import argparse
+import logging
+from itertools import islice
+from typing import Optional
+
+from src.const import NOTION_DATABASE_ACTIVITY_ID
+from src.database.interface import DatabaseInterface
+from src.notion.client import Client as NotionClient
+from src.registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+
+def _activity_id(page: dict) -> Optional[str]:
+    """
+    Return the value of the Activity ID property of a page.
+
+    :param page:
+    :return: None if the property is empty
+    """
+    rich_text = page["properties"].get(NOTION_DATABASE_ACTIVITY_ID, {}).get("rich_text")
+    if not rich_text:
+        return None
+    return "".join(text["plain_text"] for text in rich_text)
+
+
+def backfill_database(
+    database: DatabaseInterface, notion_client: NotionClient, database_id: str
+) -> int:
+    """
+    Index all pages of a Notion database.
+
+    Pages are read lazily and indexed by chunks.
+
+    :param database:
+    :param notion_client:
+    :param database_id:
+    :return: number of indexed pages
+    """
+    pages = notion_client.iter_query_database(database_id, prefetch=True)
+    count = 0
+    while True:
+        chunk = {}
+        for page in islice(pages, 100):
+            activity_id = _activity_id(page)
+            if activity_id is not None:
+                chunk[activity_id] = page["id"]
+        if len(chunk) == 0:
+            return count
+        database.set_notion_page_ids(database_id, chunk)
+        count += len(chunk)
+
+
+def backfill_athlete(database: DatabaseInterface, athlete_id: str) -> int:
+    """
+    Index all pages of the Notion databases of an athlete.
+
+    :param database:
+    :param athlete_id:
+    :return: number of indexed pages
+    """
+    registry = get_registry()
+    count = 0
+    context = database.get_athlete_context(athlete_id)
+    for account in context["accounts"]:
+        for notion_database in account["databases"]:
+            if notion_database["access_token"] is None:
+                logger.warning(f"no credentials for bot_id {notion_database['bot_id']}")
+                continue
+            notion_client = registry.notion_client(
+                notion_database["bot_id"], notion_database["access_token"]
+            )
+            indexed = backfill_database(
+                database, notion_client, notion_database["database_id"]
+            )
+            logger.info(
+                f"{indexed} pages indexed for database {notion_database['database_id']}"
+            )
+            count += indexed
+    return count
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Run the command.
+
+    :param argv: command line arguments
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("athlete_ids", nargs="+", help="Strava athlete ids")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    database = get_registry().database()
+    for athlete_id in args.athlete_ids:
+        backfill_athlete(database, athlete_id)
+
+
+if __name__ == "__main__":
+    main()
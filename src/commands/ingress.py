@@ -0,0 +1,144 @@
+"""
+Serve the webhook and the OAuth endpoints over HTTP, an alternative to the Lambda function URL.
+
+Each request is converted to the event of a Lambda function URL and handled by lambda_function.controller.
+Events are sent to the queues configured with QUEUE_BACKEND, see src.registry.build_queues.
+Usage : python -m src.commands.ingress [--host 127.0.0.1] [--port 8080]
+"""
+import argparse
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Mapping, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import lambda_function
+from src.types.event import HttpEvent
+
+logger = logging.getLogger(__name__)
+
+
+def to_event(
+    method: str, target: str, headers: Mapping[str, str], body: str
+) -> HttpEvent:
+    """
+    Return the event of a Lambda function URL carrying a request.
+
+    :param method:
+    :param target: path and query string of the request
+    :param headers:
+    :param body:
+    :return:
+    """
+    url = urlsplit(target)
+    event = {
+        "version": "2.0",
+        "rawPath": url.path,
+        "rawQueryString": url.query,
+        "headers": {key.lower(): value for key, value in headers.items()},
+        "requestContext": {"http": {"method": method, "path": url.path}},
+        "body": body,
+        "isBase64Encoded": False,
+    }
+    if url.query:
+        # function URLs join the values of a repeated parameter with commas
+        event["queryStringParameters"] = {
+            key: ",".join(values) for key, values in parse_qs(url.query).items()
+        }
+    return event
+
+
+def to_response(result: Any) -> tuple[int, dict[str, str], bytes]:
+    """
+    Return the status, the headers and the body of the response of a Lambda function URL.
+
+    A result without statusCode is the JSON body of a response with status 200.
+
+    :param result: value returned by the controller
+    :return:
+    """
+    if isinstance(result, dict) and "statusCode" in result:
+        body = result.get("body") or ""
+        return (
+            int(result["statusCode"]),
+            dict(result.get("headers") or {}),
+            (body if isinstance(body, str) else json.dumps(body)).encode(),
+        )
+    return 200, {"Content-Type": "application/json"}, json.dumps(result).encode()
+
+
+class IngressHandler(BaseHTTPRequestHandler):
+    """Handle requests with lambda_function.controller."""
+
+    def _handle(self) -> None:
+        """
+        Answer the request with the response of the controller, 500 if it raised.
+
+        :return:
+        """
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        event = to_event(self.command, self.path, self.headers, body)
+        try:
+            status, headers, content = to_response(
+                lambda_function.controller(event, {})
+            )
+        except Exception:
+            logger.exception(f"failed to handle {self.command} {self.path}")
+            status, headers, content = 500, {}, b"Internal Server Error"
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self) -> None:
+        """Handle a GET request."""
+        self._handle()
+
+    def do_POST(self) -> None:
+        """Handle a POST request."""
+        self._handle()
+
+
+def serve(host: str, port: int) -> ThreadingHTTPServer:
+    """
+    Serve requests in a background thread, until the shutdown of the returned server.
+
+    :param host:
+    :param port:
+    :return:
+    """
+    server = ThreadingHTTPServer((host, port), IngressHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ingress", daemon=True).start()
+    logger.info(f"serving on {host}:{server.server_address[1]}")
+    return server
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Run the command, serve requests until interrupted.
+
+    :param argv: command line arguments
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    server = serve(args.host, args.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Copy the airtable base to a SQLite database.
+
+The airtable base is configured with the same environment variables as AirtableDatabase.
+Usage : python -m src.commands.migrate_airtable_to_sqlite <path of the SQLite file>
+"""
+import argparse
+import logging
+from itertools import islice
+from typing import Optional
+
+from src.database.airtable import AirtableDatabase
+from src.database.sqlite import SqliteDatabase
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(source: AirtableDatabase, target: SqliteDatabase) -> dict[str, int]:
+    """
+    Copy the tables of the airtable base to the SQLite database.
+
+    :param source:
+    :param target:
+    :return: number of copied rows per table
+    """
+    counts = {}
+    tables = [
+        ("strava", source.strava_table_id),
+        ("rel_strava_notion", source.rel_strava_notion_table_id),
+        ("notion", source.notion_table_id),
+    ]
+    if source.notion_pages_table_id is not None:
+        tables.append(("notion_pages", source.notion_pages_table_id))
+    for table, table_id in tables:
+        records = source.client.iter_records(
+            source.base_id, table_id, {"pageSize": 100}, prefetch=True
+        )
+        counts[table] = 0
+        # import by chunks so that large tables are copied in constant memory
+        while True:
+            rows = [record["fields"] for record in islice(records, 100)]
+            if len(rows) == 0:
+                break
+            target.import_rows(table, rows)
+            counts[table] += len(rows)
+        logger.info(f"{counts[table]} rows copied to table {table}")
+    return counts
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Run the command.
+
+    :param argv: command line arguments
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="path of the SQLite file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    migrate(AirtableDatabase(), SqliteDatabase(args.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Run the processor as a long-running worker, an alternative to the Lambda function triggered by SQS.
+
+The queues are configured with QUEUE_BACKEND (see src.registry.build_queues), the worker with the WORKER_*
+environment variables (see Worker.from_env), the processing as for the Lambda function.
+With --ingress, the webhook is served in the same process, which the memory queue backend requires.
+SIGTERM and SIGINT stop the worker once the batches being processed are completed.
+Usage : python -m src.commands.worker [--ingress <port>] [--host 127.0.0.1]
+"""
+import argparse
+import logging
+import signal
+from typing import Optional
+
+from src.commands.ingress import serve
+from src.handlers.worker import Worker
+from src.registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Run the command.
+
+    :param argv: command line arguments
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--ingress", type=int, help="port of the webhook served in the same process"
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="address the webhook listens on"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    queues = []
+    # the local backends use the same queue for events and debounced events
+    for queue in get_registry().queues().values():
+        if all(queue is not other for other in queues):
+            queues.append(queue)
+    worker = Worker.from_env(queues)
+    server = serve(args.host, args.ingress) if args.ingress is not None else None
+
+    def shutdown(signum: int, _) -> None:
+        logger.info(f"signal {signum} received, stopping ...")
+        if server is not None:
+            # stop accepting events before draining the batches in flight
+            server.shutdown()
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    worker.run()
+    for queue in queues:
+        if hasattr(queue, "__len__"):
+            logger.info(f"{len(queue)} messages left in the queue")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 """Define constant values of the project."""
-from string import Template
 from typing import Literal
 
 _allowed_keys = Literal[
@@ -74,85 +73,32 @@ STRAVA_ACTIVITY_FIELDS: list[_allowed_keys] = [
 ]
 
 
-NOTION_DATABASE_PROPERTIES_TEMPLATE = Template(
-    """\
-{
-    "Name": {
-        "title": [
-            {
-                "text": {
-                    "content": "$name"
-                }
-            }
-        ]
-    },
-    "Athlète": {
-        "rich_text": [
-            {
-                "text": {
-                    "content": "$username"
-                }
-            }
-        ]
-    },
-    "Description": {
-        "rich_text": [
-            {
-                "text": {
-                    "content": "$description"
-                }
-            }
-        ]
-    },
-    "Type": {
-        "select": {
-            "name": "$type"
-        }
-    },
-    "Calories": { "number": $calories },
-    "Start": {
-      "date": {
-        "start": "$start"
-      }
-    },
-    "Activity ID": {
-        "rich_text": [
-            {
-                "text": {
-                    "content": "$activity_id"
-                }
-            }
-        ]
-    },
-    "AVG Speed": { "number": $avg_speed },
-    "Max Speed": { "number": $max_speed },
-    "Total Elevation Gain": { "number": $total_elevation_gain },
-    "External ID": {
-        "rich_text": [
-            {
-                "text": {
-                    "content": "$external_id"
-                }
-            }
-        ]
-    },
-    "Upload ID": {
-        "rich_text": [
-            {
-                "text": {
-                    "content": "$upload_id"
-                }
-            }
-        ]
-    },
-    "Time": { "number": $time },
-    "Distance": { "number": $distance }
+# Notion property name and key of the projected Strava activity holding its value,
+# the type of each property is the one of NOTION_DATABASE_SCHEMA
+NOTION_DATABASE_PROPERTIES_COLUMNS = {
+    "Name": "name",
+    "Athlète": "username",
+    "Description": "description",
+    "Type": "sport_type",
+    "Calories": "calories",
+    "Start": "start_date",
+    "Activity ID": "id",
+    "AVG Speed": "average_speed",
+    "Max Speed": "max_speed",
+    "Total Elevation Gain": "total_elevation_gain",
+    "External ID": "external_id",
+    "Upload ID": "upload_id",
+    "Time": "moving_time",
+    "Distance": "distance",
 }
-"""
-)
 
 NOTION_DATABASE_ACTIVITY_ID = "Activity ID"
 
+# keys of the updates of a Strava event carrying the value of a Notion property
+STRAVA_EVENT_UPDATES_PROPERTIES = {"title": "Name", "type": "Type"}
+# keys of the updates of a Strava event without any Notion property
+STRAVA_EVENT_UPDATES_IGNORED = ["private"]
+
 NOTION_DATABASE_SCHEMA = {
     "External ID": {"rich_text": {}},
     "Type": {
@@ -1,21 +1,31 @@
 """Concrete implementation of database with airtable."""
 import json
+import logging
 import os
-from typing import Union
+import time
+from typing import Optional, Union
 
 from src.airtable.client import Client
 from src.airtable.types import Record
 from src.database.interface import DatabaseInterface
-from src.types.database import StravaToken
+from src.types.database import AthleteContext, NotionPage, StravaToken
 from src.types.oauth import NotionCredentials, StravaAthleteInfo, StravaCredentials
 from src.utils.exceptions import InternalException, MissingEnvironmentVariable
 
+logger = logging.getLogger()
+
 
 class AirtableDatabase(DatabaseInterface):
     """
     Concrete implementation of DatabaseInterface.
 
     This implementation uses airtable.
+    The index of Notion pages is kept in the optional table AIRTABLE_TABLE_NOTION_PAGES
+    with fields database_id, activity_id, page_id and property_hashes.
+    The leases of Strava token refreshes are kept in the optional table AIRTABLE_TABLE_TOKEN_REFRESH_LEASES
+    with fields athlete_id, user_email, owner and expires_at.
+    The time of the latest event of each activity is kept in the optional table AIRTABLE_TABLE_ACTIVITY_EVENTS
+    with fields activity_id and event_time, it is required when UPDATE_DEBOUNCE_SECONDS is set.
     """
 
     def __init__(self):
@@ -37,6 +47,27 @@ class AirtableDatabase(DatabaseInterface):
         ]:
             if var is None:
                 raise MissingEnvironmentVariable(name)
+        self.notion_pages_table_id = os.getenv("AIRTABLE_TABLE_NOTION_PAGES") or None
+        self.token_refresh_leases_table_id = (
+            os.getenv("AIRTABLE_TABLE_TOKEN_REFRESH_LEASES") or None
+        )
+        self.activity_events_table_id = (
+            os.getenv("AIRTABLE_TABLE_ACTIVITY_EVENTS") or None
+        )
+        # superseded updates could not be dropped : each update of a burst would be synchronized, delayed
+        if (
+            int(os.getenv("UPDATE_DEBOUNCE_SECONDS", 0)) > 0
+            and self.activity_events_table_id is None
+        ):
+            raise MissingEnvironmentVariable("AIRTABLE_TABLE_ACTIVITY_EVENTS")
+        if self.notion_pages_table_id is None:
+            logger.warning(
+                "AIRTABLE_TABLE_NOTION_PAGES is not set : updates query the Notion databases"
+            )
+        if self.token_refresh_leases_table_id is None:
+            logger.warning(
+                "AIRTABLE_TABLE_TOKEN_REFRESH_LEASES is not set : concurrent processes may refresh a token twice"
+            )
 
         self.client = Client(self.pat)
 
@@ -56,8 +87,9 @@ class AirtableDatabase(DatabaseInterface):
             value = [value]
         _filter = ", ".join([f"{k}='{v}'" for k, v in zip(key, value)])
         _filter = f"AND({_filter})"
+        # two records are enough to tell the record is not unique
         records = self.client.list_records(
-            self.base_id, table_id, {"filterByFormula": _filter}
+            self.base_id, table_id, {"filterByFormula": _filter, "maxRecords": 2}
         )["records"]
         if len(records) == 0:
             raise InternalException(
@@ -68,27 +100,6 @@ class AirtableDatabase(DatabaseInterface):
         else:
             raise InternalException(f"{len(records)} records found for {key} : {value}")
 
-    def _record_exist(
-        self, key: Union[str, list[str]], value: Union[str, list[str]], table_id: str
-    ) -> bool:
-        """
-        Check if a record identified with a key, value exists in the table.
-
-        :param key:
-        :param value:
-        :param table_id:
-        :return:
-        """
-        if isinstance(key, str):
-            key = [key]
-            value = [value]
-        _filter = ", ".join([f"{k}='{v}'" for k, v in zip(key, value)])
-        _filter = f"AND({_filter})"
-        records = self.client.list_records(
-            self.base_id, table_id, {"filterByFormula": _filter}
-        )["records"]
-        return len(records) > 0
-
     def get_athlete_accounts(self, athlete_id: str) -> list[str]:
         """
         Retrieve list of user_email for a given Strava account.
@@ -96,11 +107,12 @@ class AirtableDatabase(DatabaseInterface):
         :param athlete_id:
         :return:
         """
-        records = self.client.list_records(
+        records = self.client.iter_records(
             self.base_id,
             self.strava_table_id,
             {"filterByFormula": f"athlete_id='{athlete_id}'"},
-        )["records"]
+            fields=["user_email"],
+        )
 
         return [record["fields"]["user_email"] for record in records]
 
@@ -155,13 +167,14 @@ class AirtableDatabase(DatabaseInterface):
         :param user_email:
         :return: list of dict with keys : bot_id & database_id
         """
-        records = self.client.list_records(
+        records = self.client.iter_records(
             self.base_id,
             self.rel_strava_notion_table_id,
             {
                 "filterByFormula": f"AND(athlete_id='{athlete_id}', user_email='{user_email}')"
             },
-        )["records"]
+            fields=["notion_bot_id", "database_id"],
+        )
 
         return [
             {
@@ -211,18 +224,112 @@ class AirtableDatabase(DatabaseInterface):
             ["athlete_id", "user_email"], [athlete_id, user_email], self.strava_table_id
         )
 
-        username: str = record["fields"].get("username")
+        return self._username(record["fields"])
 
-        if username is not None and username.strip() != "":
-            return username
-        else:
-            return f"{record['fields'].get('firstname')} {record['fields'].get('lastname')}"
+    def get_athlete_context(self, athlete_id: str) -> AthleteContext:
+        """
+        Return the accounts of an athlete with their Strava tokens, username and Notion databases.
+
+        :param athlete_id:
+        :return:
+        """
+        return self.get_athlete_contexts([athlete_id])[athlete_id]
+
+    def get_athlete_contexts(self, athlete_ids: list[str]) -> dict[str, AthleteContext]:
+        """
+        Return the contexts of several athletes.
+
+        Perform a single list records call per table, only the fields used are returned.
+
+        :param athlete_ids:
+        :return: dict with athlete id as key and context as value
+        """
+        athlete_ids = list(dict.fromkeys(athlete_ids))
+        _athlete_filter = ", ".join(
+            [f"athlete_id='{athlete_id}'" for athlete_id in athlete_ids]
+        )
+        _filter = {"filterByFormula": f"OR({_athlete_filter})"}
+        strava_records = list(
+            self.client.iter_records(
+                self.base_id,
+                self.strava_table_id,
+                _filter,
+                fields=[
+                    "athlete_id",
+                    "user_email",
+                    "access_token",
+                    "refresh_token",
+                    "expires_at",
+                    "username",
+                    "firstname",
+                    "lastname",
+                ],
+            )
+        )
+        rel_records = [
+            r
+            for r in self.client.iter_records(
+                self.base_id,
+                self.rel_strava_notion_table_id,
+                _filter,
+                fields=["athlete_id", "user_email", "notion_bot_id", "database_id"],
+            )
+            if r["fields"].get("database_id")
+        ]
+
+        bot_ids = sorted({r["fields"]["notion_bot_id"] for r in rel_records})
+        access_tokens = {}
+        if len(bot_ids) > 0:
+            _bot_filter = ", ".join([f"bot_id='{bot_id}'" for bot_id in bot_ids])
+            notion_records = self.client.iter_records(
+                self.base_id,
+                self.notion_table_id,
+                {"filterByFormula": f"OR({_bot_filter})"},
+                fields=["bot_id", "access_token"],
+            )
+            access_tokens = {
+                r["fields"]["bot_id"]: r["fields"]["access_token"]
+                for r in notion_records
+            }
+
+        contexts = {
+            athlete_id: {"athlete_id": athlete_id, "accounts": []}
+            for athlete_id in athlete_ids
+        }
+        for record in strava_records:
+            fields = record["fields"]
+            athlete_id = str(fields["athlete_id"])
+            user_email = fields["user_email"]
+            contexts[athlete_id]["accounts"].append(
+                {
+                    "user_email": user_email,
+                    "strava_token": {
+                        "access_token": fields["access_token"],
+                        "refresh_token": fields["refresh_token"],
+                        "expires_at": fields["expires_at"],
+                    },
+                    "username": self._username(fields),
+                    "databases": [
+                        {
+                            "bot_id": r["fields"]["notion_bot_id"],
+                            "database_id": r["fields"]["database_id"],
+                            "access_token": access_tokens.get(
+                                r["fields"]["notion_bot_id"]
+                            ),
+                        }
+                        for r in rel_records
+                        if str(r["fields"].get("athlete_id")) == athlete_id
+                        and r["fields"].get("user_email") == user_email
+                    ],
+                }
+            )
+        return contexts
 
     def update_database_id(
         self, user_email: str, athlete_id: str, bot_id: str, database_id: str
     ) -> None:
         """
-        Update the database id in the notion table.
+        Update the database id in the relation table.
 
         :param user_email:
         :param athlete_id:
@@ -230,18 +337,19 @@ class AirtableDatabase(DatabaseInterface):
         :param database_id:
         :return:
         """
-        record_id = self._get_single_record_by_id(
-            ["user_email", "athlete_id", "notion_bot_id"],
-            [user_email, athlete_id, bot_id],
+        self.client.upsert_records(
+            self.base_id,
             self.rel_strava_notion_table_id,
-        )["id"]
-
-        body = {
-            "fields": {"database_id": database_id},
-            "returnFieldsByFieldId": None,
-            "typecast": None,
-        }
-        self.client.update_record(self.base_id, self.notion_table_id, record_id, body)
+            [
+                {
+                    "user_email": user_email,
+                    "athlete_id": athlete_id,
+                    "notion_bot_id": bot_id,
+                    "database_id": database_id,
+                }
+            ],
+            ["user_email", "athlete_id", "notion_bot_id"],
+        )
 
     def add_or_update_strava(
         self,
@@ -257,31 +365,21 @@ class AirtableDatabase(DatabaseInterface):
         :param athlete_info:
         :return:
         """
-        athlete_id = credentials["athlete"]
-        if self._record_exist(
-            ["athlete_id", "user_email"], [athlete_id, user_email], self.strava_table_id
-        ):
-            self.update_strava_credentials(athlete_id, user_email, credentials)
-        else:
-            _fields = {
-                "athlete_id": athlete_id,
-                "user_email": user_email,
-                "username": athlete_info["username"],
-                "firstname": athlete_info["firstname"],
-                "lastname": athlete_info["lastname"],
-                "token_type": "Bearer",
-                "expires_at": credentials["expires_at"],
-                "refresh_token": credentials["refresh_token"],
-                "expires_in": "21600",
-                "access_token": credentials["access_token"],
-            }
-            body = {
-                "fields": _fields,
-                "returnFieldsByFieldId": None,
-                "typecast": None,
-                "records": None,
-            }
-            self.client.create_records(self.base_id, self.strava_table_id, body)
+        _fields = {
+            "athlete_id": credentials["athlete"],
+            "user_email": user_email,
+            "username": athlete_info["username"],
+            "firstname": athlete_info["firstname"],
+            "lastname": athlete_info["lastname"],
+            "token_type": "Bearer",
+            "expires_at": credentials["expires_at"],
+            "refresh_token": credentials["refresh_token"],
+            "expires_in": "21600",
+            "access_token": credentials["access_token"],
+        }
+        self.client.upsert_records(
+            self.base_id, self.strava_table_id, [_fields], ["athlete_id", "user_email"]
+        )
 
     def add_or_update_notion(
         self, credentials: NotionCredentials, user_email: str, athlete_id: str
@@ -315,34 +413,12 @@ class AirtableDatabase(DatabaseInterface):
             "notion_bot_id": bot_id,
             "user_email": user_email,
         }
-        if self._record_exist(
-            ["user_email", "athlete_id", "notion_bot_id"],
-            [user_email, athlete, bot_id],
+        self.client.upsert_records(
+            self.base_id,
             self.rel_strava_notion_table_id,
-        ):
-            record_id = self._get_single_record_by_id(
-                ["user_email", "athlete_id", "notion_bot_id"],
-                [user_email, athlete, bot_id],
-                self.rel_strava_notion_table_id,
-            )["id"]
-            body = {
-                "fields": fields,
-                "returnFieldsByFieldId": None,
-                "typecast": None,
-            }
-            self.client.update_record(
-                self.base_id, self.rel_strava_notion_table_id, record_id, body
-            )
-        else:
-            body = {
-                "fields": fields,
-                "returnFieldsByFieldId": None,
-                "typecast": None,
-                "records": None,
-            }
-            self.client.create_records(
-                self.base_id, self.rel_strava_notion_table_id, body
-            )
+            [fields],
+            ["user_email", "athlete_id", "notion_bot_id"],
+        )
 
     def _add_or_update_notion(
         self, credentials: NotionCredentials, user_email: str
@@ -364,29 +440,255 @@ class AirtableDatabase(DatabaseInterface):
             "workspace_id": credentials["workspace_id"],
             "workspace_name": credentials["workspace_name"],
         }
-        if self._record_exist(
-            ["bot_id", "user_email"],
-            [fields["bot_id"], user_email],
-            self.notion_table_id,
-        ):
-            record_id = self._get_single_record_by_id(
-                ["bot_id", "user_email"],
-                [fields["bot_id"], user_email],
-                self.notion_table_id,
-            )["id"]
-            body = {
-                "fields": fields,
-                "returnFieldsByFieldId": None,
-                "typecast": None,
-            }
-            self.client.update_record(
-                self.base_id, self.notion_table_id, record_id, body
+        self.client.upsert_records(
+            self.base_id, self.notion_table_id, [fields], ["bot_id", "user_email"]
+        )
+
+    def get_notion_page_id(self, database_id: str, activity_id: str) -> Optional[str]:
+        """
+        Return the id of the Notion page of a Strava activity in a database.
+
+        :param database_id:
+        :param activity_id:
+        :return: None if the page is not indexed
+        """
+        page = self.get_notion_page(database_id, activity_id)
+        return page["page_id"] if page is not None else None
+
+    def get_notion_page(
+        self, database_id: str, activity_id: str
+    ) -> Optional[NotionPage]:
+        """
+        Return the indexed Notion page of a Strava activity with the hashes of its last written properties.
+
+        Hashes are stored as JSON in the property_hashes field.
+
+        :param database_id:
+        :param activity_id:
+        :return: None if the page is not indexed
+        """
+        if self.notion_pages_table_id is None:
+            return None
+        records = self.client.list_records(
+            self.base_id,
+            self.notion_pages_table_id,
+            {
+                "filterByFormula": f"AND(database_id='{database_id}', activity_id='{activity_id}')",
+                "maxRecords": 1,
+            },
+        )["records"]
+        if len(records) == 0 or "page_id" not in records[0]["fields"]:
+            return None
+        fields = records[0]["fields"]
+        hashes = fields.get("property_hashes")
+        return {
+            "page_id": fields["page_id"],
+            "property_hashes": json.loads(hashes) if hashes else None,
+        }
+
+    def set_notion_page(
+        self,
+        database_id: str,
+        activity_id: str,
+        page_id: str,
+        property_hashes: dict[str, str],
+    ) -> None:
+        """
+        Index the Notion page of a Strava activity with the hashes of its written properties.
+
+        :param database_id:
+        :param activity_id:
+        :param page_id:
+        :param property_hashes: dict with property name as key and hash as value
+        :return:
+        """
+        if self.notion_pages_table_id is None:
+            return
+        self.client.upsert_records(
+            self.base_id,
+            self.notion_pages_table_id,
+            [
+                {
+                    "database_id": database_id,
+                    "activity_id": activity_id,
+                    "page_id": page_id,
+                    "property_hashes": json.dumps(property_hashes),
+                }
+            ],
+            ["database_id", "activity_id"],
+        )
+
+    def set_notion_page_id(
+        self, database_id: str, activity_id: str, page_id: str
+    ) -> None:
+        """
+        Index the Notion page of a Strava activity in a database.
+
+        :param database_id:
+        :param activity_id:
+        :param page_id:
+        :return:
+        """
+        self.set_notion_page_ids(database_id, {activity_id: page_id})
+
+    def set_notion_page_ids(self, database_id: str, page_ids: dict[str, str]) -> None:
+        """
+        Index the Notion pages of several Strava activities in a database.
+
+        Pages are upserted by batches of 10.
+
+        :param database_id:
+        :param page_ids: dict with activity id as key and page id as value
+        :return:
+        """
+        if self.notion_pages_table_id is None:
+            return
+        self.client.upsert_records(
+            self.base_id,
+            self.notion_pages_table_id,
+            [
+                # hashes of a re-indexed page are unknown
+                {
+                    "database_id": database_id,
+                    "activity_id": a,
+                    "page_id": p,
+                    "property_hashes": None,
+                }
+                for a, p in page_ids.items()
+            ],
+            ["database_id", "activity_id"],
+        )
+
+    def _get_token_refresh_lease(
+        self, athlete_id: str, user_email: str
+    ) -> Optional[dict]:
+        """
+        Return the fields of the lease of an athlete account.
+
+        :param athlete_id:
+        :param user_email:
+        :return: None if there is no lease
+        """
+        records = self.client.list_records(
+            self.base_id,
+            self.token_refresh_leases_table_id,
+            {
+                "filterByFormula": f"AND(athlete_id='{athlete_id}', user_email='{user_email}')",
+                "maxRecords": 1,
+            },
+        )["records"]
+        return records[0]["fields"] if len(records) > 0 else None
+
+    def acquire_token_refresh_lease(
+        self, athlete_id: str, user_email: str, owner: str, seconds: float
+    ) -> bool:
+        """
+        Acquire the lease to refresh the Strava token of an athlete account, across processes.
+
+        Airtable has no conditional write : the lease is written if it is free, then read back to check that
+        no other caller overwrote it. It is a best effort.
+
+        :param athlete_id:
+        :param user_email:
+        :param owner: unique id of the caller
+        :param seconds: duration of the lease
+        :return: True if the lease is acquired
+        """
+        if self.token_refresh_leases_table_id is None:
+            return super().acquire_token_refresh_lease(
+                athlete_id, user_email, owner, seconds
             )
-        else:
-            body = {
-                "fields": fields,
-                "returnFieldsByFieldId": None,
-                "typecast": None,
-                "records": None,
-            }
-            self.client.create_records(self.base_id, self.notion_table_id, body)
+        lease = self._get_token_refresh_lease(athlete_id, user_email)
+        if (
+            lease is not None
+            and lease.get("owner") != owner
+            and float(lease.get("expires_at") or 0) > time.time()
+        ):
+            return False
+        self.client.upsert_records(
+            self.base_id,
+            self.token_refresh_leases_table_id,
+            [
+                {
+                    "athlete_id": athlete_id,
+                    "user_email": user_email,
+                    "owner": owner,
+                    "expires_at": str(time.time() + seconds),
+                }
+            ],
+            ["athlete_id", "user_email"],
+        )
+        lease = self._get_token_refresh_lease(athlete_id, user_email)
+        return lease is not None and lease.get("owner") == owner
+
+    def release_token_refresh_lease(
+        self, athlete_id: str, user_email: str, owner: str
+    ) -> None:
+        """
+        Release the lease to refresh the Strava token of an athlete account, if held by the owner.
+
+        :param athlete_id:
+        :param user_email:
+        :param owner: unique id of the caller
+        :return:
+        """
+        if self.token_refresh_leases_table_id is None:
+            return
+        lease = self._get_token_refresh_lease(athlete_id, user_email)
+        if lease is None or lease.get("owner") != owner:
+            return
+        self.client.upsert_records(
+            self.base_id,
+            self.token_refresh_leases_table_id,
+            [
+                {
+                    "athlete_id": athlete_id,
+                    "user_email": user_email,
+                    "owner": owner,
+                    "expires_at": "0",
+                }
+            ],
+            ["athlete_id", "user_email"],
+        )
+
+    def get_latest_event_time(self, activity_id: str) -> Optional[int]:
+        """
+        Return the time of the latest event received for an activity.
+
+        :param activity_id:
+        :return: unix time of the event, None if unknown
+        """
+        if self.activity_events_table_id is None:
+            return super().get_latest_event_time(activity_id)
+        records = self.client.list_records(
+            self.base_id,
+            self.activity_events_table_id,
+            {"filterByFormula": f"activity_id='{activity_id}'", "maxRecords": 1},
+        )["records"]
+        if len(records) == 0 or records[0]["fields"].get("event_time") is None:
+            return None
+        return int(records[0]["fields"]["event_time"])
+
+    def set_latest_event_time(self, activity_id: str, event_time: int) -> int:
+        """
+        Record the time of an event received for an activity, unless a later event was already recorded.
+
+        Airtable has no conditional write : the time is read then written, concurrent events of an activity
+        may keep an older time. It is a best effort.
+
+        :param activity_id:
+        :param event_time: unix time of the event
+        :return: time of the latest event of the activity
+        """
+        if self.activity_events_table_id is None:
+            return super().set_latest_event_time(activity_id, event_time)
+        latest = self.get_latest_event_time(activity_id)
+        if latest is not None and latest >= event_time:
+            return latest
+        self.client.upsert_records(
+            self.base_id,
+            self.activity_events_table_id,
+            [{"activity_id": activity_id, "event_time": str(event_time)}],
+            ["activity_id"],
+        )
+        return event_time
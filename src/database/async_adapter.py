@@ -0,0 +1,41 @@
+"""Expose any implementation of DatabaseInterface to coroutines."""
+import asyncio
+from typing import Any, Callable, Coroutine
+
+from src.database.interface import DatabaseInterface
+
+
+class AsyncDatabase:
+    """
+    Asyncio adapter of an implementation of DatabaseInterface.
+
+    Each method of DatabaseInterface is exposed as a coroutine function running the method of the backend
+    in a thread of the executor of the event loop, with the context of the caller, see reserve_threads.
+    The semantics of the backend are kept : caching, leases, conditional writes...
+    """
+
+    def __init__(self, database: DatabaseInterface):
+        """
+        Init instance.
+
+        :param database: implementation to adapt
+        """
+        self.database = database
+
+    def __getattr__(self, name: str) -> Callable[..., Coroutine[Any, Any, Any]]:
+        """
+        Return the coroutine function of a method of DatabaseInterface.
+
+        :param name:
+        :return:
+        """
+        if name.startswith("_") or not callable(getattr(DatabaseInterface, name, None)):
+            raise AttributeError(name)
+        method = getattr(self.database, name)
+
+        async def call(*args, **kwargs) -> Any:
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        return call
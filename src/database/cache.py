@@ -0,0 +1,461 @@
+"""Read-through cache wrapping any implementation of DatabaseInterface."""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from src.database.interface import DatabaseInterface
+from src.types.database import AthleteContext, NotionPage, StravaToken
+from src.types.oauth import NotionCredentials, StravaAthleteInfo, StravaCredentials
+
+_MISSING = object()
+
+
+class CachedDatabase(DatabaseInterface):
+    """
+    Concrete implementation of DatabaseInterface caching the reads of another implementation.
+
+    Each read method has its own time to live. The cache is a bounded LRU and writes invalidate
+    the entries they affect.
+    """
+
+    default_ttls = {
+        "get_athlete_accounts": 300,
+        "get_strava_credentials": 300,
+        "list_databases": 600,
+        "get_notion_database_id": 600,
+        "get_notion_access_token": 600,
+        "get_athlete_username": 3600,
+        "get_athlete_context": 300,
+        # the index is written by the processes handling the other events of an activity
+        "get_notion_page": 5,
+    }
+
+    def __init__(
+        self,
+        backend: DatabaseInterface,
+        ttls: Optional[dict[str, float]] = None,
+        max_entries: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Init instance.
+
+        :param backend: database implementation to cache
+        :param ttls: time to live in seconds per method name, overrides default_ttls
+        :param max_entries: maximum number of cached values
+        :param clock: function returning the current time in seconds
+        """
+        self.backend = backend
+        self.ttls = {**self.default_ttls, **(ttls or {})}
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits: dict[str, int] = {method: 0 for method in self.ttls}
+        self.misses: dict[str, int] = {method: 0 for method in self.ttls}
+        self._entries: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, method: str, *args: str) -> Any:
+        """
+        Return a cached value if it is still fresh, counting the hit or the miss.
+
+        :param method: name of the method of the backend
+        :param args: arguments of the method
+        :return: _MISSING if there is no fresh value
+        """
+        key = (method, *args)
+        with self._lock:
+            expires_at, value = self._entries.get(key, (0, _MISSING))
+            if value is not _MISSING and expires_at > self.clock():
+                self._entries.move_to_end(key)
+                self.hits[method] += 1
+                return copy.deepcopy(value)
+            self.misses[method] += 1
+            return _MISSING
+
+    def _store(self, method: str, value: Any, *args: str) -> None:
+        """
+        Cache the value of a read method.
+
+        :param method: name of the method of the backend
+        :param value:
+        :param args: arguments of the method
+        :return:
+        """
+        key = (method, *args)
+        with self._lock:
+            self._entries[key] = (
+                self.clock() + self.ttls[method],
+                copy.deepcopy(value),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _cached(self, method: str, *args: str) -> Any:
+        """
+        Return the value of a read method, from the cache if it is still fresh.
+
+        :param method: name of the method of the backend
+        :param args: arguments of the method
+        :return:
+        """
+        value = self._lookup(method, *args)
+        if value is _MISSING:
+            value = getattr(self.backend, method)(*args)
+            self._store(method, value, *args)
+        return value
+
+    def invalidate(self, method: str, *args: str) -> None:
+        """
+        Drop a cached value.
+
+        :param method: name of the method of the backend
+        :param args: arguments of the method
+        :return:
+        """
+        with self._lock:
+            self._entries.pop((method, *args), None)
+
+    def _invalidate_where(self, method: str, predicate: Callable[[Any], bool]) -> None:
+        """
+        Drop the cached values of a method matching a predicate.
+
+        :param method: name of the method of the backend
+        :param predicate: function receiving a cached value
+        :return:
+        """
+        with self._lock:
+            keys = [
+                key
+                for key, (_, value) in self._entries.items()
+                if key[0] == method and predicate(value)
+            ]
+            for key in keys:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """
+        Drop all cached values.
+
+        :return:
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Return the hits and misses counters per method.
+
+        :return:
+        """
+        with self._lock:
+            return {
+                method: {"hits": self.hits[method], "misses": self.misses[method]}
+                for method in self.ttls
+            }
+
+    def get_athlete_accounts(self, athlete_id: str) -> list[str]:
+        """
+        Return app account for a given Strava athlete id.
+
+        :param athlete_id:
+        :return:
+        """
+        return self._cached("get_athlete_accounts", athlete_id)
+
+    def get_strava_credentials(self, athlete_id: str, user_email: str) -> StravaToken:
+        """
+        Retrieve Strava tokens for a given athlete.
+
+        :param athlete_id:
+        :param user_email:
+        :return:
+        """
+        return self._cached("get_strava_credentials", athlete_id, user_email)
+
+    def update_strava_credentials(
+        self, athlete_id: str, user_email: str, token: StravaToken
+    ) -> None:
+        """
+        Update existing Strava credentials of a user in the database.
+
+        :param athlete_id:
+        :param user_email:
+        :param token:
+        :return:
+        """
+        self.backend.update_strava_credentials(athlete_id, user_email, token)
+        self.invalidate("get_strava_credentials", athlete_id, user_email)
+        self.invalidate("get_athlete_context", athlete_id)
+
+    def get_notion_database_id(
+        self, user_email: str, athlete_id: str, bot_id: str
+    ) -> str:
+        """
+        Return the Notion database id from the bot id.
+
+        :param user_email:
+        :param athlete_id:
+        :param bot_id:
+        :return:
+        """
+        return self._cached("get_notion_database_id", user_email, athlete_id, bot_id)
+
+    def list_databases(self, athlete_id: str, user_email: str) -> list[dict]:
+        """
+        Return a list of Notion databases registered for a Strava athlete id.
+
+        :param athlete_id:
+        :param user_email:
+        :return: list of dict with keys : bot_id & database_id
+        """
+        return self._cached("list_databases", athlete_id, user_email)
+
+    def get_notion_access_token(self, bot_id: str) -> str:
+        """
+        Return the Notion access token.
+
+        :param bot_id:
+        :return:
+        """
+        return self._cached("get_notion_access_token", bot_id)
+
+    def add_or_update_strava(
+        self,
+        credentials: StravaCredentials,
+        user_email: str,
+        athlete_info: StravaAthleteInfo,
+    ) -> None:
+        """
+        Add or update a user strava credentials.
+
+        :param credentials:
+        :param user_email:
+        :param athlete_info:
+        :return:
+        """
+        self.backend.add_or_update_strava(credentials, user_email, athlete_info)
+        athlete_id = credentials["athlete"]
+        self.invalidate("get_athlete_accounts", athlete_id)
+        self.invalidate("get_strava_credentials", athlete_id, user_email)
+        self.invalidate("get_athlete_username", athlete_id, user_email)
+        self.invalidate("get_athlete_context", athlete_id)
+
+    def add_or_update_notion(
+        self, credentials: NotionCredentials, user_email: str, athlete_id: str
+    ) -> None:
+        """
+        Add or update a user Notion credentials.
+
+        :param credentials:
+        :param user_email:
+        :param athlete_id:
+        :return:
+        """
+        self.backend.add_or_update_notion(credentials, user_email, athlete_id)
+        bot_id = credentials["bot_id"]
+        self.invalidate("list_databases", athlete_id, user_email)
+        self.invalidate("get_notion_database_id", user_email, athlete_id, bot_id)
+        self.invalidate("get_notion_access_token", bot_id)
+        self.invalidate("get_athlete_context", athlete_id)
+        # the access token of the integration is shared by the contexts of other athletes
+        self._invalidate_where(
+            "get_athlete_context",
+            lambda context: any(
+                database["bot_id"] == bot_id
+                for account in context["accounts"]
+                for database in account["databases"]
+            ),
+        )
+
+    def update_database_id(
+        self, user_email: str, athlete_id: str, bot_id: str, database_id: str
+    ) -> None:
+        """
+        Update the Strava activities database id.
+
+        :param user_email:
+        :param athlete_id:
+        :param bot_id:
+        :param database_id:
+        :return:
+        """
+        self.backend.update_database_id(user_email, athlete_id, bot_id, database_id)
+        self.invalidate("get_notion_database_id", user_email, athlete_id, bot_id)
+        self.invalidate("list_databases", athlete_id, user_email)
+        self.invalidate("get_athlete_context", athlete_id)
+
+    def get_athlete_username(self, athlete_id: str, user_email: str) -> str:
+        """
+        Return the username of the identified athlete.
+
+        :param athlete_id:
+        :param user_email:
+        :return:
+        """
+        return self._cached("get_athlete_username", athlete_id, user_email)
+
+    def get_athlete_context(self, athlete_id: str) -> AthleteContext:
+        """
+        Return the accounts of an athlete with their Strava tokens, username and Notion databases.
+
+        :param athlete_id:
+        :return:
+        """
+        return self._cached("get_athlete_context", athlete_id)
+
+    def get_athlete_contexts(self, athlete_ids: list[str]) -> dict[str, AthleteContext]:
+        """
+        Return the contexts of several athletes, the athletes missing from the cache are read at once.
+
+        :param athlete_ids:
+        :return: dict with athlete id as key and context as value
+        """
+        contexts = {}
+        missing = []
+        for athlete_id in dict.fromkeys(athlete_ids):
+            context = self._lookup("get_athlete_context", athlete_id)
+            if context is _MISSING:
+                missing.append(athlete_id)
+            else:
+                contexts[athlete_id] = context
+        if len(missing) > 0:
+            for athlete_id, context in self.backend.get_athlete_contexts(
+                missing
+            ).items():
+                self._store("get_athlete_context", context, athlete_id)
+                contexts[athlete_id] = context
+        return contexts
+
+    def get_notion_page_id(self, database_id: str, activity_id: str) -> Optional[str]:
+        """
+        Return the id of the Notion page of a Strava activity in a database.
+
+        :param database_id:
+        :param activity_id:
+        :return: None if the page is not indexed
+        """
+        page = self.get_notion_page(database_id, activity_id)
+        return page["page_id"] if page is not None else None
+
+    def get_notion_page(
+        self, database_id: str, activity_id: str
+    ) -> Optional[NotionPage]:
+        """
+        Return the indexed Notion page of a Strava activity with the hashes of its last written properties.
+
+        A missing page is not cached : it is about to be created and indexed, possibly by another process.
+
+        :param database_id:
+        :param activity_id:
+        :return: None if the page is not indexed
+        """
+        page = self._lookup("get_notion_page", database_id, activity_id)
+        if page is _MISSING:
+            page = self.backend.get_notion_page(database_id, activity_id)
+            if page is not None:
+                self._store("get_notion_page", page, database_id, activity_id)
+        return page
+
+    def set_notion_page_id(
+        self, database_id: str, activity_id: str, page_id: str
+    ) -> None:
+        """
+        Index the Notion page of a Strava activity in a database.
+
+        :param database_id:
+        :param activity_id:
+        :param page_id:
+        :return:
+        """
+        self.backend.set_notion_page_id(database_id, activity_id, page_id)
+        self.invalidate("get_notion_page", database_id, activity_id)
+
+    def set_notion_page_ids(self, database_id: str, page_ids: dict[str, str]) -> None:
+        """
+        Index the Notion pages of several Strava activities in a database.
+
+        :param database_id:
+        :param page_ids: dict with activity id as key and page id as value
+        :return:
+        """
+        self.backend.set_notion_page_ids(database_id, page_ids)
+        for activity_id in page_ids:
+            self.invalidate("get_notion_page", database_id, activity_id)
+
+    def set_notion_page(
+        self,
+        database_id: str,
+        activity_id: str,
+        page_id: str,
+        property_hashes: dict[str, str],
+    ) -> None:
+        """
+        Index the Notion page of a Strava activity with the hashes of its written properties.
+
+        :param database_id:
+        :param activity_id:
+        :param page_id:
+        :param property_hashes: dict with property name as key and hash as value
+        :return:
+        """
+        self.backend.set_notion_page(database_id, activity_id, page_id, property_hashes)
+        self.invalidate("get_notion_page", database_id, activity_id)
+
+    def acquire_token_refresh_lease(
+        self, athlete_id: str, user_email: str, owner: str, seconds: float
+    ) -> bool:
+        """
+        Acquire the lease to refresh the Strava token of an athlete account, across processes.
+
+        The cached credentials are dropped : whoever holds the lease, the token is about to be rotated
+        and the next read must see the stored one.
+
+        :param athlete_id:
+        :param user_email:
+        :param owner: unique id of the caller
+        :param seconds: duration of the lease
+        :return: True if the lease is acquired
+        """
+        acquired = self.backend.acquire_token_refresh_lease(
+            athlete_id, user_email, owner, seconds
+        )
+        self.invalidate("get_strava_credentials", athlete_id, user_email)
+        self.invalidate("get_athlete_context", athlete_id)
+        return acquired
+
+    def release_token_refresh_lease(
+        self, athlete_id: str, user_email: str, owner: str
+    ) -> None:
+        """
+        Release the lease to refresh the Strava token of an athlete account, if held by the owner.
+
+        :param athlete_id:
+        :param user_email:
+        :param owner: unique id of the caller
+        :return:
+        """
+        self.backend.release_token_refresh_lease(athlete_id, user_email, owner)
+
+    def get_latest_event_time(self, activity_id: str) -> Optional[int]:
+        """
+        Return the time of the latest event received for an activity.
+
+        It is not cached : it is written by another process.
+
+        :param activity_id:
+        :return: unix time of the event, None if unknown
+        """
+        return self.backend.get_latest_event_time(activity_id)
+
+    def set_latest_event_time(self, activity_id: str, event_time: int) -> int:
+        """
+        Record the time of an event received for an activity, unless a later event was already recorded.
+
+        :param activity_id:
+        :param event_time: unix time of the event
+        :return: time of the latest event of the activity
+        """
+        return self.backend.set_latest_event_time(activity_id, event_time)
@@ -1,8 +1,10 @@
 """Declare the database interface."""
 from abc import ABC, abstractmethod
+from typing import Optional
 
-from src.types.database import StravaToken
+from src.types.database import AthleteContext, NotionPage, StravaToken
 from src.types.oauth import NotionCredentials, StravaAthleteInfo, StravaCredentials
+from src.utils.exceptions import InternalException
 
 
 class DatabaseInterface(ABC):
@@ -131,3 +133,193 @@ class DatabaseInterface(ABC):
         :return:
         """
         pass
+
+    @staticmethod
+    def _username(fields: dict) -> str:
+        """
+        Return the username of a record of the Strava table.
+
+        Fall back on the first name and last name if the username is not set.
+
+        :param fields:
+        :return:
+        """
+        username: str = fields.get("username")
+
+        if username is not None and username.strip() != "":
+            return username
+        else:
+            return f"{fields.get('firstname')} {fields.get('lastname')}"
+
+    def get_athlete_context(self, athlete_id: str) -> AthleteContext:
+        """
+        Return the accounts of an athlete with their Strava tokens, username and Notion databases.
+
+        This default implementation composes the other methods, concrete classes should override it
+        to fetch everything in as few calls as possible.
+        The access token of a database is None if the credentials of its integration are missing.
+
+        :param athlete_id:
+        :return:
+        """
+        accounts = []
+        for user_email in self.get_athlete_accounts(athlete_id):
+            databases = []
+            for database in self.list_databases(athlete_id, user_email):
+                try:
+                    access_token = self.get_notion_access_token(database["bot_id"])
+                except InternalException:
+                    access_token = None
+                databases.append({**database, "access_token": access_token})
+            accounts.append(
+                {
+                    "user_email": user_email,
+                    "strava_token": self.get_strava_credentials(athlete_id, user_email),
+                    "username": self.get_athlete_username(athlete_id, user_email),
+                    "databases": databases,
+                }
+            )
+        return {"athlete_id": athlete_id, "accounts": accounts}
+
+    def get_athlete_contexts(self, athlete_ids: list[str]) -> dict[str, AthleteContext]:
+        """
+        Return the contexts of several athletes, see get_athlete_context.
+
+        This default implementation reads the athletes one by one, concrete classes should override it
+        to read all athletes at once.
+
+        :param athlete_ids:
+        :return: dict with athlete id as key and context as value
+        """
+        return {
+            athlete_id: self.get_athlete_context(athlete_id)
+            for athlete_id in dict.fromkeys(athlete_ids)
+        }
+
+    def get_notion_page_id(self, database_id: str, activity_id: str) -> Optional[str]:
+        """
+        Return the id of the Notion page of a Strava activity in a database.
+
+        The index of pages is optional, this default implementation never finds a page.
+
+        :param database_id:
+        :param activity_id:
+        :return: None if the page is not indexed
+        """
+        return None
+
+    def set_notion_page_id(
+        self, database_id: str, activity_id: str, page_id: str
+    ) -> None:
+        """
+        Index the Notion page of a Strava activity in a database.
+
+        The index of pages is optional, this default implementation does nothing.
+
+        :param database_id:
+        :param activity_id:
+        :param page_id:
+        :return:
+        """
+
+    def set_notion_page_ids(self, database_id: str, page_ids: dict[str, str]) -> None:
+        """
+        Index the Notion pages of several Strava activities in a database.
+
+        :param database_id:
+        :param page_ids: dict with activity id as key and page id as value
+        :return:
+        """
+        for activity_id, page_id in page_ids.items():
+            self.set_notion_page_id(database_id, activity_id, page_id)
+
+    def get_notion_page(
+        self, database_id: str, activity_id: str
+    ) -> Optional[NotionPage]:
+        """
+        Return the indexed Notion page of a Strava activity with the hashes of its last written properties.
+
+        This default implementation does not store hashes.
+
+        :param database_id:
+        :param activity_id:
+        :return: None if the page is not indexed
+        """
+        page_id = self.get_notion_page_id(database_id, activity_id)
+        if page_id is None:
+            return None
+        return {"page_id": page_id, "property_hashes": None}
+
+    def set_notion_page(
+        self,
+        database_id: str,
+        activity_id: str,
+        page_id: str,
+        property_hashes: dict[str, str],
+    ) -> None:
+        """
+        Index the Notion page of a Strava activity with the hashes of its written properties.
+
+        This default implementation does not store hashes.
+
+        :param database_id:
+        :param activity_id:
+        :param page_id:
+        :param property_hashes: dict with property name as key and hash as value
+        :return:
+        """
+        self.set_notion_page_id(database_id, activity_id, page_id)
+
+    def acquire_token_refresh_lease(
+        self, athlete_id: str, user_email: str, owner: str, seconds: float
+    ) -> bool:
+        """
+        Acquire the lease to refresh the Strava token of an athlete account, across processes.
+
+        The lease is acquired if it is free, expired or already held by the owner.
+        This default implementation always grants the lease.
+
+        :param athlete_id:
+        :param user_email:
+        :param owner: unique id of the caller
+        :param seconds: duration of the lease
+        :return: True if the lease is acquired
+        """
+        return True
+
+    def release_token_refresh_lease(
+        self, athlete_id: str, user_email: str, owner: str
+    ) -> None:
+        """
+        Release the lease to refresh the Strava token of an athlete account, if held by the owner.
+
+        This default implementation does nothing.
+
+        :param athlete_id:
+        :param user_email:
+        :param owner: unique id of the caller
+        :return:
+        """
+
+    def get_latest_event_time(self, activity_id: str) -> Optional[int]:
+        """
+        Return the time of the latest event received for an activity.
+
+        This default implementation does not record the events.
+
+        :param activity_id:
+        :return: unix time of the event, None if unknown
+        """
+        return None
+
+    def set_latest_event_time(self, activity_id: str, event_time: int) -> int:
+        """
+        Record the time of an event received for an activity, unless a later event was already recorded.
+
+        This default implementation does not record the events.
+
+        :param activity_id:
+        :param event_time: unix time of the event
+        :return: time of the latest event of the activity
+        """
+        return event_time
@@ -0,0 +1,589 @@
+"""Concrete implementation of database with an embedded SQLite file."""
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+from src.database.interface import DatabaseInterface
+from src.types.database import AthleteContext, NotionPage, StravaToken
+from src.types.oauth import NotionCredentials, StravaAthleteInfo, StravaCredentials
+from src.utils.exceptions import InternalException
+
+TABLES = {
+    "strava": [
+        "athlete_id",
+        "user_email",
+        "username",
+        "firstname",
+        "lastname",
+        "token_type",
+        "expires_at",
+        "refresh_token",
+        "expires_in",
+        "access_token",
+    ],
+    "rel_strava_notion": ["user_email", "athlete_id", "notion_bot_id", "database_id"],
+    "notion": [
+        "bot_id",
+        "user_email",
+        "access_token",
+        "duplicated_template_id",
+        "owner",
+        "workspace_icon",
+        "workspace_id",
+        "workspace_name",
+    ],
+    "notion_pages": ["database_id", "activity_id", "page_id", "property_hashes"],
+    "token_refresh_leases": ["athlete_id", "user_email", "owner", "expires_at"],
+    "activity_events": ["activity_id", "event_time"],
+}
+
+SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{c} TEXT' for c in columns)})"
+    for table, columns in TABLES.items()
+] + [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_strava_athlete_user "
+    "ON strava (athlete_id, user_email)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_rel_user_athlete_bot "
+    "ON rel_strava_notion (user_email, athlete_id, notion_bot_id)",
+    "CREATE INDEX IF NOT EXISTS idx_rel_athlete ON rel_strava_notion (athlete_id)",
+    # unique on (bot_id, user_email) to upsert, bot_id leads to serve lookups by bot_id
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_notion_bot_id ON notion (bot_id, user_email)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_notion_pages_database_activity "
+    "ON notion_pages (database_id, activity_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_token_refresh_leases_athlete_user "
+    "ON token_refresh_leases (athlete_id, user_email)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_activity_events_activity "
+    "ON activity_events (activity_id)",
+]
+
+
+class SqliteDatabase(DatabaseInterface):
+    """
+    Concrete implementation of DatabaseInterface.
+
+    This implementation uses a SQLite file with the same tables as the airtable base.
+    Each thread uses its own connection, the database is in WAL mode so that readers do not block the writer.
+    """
+
+    def __init__(self, path: str):
+        """
+        Init instance.
+
+        :param path: path of the SQLite file, created if it does not exist
+        """
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            # add the columns missing from files created by a previous version
+            for table, columns in TABLES.items():
+                existing = {
+                    row["name"]
+                    for row in connection.execute(f"PRAGMA table_info({table})")
+                }
+                for column in columns:
+                    if column not in existing:
+                        connection.execute(
+                            f"ALTER TABLE {table} ADD COLUMN {column} TEXT"
+                        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Return the connection of the current thread.
+
+        :return:
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _query(self, sql: str, parameters: Iterable[Any] = ()) -> list[sqlite3.Row]:
+        """
+        Execute a read query and return all rows.
+
+        :param sql:
+        :param parameters:
+        :return:
+        """
+        return self._connection().execute(sql, tuple(parameters)).fetchall()
+
+    def _execute(self, sql: str, parameters: Iterable[Any] = ()) -> int:
+        """
+        Execute a write query in a transaction.
+
+        :param sql:
+        :param parameters:
+        :return: number of modified rows
+        """
+        with self._connection() as connection:
+            return connection.execute(sql, tuple(parameters)).rowcount
+
+    def _single_row(self, sql: str, parameters: Iterable[Any] = ()) -> sqlite3.Row:
+        """
+        Return the single row of a read query.
+
+        :param sql:
+        :param parameters:
+        :return:
+        """
+        rows = self._query(sql, parameters)
+        if len(rows) == 0:
+            raise InternalException(f"no row found for {tuple(parameters)}")
+        return rows[0]
+
+    def import_rows(self, table: str, rows: list[dict]) -> None:
+        """
+        Insert or replace rows in a table.
+
+        Unknown keys are ignored, it is used to import the records of another backend.
+
+        :param table: name of the table, one of TABLES
+        :param rows: list of dict with column names as keys
+        :return:
+        """
+        columns = TABLES[table]
+        sql = (
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        with self._connection() as connection:
+            connection.executemany(
+                sql, [tuple(row.get(column) for column in columns) for row in rows]
+            )
+
+    def get_athlete_accounts(self, athlete_id: str) -> list[str]:
+        """
+        Retrieve list of user_email for a given Strava account.
+
+        :param athlete_id:
+        :return:
+        """
+        rows = self._query(
+            "SELECT user_email FROM strava WHERE athlete_id = ?", [athlete_id]
+        )
+        return [row["user_email"] for row in rows]
+
+    def get_strava_credentials(self, athlete_id: str, user_email: str) -> StravaToken:
+        """
+        Fetch Strava tokens.
+
+        :param athlete_id:
+        :param user_email:
+        :return:
+        """
+        row = self._single_row(
+            "SELECT access_token, refresh_token, expires_at FROM strava "
+            "WHERE athlete_id = ? AND user_email = ?",
+            [athlete_id, user_email],
+        )
+        return dict(row)
+
+    def update_strava_credentials(
+        self, athlete_id: str, user_email: str, token: StravaToken
+    ) -> None:
+        """
+        Update the strava credentials with refresh token.
+
+        :param athlete_id:
+        :param user_email:
+        :param token:
+        :return:
+        """
+        updated = self._execute(
+            "UPDATE strava SET access_token = ?, refresh_token = ?, expires_at = ? "
+            "WHERE athlete_id = ? AND user_email = ?",
+            [
+                token["access_token"],
+                token["refresh_token"],
+                str(token["expires_at"]),
+                athlete_id,
+                user_email,
+            ],
+        )
+        if updated == 0:
+            raise InternalException(
+                f"no Strava credentials for athlete {athlete_id} and {user_email}"
+            )
+
+    def list_databases(self, athlete_id: str, user_email: str) -> list[dict]:
+        """
+        Return a list of Notion databases registered for a Strava athlete id.
+
+        :param athlete_id:
+        :param user_email:
+        :return: list of dict with keys : bot_id & database_id
+        """
+        rows = self._query(
+            "SELECT notion_bot_id AS bot_id, database_id FROM rel_strava_notion "
+            "WHERE user_email = ? AND athlete_id = ? AND database_id IS NOT NULL",
+            [user_email, athlete_id],
+        )
+        return [dict(row) for row in rows]
+
+    def get_notion_database_id(
+        self, user_email: str, athlete_id: str, bot_id: str
+    ) -> str:
+        """
+        Return the Notion database id from the bot id.
+
+        :param user_email:
+        :param athlete_id:
+        :param bot_id:
+        :return:
+        """
+        row = self._single_row(
+            "SELECT database_id FROM rel_strava_notion "
+            "WHERE user_email = ? AND athlete_id = ? AND notion_bot_id = ?",
+            [user_email, athlete_id, bot_id],
+        )
+        return row["database_id"]
+
+    def get_notion_access_token(self, bot_id: str) -> str:
+        """
+        Return the Notion access token.
+
+        :param bot_id:
+        :return:
+        """
+        row = self._single_row(
+            "SELECT access_token FROM notion WHERE bot_id = ? LIMIT 1", [bot_id]
+        )
+        return row["access_token"]
+
+    def get_athlete_username(self, athlete_id: str, user_email: str) -> str:
+        """
+        Return the Strava username.
+
+        :param athlete_id:
+        :param user_email:
+        :return:
+        """
+        row = self._single_row(
+            "SELECT username, firstname, lastname FROM strava "
+            "WHERE athlete_id = ? AND user_email = ?",
+            [athlete_id, user_email],
+        )
+        return self._username(dict(row))
+
+    def update_database_id(
+        self, user_email: str, athlete_id: str, bot_id: str, database_id: str
+    ) -> None:
+        """
+        Update the database id in the relation table.
+
+        :param user_email:
+        :param athlete_id:
+        :param bot_id:
+        :param database_id:
+        :return:
+        """
+        self._execute(
+            "UPDATE rel_strava_notion SET database_id = ? "
+            "WHERE user_email = ? AND athlete_id = ? AND notion_bot_id = ?",
+            [database_id, user_email, athlete_id, bot_id],
+        )
+
+    def add_or_update_strava(
+        self,
+        credentials: StravaCredentials,
+        user_email: str,
+        athlete_info: StravaAthleteInfo,
+    ) -> None:
+        """
+        Add or update the Strava table.
+
+        :param credentials:
+        :param user_email:
+        :param athlete_info:
+        :return:
+        """
+        self._execute(
+            "INSERT INTO strava (athlete_id, user_email, username, firstname, lastname, token_type, "
+            "expires_at, refresh_token, expires_in, access_token) "
+            "VALUES (?, ?, ?, ?, ?, 'Bearer', ?, ?, '21600', ?) "
+            "ON CONFLICT (athlete_id, user_email) DO UPDATE SET "
+            "access_token = excluded.access_token, refresh_token = excluded.refresh_token, "
+            "expires_at = excluded.expires_at",
+            [
+                str(credentials["athlete"]),
+                user_email,
+                athlete_info["username"],
+                athlete_info["firstname"],
+                athlete_info["lastname"],
+                str(credentials["expires_at"]),
+                credentials["refresh_token"],
+                credentials["access_token"],
+            ],
+        )
+
+    def add_or_update_notion(
+        self, credentials: NotionCredentials, user_email: str, athlete_id: str
+    ) -> None:
+        """
+        Add credentials to database.
+
+        :param credentials:
+        :param user_email:
+        :param athlete_id:
+        :return:
+        """
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO rel_strava_notion (user_email, athlete_id, notion_bot_id) "
+                "VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+                [user_email, str(athlete_id), credentials["bot_id"]],
+            )
+            connection.execute(
+                "INSERT INTO notion (bot_id, user_email, access_token, duplicated_template_id, owner, "
+                "workspace_icon, workspace_id, workspace_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (bot_id, user_email) DO UPDATE SET "
+                "access_token = excluded.access_token, "
+                "duplicated_template_id = excluded.duplicated_template_id, "
+                "owner = excluded.owner, workspace_icon = excluded.workspace_icon, "
+                "workspace_id = excluded.workspace_id, workspace_name = excluded.workspace_name",
+                [
+                    credentials["bot_id"],
+                    user_email,
+                    credentials["access_token"],
+                    credentials["duplicated_template_id"],
+                    json.dumps(credentials["owner"]),
+                    credentials["workspace_icon"],
+                    credentials["workspace_id"],
+                    credentials["workspace_name"],
+                ],
+            )
+
+    def get_athlete_context(self, athlete_id: str) -> AthleteContext:
+        """
+        Return the accounts of an athlete with their Strava tokens, username and Notion databases.
+
+        :param athlete_id:
+        :return:
+        """
+        return self.get_athlete_contexts([athlete_id])[athlete_id]
+
+    def get_athlete_contexts(self, athlete_ids: list[str]) -> dict[str, AthleteContext]:
+        """
+        Return the contexts of several athletes with one query per table.
+
+        :param athlete_ids:
+        :return: dict with athlete id as key and context as value
+        """
+        athlete_ids = list(dict.fromkeys(athlete_ids))
+        placeholders = ", ".join("?" for _ in athlete_ids)
+        strava_rows = self._query(
+            f"SELECT * FROM strava WHERE athlete_id IN ({placeholders})", athlete_ids
+        )
+        database_rows = self._query(
+            "SELECT r.athlete_id, r.user_email, r.notion_bot_id AS bot_id, r.database_id, "
+            "(SELECT n.access_token FROM notion n WHERE n.bot_id = r.notion_bot_id LIMIT 1) "
+            "AS access_token "
+            f"FROM rel_strava_notion r WHERE r.athlete_id IN ({placeholders}) "
+            "AND r.database_id IS NOT NULL",
+            athlete_ids,
+        )
+        contexts = {
+            athlete_id: {"athlete_id": athlete_id, "accounts": []}
+            for athlete_id in athlete_ids
+        }
+        for row in strava_rows:
+            contexts[row["athlete_id"]]["accounts"].append(
+                {
+                    "user_email": row["user_email"],
+                    "strava_token": {
+                        "access_token": row["access_token"],
+                        "refresh_token": row["refresh_token"],
+                        "expires_at": row["expires_at"],
+                    },
+                    "username": self._username(dict(row)),
+                    "databases": [
+                        {
+                            "bot_id": r["bot_id"],
+                            "database_id": r["database_id"],
+                            "access_token": r["access_token"],
+                        }
+                        for r in database_rows
+                        if r["athlete_id"] == row["athlete_id"]
+                        and r["user_email"] == row["user_email"]
+                    ],
+                }
+            )
+        return contexts
+
+    def get_notion_page_id(self, database_id: str, activity_id: str) -> Optional[str]:
+        """
+        Return the id of the Notion page of a Strava activity in a database.
+
+        :param database_id:
+        :param activity_id:
+        :return: None if the page is not indexed
+        """
+        page = self.get_notion_page(database_id, activity_id)
+        return page["page_id"] if page is not None else None
+
+    def get_notion_page(
+        self, database_id: str, activity_id: str
+    ) -> Optional[NotionPage]:
+        """
+        Return the indexed Notion page of a Strava activity with the hashes of its last written properties.
+
+        :param database_id:
+        :param activity_id:
+        :return: None if the page is not indexed
+        """
+        rows = self._query(
+            "SELECT page_id, property_hashes FROM notion_pages "
+            "WHERE database_id = ? AND activity_id = ?",
+            [database_id, activity_id],
+        )
+        if len(rows) == 0:
+            return None
+        hashes = rows[0]["property_hashes"]
+        return {
+            "page_id": rows[0]["page_id"],
+            "property_hashes": json.loads(hashes) if hashes is not None else None,
+        }
+
+    def set_notion_page(
+        self,
+        database_id: str,
+        activity_id: str,
+        page_id: str,
+        property_hashes: dict[str, str],
+    ) -> None:
+        """
+        Index the Notion page of a Strava activity with the hashes of its written properties.
+
+        :param database_id:
+        :param activity_id:
+        :param page_id:
+        :param property_hashes: dict with property name as key and hash as value
+        :return:
+        """
+        self.import_rows(
+            "notion_pages",
+            [
+                {
+                    "database_id": database_id,
+                    "activity_id": activity_id,
+                    "page_id": page_id,
+                    "property_hashes": json.dumps(property_hashes),
+                }
+            ],
+        )
+
+    def set_notion_page_id(
+        self, database_id: str, activity_id: str, page_id: str
+    ) -> None:
+        """
+        Index the Notion page of a Strava activity in a database.
+
+        :param database_id:
+        :param activity_id:
+        :param page_id:
+        :return:
+        """
+        self.set_notion_page_ids(database_id, {activity_id: page_id})
+
+    def set_notion_page_ids(self, database_id: str, page_ids: dict[str, str]) -> None:
+        """
+        Index the Notion pages of several Strava activities in a database.
+
+        :param database_id:
+        :param page_ids: dict with activity id as key and page id as value
+        :return:
+        """
+        self.import_rows(
+            "notion_pages",
+            [
+                {"database_id": database_id, "activity_id": a, "page_id": p}
+                for a, p in page_ids.items()
+            ],
+        )
+
+    def acquire_token_refresh_lease(
+        self, athlete_id: str, user_email: str, owner: str, seconds: float
+    ) -> bool:
+        """
+        Acquire the lease to refresh the Strava token of an athlete account, across processes.
+
+        The lease is taken with a single conditional upsert, so that only one caller acquires it.
+
+        :param athlete_id:
+        :param user_email:
+        :param owner: unique id of the caller
+        :param seconds: duration of the lease
+        :return: True if the lease is acquired
+        """
+        now = time.time()
+        return (
+            self._execute(
+                "INSERT INTO token_refresh_leases (athlete_id, user_email, owner, expires_at) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (athlete_id, user_email) DO UPDATE "
+                "SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE CAST(token_refresh_leases.expires_at AS REAL) < ? "
+                "OR token_refresh_leases.owner = excluded.owner",
+                [athlete_id, user_email, owner, now + seconds, now],
+            )
+            == 1
+        )
+
+    def release_token_refresh_lease(
+        self, athlete_id: str, user_email: str, owner: str
+    ) -> None:
+        """
+        Release the lease to refresh the Strava token of an athlete account, if held by the owner.
+
+        :param athlete_id:
+        :param user_email:
+        :param owner: unique id of the caller
+        :return:
+        """
+        self._execute(
+            "DELETE FROM token_refresh_leases "
+            "WHERE athlete_id = ? AND user_email = ? AND owner = ?",
+            [athlete_id, user_email, owner],
+        )
+
+    def get_latest_event_time(self, activity_id: str) -> Optional[int]:
+        """
+        Return the time of the latest event received for an activity.
+
+        :param activity_id:
+        :return: unix time of the event, None if unknown
+        """
+        rows = self._query(
+            "SELECT event_time FROM activity_events WHERE activity_id = ?",
+            [activity_id],
+        )
+        return int(rows[0]["event_time"]) if len(rows) > 0 else None
+
+    def set_latest_event_time(self, activity_id: str, event_time: int) -> int:
+        """
+        Record the time of an event received for an activity, unless a later event was already recorded.
+
+        :param activity_id:
+        :param event_time: unix time of the event
+        :return: time of the latest event of the activity
+        """
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO activity_events (activity_id, event_time) VALUES (?, ?) "
+                "ON CONFLICT (activity_id) DO UPDATE SET event_time = excluded.event_time "
+                "WHERE CAST(activity_events.event_time AS INTEGER) < CAST(excluded.event_time AS INTEGER)",
+                [activity_id, event_time],
+            )
+            row = connection.execute(
+                "SELECT event_time FROM activity_events WHERE activity_id = ?",
+                [activity_id],
+            ).fetchone()
+        return int(row["event_time"])
@@ -6,7 +6,8 @@ An abstract class Action with a method run is defined. Exemple of actions :
 - UpdateActivity : when an activity is updated, update changed properties
 - DeleteActivity
 - ...
+The asyncio engine and its actions are in the modules async_pipeline and async_actions, imported when used.
 """
-from src.handlers.actions.action import Action
+from src.handlers.actions.action import Action, Pipeline
 from src.handlers.actions.create_activity import CreateActivity
 from src.handlers.actions.update_activity import UpdateActivity
@@ -1,31 +1,666 @@
-"""Implement an abstract class Action."""
+"""Implement an abstract class Action and the pipeline running actions over a batch of events."""
+import logging
 from abc import abstractmethod
+from typing import Any, Callable, Hashable, Optional
 
+from src.const import STRAVA_ACTIVITY_FIELDS
 from src.database.interface import DatabaseInterface
+from src.handlers.ledger import TargetLedger
+from src.notion.client import Client as NotionClient
+from src.notion.properties import build_properties_many
+from src.notion.utils import property_hashes
+from src.registry import ClientRegistry, get_registry
+from src.strava.rate_limit import Priority, request_scope
 from src.types.action import RunReturn
+from src.types.database import AthleteContext, NotionDatabase
+from src.utils.deadline import check_deadline, remaining
+from src.utils.exceptions import (
+    InternalException,
+    PartialFailure,
+    RateLimitExceeded,
+    WorkDeferred,
+)
+from src.utils.executor import KeyedExecutor, TaskOutcome
+from src.utils.metrics import METRICS
+from src.workflows import refresh_strava_token
+
+logger = logging.getLogger()
 
 
 class Action:
-    """Abstract class to handle response to Strava events."""
+    """
+    Abstract class to handle response to Strava events.
+
+    An action is run in stages by Pipeline : prepare the targets, fetch the activity, build its properties
+    and write each target. Concrete classes implement the stages specific to the event.
+    """
 
     def __init__(
-        self, owner_id: str, object_id: str, database_client: DatabaseInterface
+        self,
+        owner_id: str,
+        object_id: str,
+        database_client: DatabaseInterface,
+        registry: Optional[ClientRegistry] = None,
+        updates: Optional[dict[str, str]] = None,
+        ledger: Optional[TargetLedger] = None,
+        priority: Priority = Priority.REALTIME,
     ):
         """
         Init instance.
 
         :param owner_id: Strava user's id
         :param object_id: id of Strava object relative to the event (either an activity id or an athlete id)
+        :param database_client:
+        :param registry: registry providing the API clients, the shared one by default
+        :param updates: updates carried by the Strava event, if any
+        :param ledger: ledger of the targets of the event, if given the targets which already succeeded are
+         skipped and the failure of a target raises PartialFailure
+        :param priority: priority of the Strava requests, background requests are deferred first
         """
         self.owner_id = owner_id
         self.object_id = object_id
         self.database = database_client
+        self.registry = registry or get_registry()
+        self.updates = updates
+        self.ledger = ledger
+        self.priority = priority
+        self.message: list[str] = []
+        self.failed_targets: list[str] = []
+        # targets recorded in the ledger by this run
+        self.done_targets: list[str] = []
+
+    def _pending_context(self, context: AthleteContext) -> AthleteContext:
+        """
+        Return the context restricted to the targets which did not succeed yet.
+
+        :param context:
+        :return:
+        """
+        if self.ledger is None:
+            return context
+        accounts = []
+        for account_context in context["accounts"]:
+            databases = [
+                database
+                for database in account_context["databases"]
+                if not self.ledger.is_done(
+                    TargetLedger.target(account_context["user_email"], database)
+                )
+            ]
+            if len(databases) > 0:
+                accounts.append({**account_context, "databases": databases})
+        return {**context, "accounts": accounts}
+
+    def _target_succeeded(self, user_email: str, database: NotionDatabase) -> None:
+        """
+        Record the success of a target in the ledger.
+
+        A failure is only logged, the target would be written again on retry.
+
+        :param user_email:
+        :param database:
+        :return:
+        """
+        if self.ledger is None:
+            return
+        target = TargetLedger.target(user_email, database)
+        try:
+            self.ledger.mark_done(target)
+            self.done_targets.append(target)
+        except Exception:
+            logger.exception(
+                f"failed to record target of event {self.ledger.event_key}"
+            )
+
+    def forget_targets(self) -> None:
+        """
+        Forget the targets recorded in the ledger by this run, so that a retry of the event writes them again.
+
+        :return:
+        """
+        if self.ledger is None:
+            return
+        for target in self.done_targets:
+            self.ledger.forget(target)
+        self.done_targets = []
+
+    def _result(self, message: list[str], failed_targets: list[str]) -> RunReturn:
+        """
+        Return the result of the action, raise PartialFailure if a target failed and a ledger is used.
+
+        :param message:
+        :param failed_targets:
+        :return:
+        """
+        if len(failed_targets) > 0 and self.ledger is not None:
+            raise PartialFailure(failed_targets, "\n".join(message))
+        return {"code": 200, "message": "\n".join(message)}
+
+    def _notion_client(self, database: NotionDatabase) -> NotionClient:
+        """
+        Return the Notion client of the integration of a database.
+
+        :param database:
+        :return:
+        """
+        if database["access_token"] is None:
+            raise InternalException(
+                f"no Notion credentials found for bot_id {database['bot_id']}"
+            )
+        return self.registry.notion_client(database["bot_id"], database["access_token"])
+
+    def _fetch_activity(self, context: AthleteContext) -> dict:
+        """
+        Fetch the activity once, with the first account whose Strava token is valid.
+
+        The activity is projected on STRAVA_ACTIVITY_FIELDS.
+
+        :param context:
+        :return:
+        """
+        errors = []
+        for account_context in context["accounts"]:
+            account = account_context["user_email"]
+            try:
+                strava_client = self.registry.strava_client(
+                    self.owner_id, account, account_context["strava_token"]
+                )
+                with request_scope(self.owner_id, self.priority):
+                    refresh_strava_token(
+                        self.owner_id,
+                        account,
+                        strava_client,
+                        self.database,
+                        self.registry.token_manager,
+                    )
+                    activity = strava_client.get_activity(self.object_id)
+                return {k: activity[k] for k in STRAVA_ACTIVITY_FIELDS}
+            except (RateLimitExceeded, WorkDeferred):
+                # the other accounts share the rate limits of the application
+                raise
+            except Exception as e:
+                errors.append(f"account {account}: {e}")
+        raise InternalException(
+            f"activity {self.object_id} could not be fetched: {'; '.join(errors)}"
+        )
+
+    def _index_page(
+        self,
+        database_id: str,
+        page_id: str,
+        properties: dict,
+        hashes: Optional[dict[str, str]] = None,
+    ) -> None:
+        """
+        Record the Notion page of the activity and the hashes of its written properties in the index of pages.
+
+        A failure is only logged since the page itself was written.
+
+        :param database_id:
+        :param page_id:
+        :param properties: properties written on the page
+        :param hashes: hashes to index, those of properties by default
+        :return:
+        """
+        try:
+            self.database.set_notion_page(
+                database_id,
+                self.object_id,
+                page_id,
+                hashes if hashes is not None else property_hashes(properties),
+            )
+        except Exception:
+            logger.exception(
+                f"failed to index page {page_id} of activity {self.object_id}"
+            )
+
+    def prepare(self, context: AthleteContext) -> AthleteContext:
+        """
+        Handle the targets which do not need the activity, before it is fetched.
+
+        Messages and failed targets are appended to self.message and self.failed_targets.
+        This default implementation keeps every target.
+
+        :param context: context restricted to the pending targets
+        :return: context restricted to the targets left to write
+        """
+        return context
 
     @abstractmethod
-    def run(self) -> RunReturn:
+    def write(
+        self,
+        notion_client: NotionClient,
+        user_email: str,
+        database: NotionDatabase,
+        properties: dict,
+    ) -> str:
         """
-        Execute the action.
+        Write the activity on a target.
 
         Implemented by concrete classes
+
+        :param notion_client: client of the integration of the database
+        :param user_email:
+        :param database:
+        :param properties: properties of the activity for the account
+        :return: message
         """
         pass
+
+    @abstractmethod
+    def write_failed(
+        self, user_email: str, database: NotionDatabase, exception: Exception
+    ) -> str:
+        """
+        Return the message of a target whose write failed.
+
+        Implemented by concrete classes
+
+        :param user_email:
+        :param database:
+        :param exception:
+        :return:
+        """
+        pass
+
+    def run(self) -> RunReturn:
+        """
+        Execute the action alone, see Pipeline.
+
+        :return:
+        """
+        outcome = Pipeline(self.database, self.registry).run([self])[0]
+        if outcome["exception"] is not None:
+            raise outcome["exception"]
+        return outcome["result"]
+
+
+class Pipeline:
+    """
+    Run the actions of a batch of events in stages, each stage over all actions.
+
+    - resolve : read the contexts of all owners at once, then prepare the targets of each action
+    - fetch : fetch the activities concurrently, once per activity
+    - transform : build the properties of all activities and usernames at once
+    - write : write the targets concurrently across integrations, each Notion client goes through the
+      rate limiter of its integration
+
+    The reads of the resolve stage grow with the number of distinct owners, not the number of events.
+    Each stage is timed in METRICS as pipeline.<stage>.
+    """
+
+    def __init__(
+        self,
+        database: DatabaseInterface,
+        registry: Optional[ClientRegistry] = None,
+        max_workers: int = 10,
+    ):
+        """
+        Init instance.
+
+        :param database:
+        :param registry: registry providing the API clients, the shared one by default
+        :param max_workers: maximum number of threads of the concurrent stages
+        """
+        self.database = database
+        self.registry = registry or get_registry()
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _finished(action: Action) -> TaskOutcome:
+        """
+        Return the outcome of an action whose targets were all handled.
+
+        :param action:
+        :return:
+        """
+        try:
+            return {
+                "result": action._result(action.message, action.failed_targets),
+                "exception": None,
+            }
+        except PartialFailure as e:
+            return {"result": None, "exception": e}
+
+    def _run_tasks(
+        self,
+        tasks: list[tuple[Hashable, Callable[[], Any]]],
+        stop_key_on_failure: bool = True,
+    ) -> list[TaskOutcome]:
+        """
+        Run tasks concurrently until the deadline, in order within a key.
+
+        :param tasks: list of (key, callable without argument)
+        :param stop_key_on_failure: see KeyedExecutor
+        :return: outcomes in the same order as the tasks
+        """
+        if len(tasks) == 0:
+            return []
+        return KeyedExecutor(self.max_workers, stop_key_on_failure).run(
+            tasks, timeout=remaining()
+        )
+
+    @staticmethod
+    def _candidates(
+        actions: list[Action],
+        contexts: dict[str, AthleteContext],
+        outcomes: list[Optional[TaskOutcome]],
+    ) -> dict[int, AthleteContext]:
+        """
+        Return the pending targets of the actions, before they are prepared.
+
+        :param actions:
+        :param contexts: context per owner
+        :param outcomes: outcomes of the actions, set for the actions with no pending target
+        :return: dict with the index of an action as key and its pending targets as value
+        """
+        candidates = {}
+        for index, action in enumerate(actions):
+            context = contexts[action.owner_id]
+            if len(context["accounts"]) == 0:
+                outcomes[index] = {
+                    "result": {
+                        "code": 200,
+                        "message": f"no account for athlete {action.owner_id}",
+                    },
+                    "exception": None,
+                }
+                continue
+            context = action._pending_context(context)
+            if len(context["accounts"]) == 0:
+                outcomes[index] = {
+                    "result": {"code": 200, "message": "all targets already processed"},
+                    "exception": None,
+                }
+                continue
+            candidates[index] = context
+        return candidates
+
+    def _prepared(
+        self,
+        actions: list[Action],
+        indexes: list[int],
+        prepared: list[TaskOutcome],
+        outcomes: list[Optional[TaskOutcome]],
+    ) -> dict[int, AthleteContext]:
+        """
+        Return the targets left to write once the actions are prepared.
+
+        :param actions:
+        :param indexes: indexes of the prepared actions
+        :param prepared: outcomes of the prepare stage of these actions
+        :param outcomes: outcomes of the actions, set for the actions with no target left
+        :return: dict with the index of an action as key and its targets left to write as value
+        """
+        pending = {}
+        for index, outcome in zip(indexes, prepared):
+            if outcome["exception"] is not None:
+                outcomes[index] = outcome
+            elif len(outcome["result"]["accounts"]) == 0:
+                outcomes[index] = self._finished(actions[index])
+            else:
+                pending[index] = outcome["result"]
+        return pending
+
+    def _resolve(
+        self, actions: list[Action], outcomes: list[Optional[TaskOutcome]]
+    ) -> dict[int, AthleteContext]:
+        """
+        Read the contexts of the owners and prepare the targets of the actions.
+
+        :param actions:
+        :param outcomes: outcomes of the actions, set for the actions left with no target
+        :return: dict with the index of an action as key and its targets left to write as value
+        """
+        try:
+            contexts = self.database.get_athlete_contexts(
+                [action.owner_id for action in actions]
+            )
+        except Exception as e:
+            outcomes[:] = [{"result": None, "exception": e}] * len(actions)
+            return {}
+        candidates = self._candidates(actions, contexts, outcomes)
+        # the actions of an owner are prepared in order
+        indexes = list(candidates)
+        prepared = self._run_tasks(
+            [
+                (
+                    actions[index].owner_id,
+                    lambda index=index: actions[index].prepare(candidates[index]),
+                )
+                for index in indexes
+            ],
+            stop_key_on_failure=False,
+        )
+        return self._prepared(actions, indexes, prepared, outcomes)
+
+    @staticmethod
+    def _activities(
+        actions: list[Action], pending: dict[int, AthleteContext]
+    ) -> dict[tuple[str, str], list[int]]:
+        """
+        Group the pending actions by activity.
+
+        :param actions:
+        :param pending: targets left to write per action index
+        :return: dict with (owner_id, object_id) as key and the indexes of its actions as value
+        """
+        indexes_by_activity: dict[tuple[str, str], list[int]] = {}
+        for index in pending:
+            key = (actions[index].owner_id, actions[index].object_id)
+            indexes_by_activity.setdefault(key, []).append(index)
+        return indexes_by_activity
+
+    @staticmethod
+    def _fetched(
+        indexes_by_activity: dict[tuple[str, str], list[int]],
+        fetched: list[TaskOutcome],
+        pending: dict[int, AthleteContext],
+        outcomes: list[Optional[TaskOutcome]],
+    ) -> dict[int, dict]:
+        """
+        Return the fetched activity of each action.
+
+        :param indexes_by_activity: see _activities
+        :param fetched: outcomes of the fetches, in the order of indexes_by_activity
+        :param pending: targets left to write per action index, the actions whose fetch failed are removed
+        :param outcomes: outcomes of the actions, set for the actions whose fetch failed
+        :return: dict with the index of an action as key and its projected activity as value
+        """
+        activities = {}
+        for indexes, outcome in zip(indexes_by_activity.values(), fetched):
+            for index in indexes:
+                if outcome["exception"] is not None:
+                    outcomes[index] = outcome
+                    del pending[index]
+                else:
+                    activities[index] = outcome["result"]
+        return activities
+
+    def _fetch(
+        self,
+        actions: list[Action],
+        pending: dict[int, AthleteContext],
+        outcomes: list[Optional[TaskOutcome]],
+    ) -> dict[int, dict]:
+        """
+        Fetch the activities of the pending actions concurrently, once per activity.
+
+        :param actions:
+        :param pending: targets left to write per action index, the actions whose fetch failed are removed
+        :param outcomes: outcomes of the actions, set for the actions whose fetch failed
+        :return: dict with the index of an action as key and its projected activity as value
+        """
+        indexes_by_activity = self._activities(actions, pending)
+        fetched = self._run_tasks(
+            [
+                (
+                    key,
+                    lambda i=indexes[0]: actions[i]._fetch_activity(pending[i]),
+                )
+                for key, indexes in indexes_by_activity.items()
+            ]
+        )
+        return self._fetched(indexes_by_activity, fetched, pending, outcomes)
+
+    @staticmethod
+    def _transform(
+        actions: list[Action],
+        pending: dict[int, AthleteContext],
+        activities: dict[int, dict],
+    ) -> dict[int, dict[str, dict]]:
+        """
+        Build the properties of the fetched activities, once per distinct activity and username.
+
+        :param actions:
+        :param pending: targets left to write per action index
+        :param activities: projected activity per action index
+        :return: dict with the index of an action as key and its properties per user_email as value
+        """
+        rows: dict[tuple[str, str, str], dict] = {}
+        for index, context in pending.items():
+            action = actions[index]
+            for account in context["accounts"]:
+                rows.setdefault(
+                    (action.owner_id, action.object_id, account["username"]),
+                    {**activities[index], "username": account["username"]},
+                )
+        built = dict(zip(rows, build_properties_many(rows.values())))
+        return {
+            index: {
+                account["user_email"]: built[
+                    (
+                        actions[index].owner_id,
+                        actions[index].object_id,
+                        account["username"],
+                    )
+                ]
+                for account in context["accounts"]
+            }
+            for index, context in pending.items()
+        }
+
+    @staticmethod
+    def _targets(
+        pending: dict[int, AthleteContext]
+    ) -> list[tuple[int, str, NotionDatabase]]:
+        """
+        Return the targets left to write.
+
+        :param pending: targets left to write per action index
+        :return: list of (action index, user_email, database)
+        """
+        return [
+            (index, account_context["user_email"], database)
+            for index, context in pending.items()
+            for account_context in context["accounts"]
+            for database in account_context["databases"]
+        ]
+
+    @staticmethod
+    def _written(
+        actions: list[Action],
+        targets: list[tuple[int, str, NotionDatabase]],
+        written: list[TaskOutcome],
+    ) -> None:
+        """
+        Record the outcome of each written target in its action.
+
+        :param actions:
+        :param targets: see _targets
+        :param written: outcomes of the writes, in the order of targets
+        :return:
+        """
+        for (index, user_email, database), outcome in zip(targets, written):
+            action = actions[index]
+            if outcome["exception"] is None:
+                action._target_succeeded(user_email, database)
+                action.message.append(outcome["result"])
+            else:
+                action.message.append(
+                    action.write_failed(user_email, database, outcome["exception"])
+                )
+                action.failed_targets.append(TargetLedger.target(user_email, database))
+
+    def _write(
+        self,
+        actions: list[Action],
+        pending: dict[int, AthleteContext],
+        properties: dict[int, dict[str, dict]],
+    ) -> None:
+        """
+        Write the targets of the pending actions, concurrently across integrations.
+
+        The targets of an integration are written in order of the actions, a failed target does not stop
+        the next ones.
+
+        :param actions:
+        :param pending: targets left to write per action index
+        :param properties: properties per user_email per action index
+        :return:
+        """
+        targets = self._targets(pending)
+
+        def write(index: int, user_email: str, database: NotionDatabase) -> str:
+            # a task still running after the deadline must not write : its record is retried
+            check_deadline()
+            action = actions[index]
+            return action.write(
+                action._notion_client(database),
+                user_email,
+                database,
+                properties[index][user_email],
+            )
+
+        written = self._run_tasks(
+            [
+                (target[2]["bot_id"], lambda target=target: write(*target))
+                for target in targets
+            ],
+            stop_key_on_failure=False,
+        )
+        self._written(actions, targets, written)
+
+    def _transformed(
+        self,
+        actions: list[Action],
+        pending: dict[int, AthleteContext],
+        activities: dict[int, dict],
+        outcomes: list[Optional[TaskOutcome]],
+    ) -> dict[int, dict[str, dict]]:
+        """
+        Run the transform stage, the pending actions fail together if it raises.
+
+        :param actions:
+        :param pending: targets left to write per action index, cleared if the stage raises
+        :param activities: projected activity per action index
+        :param outcomes: outcomes of the actions
+        :return: properties per user_email per action index
+        """
+        with METRICS.timer("pipeline.transform"):
+            try:
+                return self._transform(actions, pending, activities)
+            except Exception as e:
+                for index in pending:
+                    outcomes[index] = {"result": None, "exception": e}
+                pending.clear()
+                return {}
+
+    def run(self, actions: list[Action]) -> list[TaskOutcome]:
+        """
+        Run the actions, the failure of an action does not stop the others.
+
+        :param actions: actions of distinct events
+        :return: outcomes in the same order as the actions, the result of a succeeded action is a RunReturn
+        """
+        outcomes: list[Optional[TaskOutcome]] = [None] * len(actions)
+        with METRICS.timer("pipeline.resolve"):
+            pending = self._resolve(actions, outcomes)
+        with METRICS.timer("pipeline.fetch"):
+            activities = self._fetch(actions, pending, outcomes)
+        properties = self._transformed(actions, pending, activities, outcomes)
+        with METRICS.timer("pipeline.write"):
+            self._write(actions, pending, properties)
+        for index in pending:
+            outcomes[index] = self._finished(actions[index])
+        return outcomes
@@ -0,0 +1,295 @@
+"""Implement the actions run with asyncio by AsyncPipeline : AsyncAction, AsyncCreateActivity and AsyncUpdateActivity."""
+import asyncio
+import logging
+from abc import abstractmethod
+from typing import Optional
+
+from src.const import STRAVA_ACTIVITY_FIELDS
+from src.database.async_adapter import AsyncDatabase
+from src.database.interface import DatabaseInterface
+from src.handlers.actions.action import Action
+from src.handlers.actions.create_activity import CreateActivity
+from src.handlers.actions.update_activity import UpdateActivity
+from src.handlers.ledger import TargetLedger
+from src.notion.async_client import AsyncClient as AsyncNotionClient
+from src.notion.async_client import get_ids_of_page_activity
+from src.notion.utils import changed_properties, property_hashes
+from src.registry import ClientRegistry
+from src.strava.async_client import AsyncClient as AsyncStravaClient
+from src.strava.rate_limit import Priority, request_scope
+from src.types.database import AthleteContext, NotionDatabase, NotionPage
+from src.utils.async_transport import AsyncTransport
+from src.utils.exceptions import InternalException, RateLimitExceeded, WorkDeferred
+from src.utils.metrics import METRICS
+from src.workflows import refresh_strava_token
+
+logger = logging.getLogger()
+
+
+class AsyncAction(Action):
+    """
+    Abstract class of the actions run by AsyncPipeline.
+
+    It adds the asyncio variants of the fetch and write stages. The database is called through AsyncDatabase,
+    prepare runs in threads as with Pipeline.
+    """
+
+    def __init__(
+        self,
+        owner_id: str,
+        object_id: str,
+        database_client: DatabaseInterface,
+        registry: Optional[ClientRegistry] = None,
+        updates: Optional[dict[str, str]] = None,
+        ledger: Optional[TargetLedger] = None,
+        priority: Priority = Priority.REALTIME,
+    ):
+        """
+        Init instance, see Action.
+
+        :param owner_id: Strava user's id
+        :param object_id: id of Strava object relative to the event (either an activity id or an athlete id)
+        :param database_client:
+        :param registry: registry providing the API clients, the shared one by default
+        :param updates: updates carried by the Strava event, if any
+        :param ledger: ledger of the targets of the event
+        :param priority: priority of the Strava requests
+        """
+        super().__init__(
+            owner_id, object_id, database_client, registry, updates, ledger, priority
+        )
+        self.async_database = AsyncDatabase(database_client)
+
+    def _async_notion_client(
+        self, database: NotionDatabase, transport: AsyncTransport
+    ) -> AsyncNotionClient:
+        """
+        Return the asyncio Notion client of the integration of a database.
+
+        :param database:
+        :param transport:
+        :return:
+        """
+        if database["access_token"] is None:
+            raise InternalException(
+                f"no Notion credentials found for bot_id {database['bot_id']}"
+            )
+        return AsyncNotionClient(
+            database["access_token"], transport=transport, bot_id=database["bot_id"]
+        )
+
+    async def _fetch_activity_async(
+        self, context: AthleteContext, transport: AsyncTransport
+    ) -> dict:
+        """
+        Fetch the activity once with asyncio, see _fetch_activity.
+
+        A token about to expire is refreshed in a thread by the token manager, which serializes refreshes.
+
+        :param context:
+        :param transport:
+        :return:
+        """
+        errors = []
+        token_manager = self.registry.token_manager
+        for account_context in context["accounts"]:
+            account = account_context["user_email"]
+            try:
+                strava_client = self.registry.strava_client(
+                    self.owner_id, account, account_context["strava_token"]
+                )
+                with request_scope(self.owner_id, self.priority):
+                    if strava_client.expires_within(token_manager.margin):
+                        await asyncio.to_thread(
+                            refresh_strava_token,
+                            self.owner_id,
+                            account,
+                            strava_client,
+                            self.database,
+                            token_manager,
+                        )
+                    activity = await AsyncStravaClient(
+                        strava_client.access_token,
+                        strava_client.refresh_token,
+                        strava_client.expires_at,
+                        transport=transport,
+                    ).get_activity(self.object_id)
+                return {k: activity[k] for k in STRAVA_ACTIVITY_FIELDS}
+            except (RateLimitExceeded, WorkDeferred):
+                # the other accounts share the rate limits of the application
+                raise
+            except Exception as e:
+                errors.append(f"account {account}: {e}")
+        raise InternalException(
+            f"activity {self.object_id} could not be fetched: {'; '.join(errors)}"
+        )
+
+    async def _index_page_async(
+        self,
+        database_id: str,
+        page_id: str,
+        properties: dict,
+        hashes: Optional[dict[str, str]] = None,
+    ) -> None:
+        """
+        Record the Notion page of the activity in the index of pages, see _index_page.
+
+        :param database_id:
+        :param page_id:
+        :param properties: properties written on the page
+        :param hashes: hashes to index, those of properties by default
+        :return:
+        """
+        try:
+            await self.async_database.set_notion_page(
+                database_id,
+                self.object_id,
+                page_id,
+                hashes if hashes is not None else property_hashes(properties),
+            )
+        except Exception:
+            logger.exception(
+                f"failed to index page {page_id} of activity {self.object_id}"
+            )
+
+    @abstractmethod
+    async def write_async(
+        self,
+        notion_client: AsyncNotionClient,
+        user_email: str,
+        database: NotionDatabase,
+        properties: dict,
+    ) -> str:
+        """
+        Write the activity on a target with asyncio, see write.
+
+        Implemented by concrete classes
+
+        :param notion_client: asyncio client of the integration of the database
+        :param user_email:
+        :param database:
+        :param properties: properties of the activity for the account
+        :return: message
+        """
+        pass
+
+
+class AsyncCreateActivity(AsyncAction, CreateActivity):
+    """Concrete AsyncAction that add a page in the Strava database when a new activity is uploaded."""
+
+    async def write_async(
+        self,
+        notion_client: AsyncNotionClient,
+        user_email: str,
+        database: NotionDatabase,
+        properties: dict,
+    ) -> str:
+        """
+        Add a new page in the Notion database with the activity data, with asyncio.
+
+        :param notion_client:
+        :param user_email:
+        :param database:
+        :param properties:
+        :return: message
+        """
+        page = await notion_client.create_page(database["database_id"], properties)
+        await self._index_page_async(database["database_id"], page["id"], properties)
+        return f"page {page['id']} created for bot_id {database['bot_id']}, account {user_email}"
+
+
+class AsyncUpdateActivity(AsyncAction, UpdateActivity):
+    """Concrete AsyncAction that update a page in the Strava database when an activity is uploaded."""
+
+    async def _update_pages_by_query_async(
+        self, notion_client: AsyncNotionClient, database_id: str, properties: dict
+    ) -> list[str]:
+        """
+        Update the pages of the activity found by querying the database with asyncio, see _update_pages_by_query.
+
+        :param notion_client:
+        :param database_id:
+        :param properties:
+        :return: ids of the updated pages
+        """
+        page_ids = await get_ids_of_page_activity(
+            notion_client, database_id, self.object_id
+        )
+        if len(page_ids) >= 1:
+            for id_ in page_ids:
+                await notion_client.update_page_properties(id_, properties)
+        else:
+            page = await notion_client.create_page(database_id, properties)
+            page_ids = [page["id"]]
+        await self._index_page_async(database_id, page_ids[0], properties)
+        return page_ids
+
+    async def _update_indexed_page_async(
+        self,
+        notion_client: AsyncNotionClient,
+        database_id: str,
+        page: NotionPage,
+        properties: dict,
+        hashes: Optional[dict[str, str]] = None,
+    ) -> None:
+        """
+        Update the indexed page with the properties that changed since the last write, see _update_indexed_page.
+
+        :param notion_client:
+        :param database_id:
+        :param page:
+        :param properties:
+        :param hashes: hashes to index, those of properties by default
+        :return:
+        """
+        changes = changed_properties(properties, page["property_hashes"])
+        if len(changes) == 0:
+            METRICS.increment("notion.update.skipped")
+            return
+        await notion_client.update_page_properties(page["page_id"], changes)
+        if len(changes) < len(properties):
+            METRICS.increment("notion.update.partial")
+        else:
+            METRICS.increment("notion.update.full")
+        await self._index_page_async(database_id, page["page_id"], properties, hashes)
+
+    async def write_async(
+        self,
+        notion_client: AsyncNotionClient,
+        user_email: str,
+        database: NotionDatabase,
+        properties: dict,
+    ) -> str:
+        """
+        Update the indexed page of the activity with asyncio, fall back on querying the database.
+
+        :param notion_client:
+        :param user_email:
+        :param database:
+        :param properties:
+        :return: message
+        """
+        database_id = database["database_id"]
+        updated_pages = []
+        page = await self.async_database.get_notion_page(database_id, self.object_id)
+        if page is not None:
+            try:
+                await self._update_indexed_page_async(
+                    notion_client, database_id, page, properties
+                )
+                updated_pages.append(page["page_id"])
+            except Exception:
+                logger.warning(
+                    f"indexed page {page['page_id']} could not be updated, querying database {database_id}"
+                )
+        if len(updated_pages) == 0:
+            updated_pages = await self._update_pages_by_query_async(
+                notion_client, database_id, properties
+            )
+        return f"page {', '.join(updated_pages)} updated on database {database_id} for account {user_email}"
+
+
+async_actions = {
+    "create.activity": AsyncCreateActivity,
+    "update.activity": AsyncUpdateActivity,
+}
@@ -0,0 +1,223 @@
+"""Implement the pipeline running actions over a batch of events with asyncio."""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from src.database.async_adapter import AsyncDatabase
+from src.database.interface import DatabaseInterface
+from src.handlers.actions.action import Pipeline
+from src.handlers.actions.async_actions import AsyncAction
+from src.registry import ClientRegistry
+from src.types.database import AthleteContext, NotionDatabase
+from src.utils.async_transport import AsyncTransport, get_async_transport
+from src.utils.deadline import check_deadline, remaining
+from src.utils.event_loop import reserve_threads, run_coroutine
+from src.utils.exceptions import DeadlineExceeded, PrecedingTaskFailed
+from src.utils.executor import TaskOutcome
+from src.utils.metrics import METRICS
+
+
+class AsyncPipeline(Pipeline):
+    """
+    Run the actions of a batch of events in the stages of Pipeline, with asyncio, see AsyncAction.
+
+    Strava and Notion requests are sent by asyncio clients, so that the number of requests in flight is not
+    bounded by a number of threads. The database is called through AsyncDatabase, prepare runs in threads : the
+    executor of the event loop has as many threads as tasks in flight, so that the blocking calls keep up.
+    """
+
+    def __init__(
+        self,
+        database: DatabaseInterface,
+        registry: Optional[ClientRegistry] = None,
+        max_concurrency: int = 50,
+        transport: Optional[AsyncTransport] = None,
+    ):
+        """
+        Init instance.
+
+        :param database:
+        :param registry: registry providing the API clients, the shared one by default
+        :param max_concurrency: maximum number of tasks in flight per stage
+        :param transport: HTTP transport, the shared one by default
+        """
+        super().__init__(database, registry, max_concurrency)
+        reserve_threads(max_concurrency)
+        self.async_database = AsyncDatabase(database)
+        self.transport = transport or get_async_transport()
+
+    async def _run_tasks_async(
+        self,
+        tasks: list[tuple[Hashable, Callable[[], Awaitable[Any]]]],
+        stop_key_on_failure: bool = True,
+    ) -> list[TaskOutcome]:
+        """
+        Run coroutines concurrently until the deadline, in order within a key, see KeyedExecutor.
+
+        :param tasks: list of (key, coroutine function without argument)
+        :param stop_key_on_failure: if True, the tasks following a failed task of the same key are not run
+        :return: outcomes in the same order as the tasks
+        """
+        if len(tasks) == 0:
+            return []
+        outcomes: list[Optional[TaskOutcome]] = [None] * len(tasks)
+        lanes: dict[Hashable, list[int]] = {}
+        for index, (key, _) in enumerate(tasks):
+            lanes.setdefault(key, []).append(index)
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run_lane(key: Hashable, indexes: list[int]) -> None:
+            failed = False
+            for index in indexes:
+                if failed and stop_key_on_failure:
+                    outcomes[index] = {
+                        "result": None,
+                        "exception": PrecedingTaskFailed(key),
+                    }
+                    continue
+                try:
+                    check_deadline()
+                    async with semaphore:
+                        result = await tasks[index][1]()
+                    outcomes[index] = {"result": result, "exception": None}
+                except Exception as e:
+                    failed = True
+                    outcomes[index] = {"result": None, "exception": e}
+
+        lane_tasks = [
+            asyncio.ensure_future(run_lane(key, indexes))
+            for key, indexes in lanes.items()
+        ]
+        _, unfinished = await asyncio.wait(lane_tasks, timeout=remaining())
+        for task in unfinished:
+            task.cancel()
+        return [
+            outcome
+            if outcome is not None
+            else {"result": None, "exception": DeadlineExceeded()}
+            for outcome in outcomes
+        ]
+
+    async def _resolve_async(
+        self, actions: list[AsyncAction], outcomes: list[Optional[TaskOutcome]]
+    ) -> dict[int, AthleteContext]:
+        """
+        Read the contexts of the owners and prepare the targets of the actions, see Pipeline._resolve.
+
+        :param actions:
+        :param outcomes: outcomes of the actions, set for the actions left with no target
+        :return: dict with the index of an action as key and its targets left to write as value
+        """
+        try:
+            contexts = await self.async_database.get_athlete_contexts(
+                [action.owner_id for action in actions]
+            )
+        except Exception as e:
+            outcomes[:] = [{"result": None, "exception": e}] * len(actions)
+            return {}
+        candidates = self._candidates(actions, contexts, outcomes)
+        indexes = list(candidates)
+        prepared = await self._run_tasks_async(
+            [
+                (
+                    actions[index].owner_id,
+                    lambda index=index: asyncio.to_thread(
+                        actions[index].prepare, candidates[index]
+                    ),
+                )
+                for index in indexes
+            ],
+            stop_key_on_failure=False,
+        )
+        return self._prepared(actions, indexes, prepared, outcomes)
+
+    async def _fetch_async(
+        self,
+        actions: list[AsyncAction],
+        pending: dict[int, AthleteContext],
+        outcomes: list[Optional[TaskOutcome]],
+    ) -> dict[int, dict]:
+        """
+        Fetch the activities of the pending actions concurrently, once per activity, see Pipeline._fetch.
+
+        :param actions:
+        :param pending: targets left to write per action index, the actions whose fetch failed are removed
+        :param outcomes: outcomes of the actions, set for the actions whose fetch failed
+        :return: dict with the index of an action as key and its projected activity as value
+        """
+        indexes_by_activity = self._activities(actions, pending)
+        fetched = await self._run_tasks_async(
+            [
+                (
+                    key,
+                    lambda i=indexes[0]: actions[i]._fetch_activity_async(
+                        pending[i], self.transport
+                    ),
+                )
+                for key, indexes in indexes_by_activity.items()
+            ]
+        )
+        return self._fetched(indexes_by_activity, fetched, pending, outcomes)
+
+    async def _write_async(
+        self,
+        actions: list[AsyncAction],
+        pending: dict[int, AthleteContext],
+        properties: dict[int, dict[str, dict]],
+    ) -> None:
+        """
+        Write the targets of the pending actions, concurrently across integrations, see Pipeline._write.
+
+        :param actions:
+        :param pending: targets left to write per action index
+        :param properties: properties per user_email per action index
+        :return:
+        """
+        targets = self._targets(pending)
+
+        async def write(index: int, user_email: str, database: NotionDatabase) -> str:
+            # a task still running after the deadline must not write : its record is retried
+            check_deadline()
+            action = actions[index]
+            return await action.write_async(
+                action._async_notion_client(database, self.transport),
+                user_email,
+                database,
+                properties[index][user_email],
+            )
+
+        written = await self._run_tasks_async(
+            [
+                (target[2]["bot_id"], lambda target=target: write(*target))
+                for target in targets
+            ],
+            stop_key_on_failure=False,
+        )
+        self._written(actions, targets, written)
+
+    async def run_async(self, actions: list[AsyncAction]) -> list[TaskOutcome]:
+        """
+        Run the actions, the failure of an action does not stop the others.
+
+        :param actions: actions of distinct events
+        :return: outcomes in the same order as the actions, the result of a succeeded action is a RunReturn
+        """
+        outcomes: list[Optional[TaskOutcome]] = [None] * len(actions)
+        with METRICS.timer("pipeline.resolve"):
+            pending = await self._resolve_async(actions, outcomes)
+        with METRICS.timer("pipeline.fetch"):
+            activities = await self._fetch_async(actions, pending, outcomes)
+        properties = self._transformed(actions, pending, activities, outcomes)
+        with METRICS.timer("pipeline.write"):
+            await self._write_async(actions, pending, properties)
+        for index in pending:
+            outcomes[index] = self._finished(actions[index])
+        return outcomes
+
+    def run(self, actions: list[AsyncAction]) -> list[TaskOutcome]:
+        """
+        Run the actions on the event loop of the process, see run_async.
+
+        :param actions: actions of distinct events
+        :return: outcomes in the same order as the actions
+        """
+        return run_coroutine(self.run_async(actions))
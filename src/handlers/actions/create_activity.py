@@ -1,70 +1,69 @@
 """Implement the concrete action : CreateActivity."""
-from src.const import STRAVA_ACTIVITY_FIELDS
-from src.database.interface import DatabaseInterface
 from src.handlers.actions import Action
 from src.notion.client import Client as NotionClient
-from src.strava.client import Client as StravaClient
-from src.types.action import RunReturn
-from src.workflows import refresh_strava_token, strava_activity_to_notion_properties
+from src.types.database import AthleteContext, NotionDatabase
 
 
 class CreateActivity(Action):
     """Concrete Action that add a page in the Strava database when a new activity is uploaded."""
 
-    def __init__(
-        self, owner_id: str, object_id: str, database_client: DatabaseInterface
-    ):
+    def prepare(self, context: AthleteContext) -> AthleteContext:
         """
-        Init instance.
+        Skip the databases where the page of the activity is already indexed.
 
-        :param owner_id:
-        :param object_id:
-        :param database_client:
+        A duplicate event must not create a second page.
+
+        :param context:
+        :return: context restricted to the databases without page
+        """
+        accounts = []
+        for account_context in context["accounts"]:
+            account = account_context["user_email"]
+            databases = []
+            for database in account_context["databases"]:
+                page = self.database.get_notion_page(
+                    database["database_id"], self.object_id
+                )
+                if page is None:
+                    databases.append(database)
+                    continue
+                self._target_succeeded(account, database)
+                self.message.append(
+                    f"page {page['page_id']} already exists for bot_id {database['bot_id']}, account {account}"
+                )
+            if len(databases) > 0:
+                accounts.append({**account_context, "databases": databases})
+        return {**context, "accounts": accounts}
+
+    def write(
+        self,
+        notion_client: NotionClient,
+        user_email: str,
+        database: NotionDatabase,
+        properties: dict,
+    ) -> str:
         """
-        super().__init__(owner_id, object_id, database_client)
+        Add a new page in the Notion database with the activity data.
 
-    def run(self) -> RunReturn:
-        """Execute actions to create an activity."""
-        # get Strava credentials of owner
-        accounts = self.database.get_athlete_accounts(self.owner_id)
-        message = []
-        for account in accounts:
-            stored_strava_credentials = self.database.get_strava_credentials(
-                self.owner_id, account
-            )
-            # refresh credentials
-            strava_client = StravaClient(
-                stored_strava_credentials["access_token"],
-                stored_strava_credentials["refresh_token"],
-                int(stored_strava_credentials["expires_at"]),
-            )
-            refresh_strava_token(self.owner_id, account, strava_client, self.database)
-            # fetch Strava activity data
-            athlete_username = self.database.get_athlete_username(
-                self.owner_id, account
-            )
-            activity = strava_client.get_activity(self.object_id)
-            activity = {k: activity[k] for k in STRAVA_ACTIVITY_FIELDS}
-            properties = strava_activity_to_notion_properties(
-                {**activity, "username": athlete_username}
-            )
+        :param notion_client:
+        :param user_email:
+        :param database:
+        :param properties:
+        :return: message
+        """
+        page = notion_client.create_page(database["database_id"], properties)
+        self._index_page(database["database_id"], page["id"], properties)
+        return f"page {page['id']} created for bot_id {database['bot_id']}, account {user_email}"
 
-            databases = self.database.list_databases(self.owner_id, account)
-            for database in databases:
-                try:
-                    notion_access_token = self.database.get_notion_access_token(
-                        database["bot_id"]
-                    )
-                    # add a new page in Notion database with activity data
-                    notion_client = NotionClient(notion_access_token)
-                    page = notion_client.create_page(
-                        database["database_id"], properties
-                    )
-                    message.append(
-                        f"page {page['id']} created for bot_id {database['bot_id']}, account {account}"
-                    )
-                except Exception as e:
-                    message.append(
-                        f"add activity {self.object_id} to bot_id {database['bot_id']} account {account} failed because: {e}"
-                    )
-        return {"code": 200, "message": "\n".join(message)}
+    def write_failed(
+        self, user_email: str, database: NotionDatabase, exception: Exception
+    ) -> str:
+        """
+        Return the message of a database where the page could not be added.
+
+        :param user_email:
+        :param database:
+        :param exception:
+        :return:
+        """
+        return f"add activity {self.object_id} to bot_id {database['bot_id']} account {user_email} failed because: {exception}"
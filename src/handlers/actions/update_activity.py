@@ -1,72 +1,168 @@
 """Implement the concrete action : UpdateActivity."""
-from src.const import STRAVA_ACTIVITY_FIELDS
+import logging
+from typing import Optional
+
 from src.handlers.actions import Action
 from src.notion.client import Client as NotionClient
-from src.notion.utils import get_ids_of_page_activity
-from src.strava.client import Client as StravaClient
-from src.types.action import RunReturn
-from src.workflows import refresh_strava_token, strava_activity_to_notion_properties
+from src.notion.utils import (
+    changed_properties,
+    get_ids_of_page_activity,
+    property_hashes,
+)
+from src.types.database import AthleteContext, NotionDatabase, NotionPage
+from src.utils.metrics import METRICS
+from src.workflows import strava_updates_to_notion_properties
+
+logger = logging.getLogger()
 
 
 class UpdateActivity(Action):
     """Concrete Action that update a page in the Strava database when an activity is uploaded."""
 
-    def run(self) -> RunReturn:
-        """Execute actions to updata an activity."""
-        # get Strava credentials of owner
-        accounts = self.database.get_athlete_accounts(self.owner_id)
-        message = []
+    def _update_pages_by_query(
+        self, notion_client: NotionClient, database_id: str, properties: dict
+    ) -> list[str]:
+        """
+        Update the pages of the activity found by querying the database, create one if none is found.
 
-        for account in accounts:
-            stored_strava_credentials = self.database.get_strava_credentials(
-                self.owner_id, account
-            )
-            # refresh credentials
-            strava_client = StravaClient(
-                stored_strava_credentials["access_token"],
-                stored_strava_credentials["refresh_token"],
-                int(stored_strava_credentials["expires_at"]),
-            )
-            refresh_strava_token(self.owner_id, account, strava_client, self.database)
-            # fetch Strava activity data
-            activity = strava_client.get_activity(self.object_id)
-            activity = {k: activity[k] for k in STRAVA_ACTIVITY_FIELDS}
-            athlete_username = self.database.get_athlete_username(
-                self.owner_id, account
-            )
-            # fetch Notion database id and Notion credentials of owner
-            databases = self.database.list_databases(self.owner_id, account)
-            for database in databases:
-                bot_id = database["bot_id"]
+        The page is recorded in the index of pages.
+
+        :param notion_client:
+        :param database_id:
+        :param properties:
+        :return: ids of the updated pages
+        """
+        page_ids = get_ids_of_page_activity(notion_client, database_id, self.object_id)
+        if len(page_ids) >= 1:
+            for id_ in page_ids:
+                notion_client.update_page_properties(id_, properties)
+        else:
+            page_ids = [notion_client.create_page(database_id, properties)["id"]]
+        self._index_page(database_id, page_ids[0], properties)
+        return page_ids
+
+    def _update_indexed_page(
+        self,
+        notion_client: NotionClient,
+        database_id: str,
+        page: NotionPage,
+        properties: dict,
+        hashes: Optional[dict[str, str]] = None,
+    ) -> None:
+        """
+        Update the indexed page with the properties that changed since the last write.
+
+        No request is sent if no property changed.
+
+        :param notion_client:
+        :param database_id:
+        :param page:
+        :param properties:
+        :param hashes: hashes to index, those of properties by default
+        :return:
+        """
+        changes = changed_properties(properties, page["property_hashes"])
+        if len(changes) == 0:
+            METRICS.increment("notion.update.skipped")
+            return
+        notion_client.update_page_properties(page["page_id"], changes)
+        if len(changes) < len(properties):
+            METRICS.increment("notion.update.partial")
+        else:
+            METRICS.increment("notion.update.full")
+        self._index_page(database_id, page["page_id"], properties, hashes)
+
+    def prepare(self, context: AthleteContext) -> AthleteContext:
+        """
+        Patch the indexed pages of the activity when the updates of the event are enough to build the changes.
+
+        :param context:
+        :return: context restricted to the databases left to update with the fetched activity
+        """
+        if not self.updates:
+            return context
+        properties = strava_updates_to_notion_properties(self.updates)
+        if properties is None:
+            return context
+        accounts = []
+        for account_context in context["accounts"]:
+            account = account_context["user_email"]
+            databases = []
+            for database in account_context["databases"]:
                 database_id = database["database_id"]
                 try:
-                    notion_access_token = self.database.get_notion_access_token(bot_id)
-                    # get pages from database relative to the activity
-                    notion_client = NotionClient(notion_access_token)
-                    page_ids = get_ids_of_page_activity(
-                        notion_client, database_id, self.object_id
+                    page = self.database.get_notion_page(database_id, self.object_id)
+                    if page is None:
+                        databases.append(database)
+                        continue
+                    notion_client = self._notion_client(database)
+                    self._update_indexed_page(
+                        notion_client,
+                        database_id,
+                        page,
+                        properties,
+                        {
+                            **(page["property_hashes"] or {}),
+                            **property_hashes(properties),
+                        },
                     )
-                    # update the properties of the pages
-                    updated_pages = []
-                    if len(page_ids) >= 1:
-                        for id_ in page_ids:
-                            properties = strava_activity_to_notion_properties(
-                                {**activity, "username": athlete_username}
-                            )
-                            notion_client.update_page_properties(id_, properties)
-                            updated_pages.append(id_)
-                    else:
-                        properties = strava_activity_to_notion_properties(
-                            {**activity, "username": athlete_username}
-                        )
-                        page = notion_client.create_page(database_id, properties)
-                        updated_pages.append(page["id"])
-                    message.append(
-                        f"page {', '.join(updated_pages)} updated on database {database_id} for account {account}"
+                    self._target_succeeded(account, database)
+                    self.message.append(
+                        f"page {page['page_id']} patched on database {database_id} for account {account}"
                     )
-                except Exception as e:
-                    message.append(
-                        f"failed to update page on database {database_id} for account {account} because {e}"
+                except Exception:
+                    logger.warning(
+                        f"page of database {database_id} could not be patched, fetching activity {self.object_id}"
                     )
+                    databases.append(database)
+            if len(databases) > 0:
+                accounts.append({**account_context, "databases": databases})
+        if len(accounts) == 0:
+            METRICS.increment("strava.activity.fetch_skipped")
+        return {**context, "accounts": accounts}
+
+    def write(
+        self,
+        notion_client: NotionClient,
+        user_email: str,
+        database: NotionDatabase,
+        properties: dict,
+    ) -> str:
+        """
+        Update the indexed page of the activity, fall back on querying the database.
+
+        :param notion_client:
+        :param user_email:
+        :param database:
+        :param properties:
+        :return: message
+        """
+        database_id = database["database_id"]
+        updated_pages = []
+        page = self.database.get_notion_page(database_id, self.object_id)
+        if page is not None:
+            try:
+                self._update_indexed_page(notion_client, database_id, page, properties)
+                updated_pages.append(page["page_id"])
+            except Exception:
+                logger.warning(
+                    f"indexed page {page['page_id']} could not be updated, querying database {database_id}"
+                )
+        if len(updated_pages) == 0:
+            updated_pages = self._update_pages_by_query(
+                notion_client, database_id, properties
+            )
+        return f"page {', '.join(updated_pages)} updated on database {database_id} for account {user_email}"
+
+    def write_failed(
+        self, user_email: str, database: NotionDatabase, exception: Exception
+    ) -> str:
+        """
+        Return the message of a database where the page could not be updated.
 
-        return {"code": 200, "message": "\n".join(message)}
+        :param user_email:
+        :param database:
+        :param exception:
+        :return:
+        """
+        return f"failed to update page on database {database['database_id']} for account {user_email} because {exception}"
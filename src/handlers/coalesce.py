@@ -0,0 +1,73 @@
+"""
+Coalesce the events of a SQS batch relative to the same activity.
+
+An upload is often followed by updates within seconds, e.g. when the athlete renames the activity. A create
+followed by updates is folded into a single create, which fetches the latest data anyway, and consecutive
+updates are folded into a single update carrying all their changes.
+"""
+import json
+from typing import Any, Hashable
+
+from src.types.event import StravaEvent
+
+FOLDABLE_ASPECT_TYPES = ("create", "update")
+
+
+def _group_key(record: dict[str, Any]) -> tuple[Hashable, bool]:
+    """
+    Return the key of the group of a record and whether it can be folded.
+
+    :param record: SQS record
+    :return:
+    """
+    try:
+        event = json.loads(record["body"])
+        key = (event["object_type"], str(event["owner_id"]), str(event["object_id"]))
+        return key, event["aspect_type"] in FOLDABLE_ASPECT_TYPES
+    except (ValueError, KeyError, TypeError):
+        return record["messageId"], False
+
+
+def coalesce(records: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """
+    Group the records of a batch whose events can be folded together.
+
+    Consecutive create and update events of an object form a group, other events are alone in their group.
+    Groups are ordered by their first record.
+
+    :param records: SQS records, in the order of the queue
+    :return: groups of records, in the order of the queue
+    """
+    groups: list[list[dict[str, Any]]] = []
+    # index of the group still accepting events, per object
+    open_groups: dict[Hashable, int] = {}
+    for record in records:
+        key, foldable = _group_key(record)
+        if foldable and key in open_groups:
+            groups[open_groups[key]].append(record)
+            continue
+        groups.append([record])
+        if foldable:
+            open_groups[key] = len(groups) - 1
+        else:
+            open_groups.pop(key, None)
+    return groups
+
+
+def fold(events: list[StravaEvent]) -> StravaEvent:
+    """
+    Fold the create and update events of an object into a single event.
+
+    :param events: events of a group, in the order of the queue
+    :return: a create if any event is a create, else an update with the changes of all updates
+    """
+    if len(events) == 1:
+        return events[0]
+    latest = events[-1]
+    creates = [event for event in events if event["aspect_type"] == "create"]
+    if len(creates) > 0:
+        return {**creates[0], "updates": {}}
+    updates = {}
+    for event in events:
+        updates.update(event.get("updates") or {})
+    return {**latest, "updates": updates}
@@ -0,0 +1,73 @@
+"""
+Debounce the updates of an activity across batches.
+
+The edits following an upload arrive seconds apart, often in separate batches. When debouncing, the ingress
+records the time of each update of an activity and delays it. Once delivered, an update superseded by a later
+one is dropped : only the last update of a burst is synchronized, with the latest data of the activity.
+"""
+import json
+import os
+
+from src.database.interface import DatabaseInterface
+from src.queue.interface import MessageQueue
+from src.queue.sqs import MAX_DELAY_SECONDS
+from src.types.event import StravaEvent
+
+DEBOUNCED_ACTIONS = ("update.activity",)
+
+
+def debounce_seconds() -> int:
+    """
+    Return the delay of the debounced updates.
+
+    UPDATE_DEBOUNCE_SECONDS is optional, 0 by default (no debounce), at most 900 as allowed by SQS.
+
+    :return:
+    """
+    return min(int(os.getenv("UPDATE_DEBOUNCE_SECONDS", 0)), MAX_DELAY_SECONDS)
+
+
+def should_debounce(event: StravaEvent, seconds: int) -> bool:
+    """
+    Return whether an event is debounced.
+
+    :param event:
+    :param seconds: delay of the debounced updates
+    :return:
+    """
+    return (
+        seconds > 0
+        and f"{event['aspect_type']}.{event['object_type']}" in DEBOUNCED_ACTIONS
+    )
+
+
+def debounce(
+    event: StravaEvent, database: DatabaseInterface, queue: MessageQueue, seconds: int
+) -> None:
+    """
+    Record the time of an update and send it to a queue with a delay.
+
+    :param event:
+    :param database:
+    :param queue: queue supporting a delay per message
+    :param seconds: delay of the update
+    :return:
+    """
+    database.set_latest_event_time(str(event["object_id"]), int(event["event_time"]))
+    queue.send(json.dumps({**event, "debounced": True}), delay_seconds=seconds)
+
+
+def is_superseded(event: StravaEvent, database: DatabaseInterface) -> bool:
+    """
+    Return whether a debounced update was followed by a later update of its activity.
+
+    Events which were not debounced are never superseded.
+
+    :param event:
+    :param database:
+    :return:
+    """
+    if not event.get("debounced"):
+        return False
+    latest = database.get_latest_event_time(str(event["object_id"]))
+    return latest is not None and latest > int(event["event_time"])
@@ -0,0 +1,77 @@
+"""
+Drop the duplicate deliveries of Strava events.
+
+Strava retries a webhook it considers failed and SQS FIFO deduplication only lasts 5 minutes. Events are
+identified by get_event_key and their receipt and processing are recorded in a key-value store.
+"""
+import os
+
+from src.handlers.strava_subscription import get_event_key
+from src.store.interface import KeyValueStore
+from src.types.event import StravaEvent
+
+DEFAULT_IDEMPOTENCY_TTL = 24 * 3600
+
+
+class IdempotencyGuard:
+    """Record the events received and processed."""
+
+    def __init__(self, store: KeyValueStore, ttl: float = DEFAULT_IDEMPOTENCY_TTL):
+        """
+        Init instance.
+
+        :param store:
+        :param ttl: number of seconds an event is remembered
+        """
+        self.store = store
+        self.ttl = ttl
+
+    @classmethod
+    def from_env(cls, store: KeyValueStore) -> "IdempotencyGuard":
+        """
+        Build a guard configured with environment variables.
+
+        IDEMPOTENCY_TTL_SECONDS is optional.
+
+        :param store:
+        :return:
+        """
+        return cls(
+            store, float(os.getenv("IDEMPOTENCY_TTL_SECONDS", DEFAULT_IDEMPOTENCY_TTL))
+        )
+
+    def claim_receipt(self, event: StravaEvent) -> bool:
+        """
+        Record the receipt of an event.
+
+        :param event:
+        :return: False if the event was already received
+        """
+        return self.store.add(f"received:{get_event_key(event)}", "1", self.ttl)
+
+    def release_receipt(self, event: StravaEvent) -> None:
+        """
+        Forget the receipt of an event, e.g. when it could not be queued, so that a retry is accepted.
+
+        :param event:
+        :return:
+        """
+        self.store.delete(f"received:{get_event_key(event)}")
+
+    def is_processed(self, event: StravaEvent) -> bool:
+        """
+        Tell whether an event was already processed successfully.
+
+        :param event:
+        :return:
+        """
+        return self.store.get(f"processed:{get_event_key(event)}") is not None
+
+    def mark_processed(self, event: StravaEvent) -> None:
+        """
+        Record the successful processing of an event.
+
+        :param event:
+        :return:
+        """
+        self.store.set(f"processed:{get_event_key(event)}", "1", self.ttl)
@@ -0,0 +1,76 @@
+"""
+Record which targets of an event were processed.
+
+A target is a Notion database of an account. When some targets of an event fail, the event is retried and the
+ledger lets the retry skip the targets which already succeeded.
+"""
+from src.store.interface import KeyValueStore
+from src.types.database import NotionDatabase
+
+# SQS does not keep messages longer than 14 days
+DEFAULT_LEDGER_TTL = 14 * 24 * 3600
+
+
+class TargetLedger:
+    """Completed targets of an event, kept in a key-value store."""
+
+    def __init__(
+        self, store: KeyValueStore, event_key: str, ttl: float = DEFAULT_LEDGER_TTL
+    ):
+        """
+        Init instance.
+
+        :param store:
+        :param event_key: key identifying the event, see get_event_key
+        :param ttl: number of seconds the completion of a target is remembered
+        """
+        self.store = store
+        self.event_key = event_key
+        self.ttl = ttl
+
+    @staticmethod
+    def target(user_email: str, database: NotionDatabase) -> str:
+        """
+        Return the key of a target.
+
+        :param user_email:
+        :param database:
+        :return:
+        """
+        return f"{user_email}:{database['bot_id']}:{database['database_id']}"
+
+    def _key(self, target: str) -> str:
+        """
+        Return the key of a target of the event in the store.
+
+        :param target:
+        :return:
+        """
+        return f"ledger:{self.event_key}:{target}"
+
+    def is_done(self, target: str) -> bool:
+        """
+        Tell whether a target of the event already succeeded.
+
+        :param target:
+        :return:
+        """
+        return self.store.get(self._key(target)) is not None
+
+    def mark_done(self, target: str) -> None:
+        """
+        Record the success of a target of the event.
+
+        :param target:
+        :return:
+        """
+        self.store.set(self._key(target), "done", self.ttl)
+
+    def forget(self, target: str) -> None:
+        """
+        Forget the success of a target of the event, so that a retry writes it again.
+
+        :param target:
+        :return:
+        """
+        self.store.delete(self._key(target))
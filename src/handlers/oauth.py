@@ -52,14 +52,15 @@ def add_or_update_notion(
     database.add_or_update_notion(credentials, user_email, athlete_id)
 
     # If no database_id : create the Strava activities database and store the id
-    notion_client = NotionClient(credentials["access_token"])
+    notion_client = NotionClient(credentials["access_token"], bot_id=bot_id)
     database_id = database.get_notion_database_id(user_email, athlete_id, bot_id)
     if database_id is None:
-        pages = notion_client.search(_filter={"value": "page", "property": "object"})[
-            "results"
-        ]
-        if len(pages) == 0:
+        page = next(
+            notion_client.iter_search(_filter={"value": "page", "property": "object"}),
+            None,
+        )
+        if page is None:
             raise NoSharedPage(bot_id)
-        parent_page_id = pages[0]["id"]
+        parent_page_id = page["id"]
         new_db_id = create_notion_database(notion_client, parent_page_id)
         database.update_database_id(user_email, athlete_id, bot_id, new_db_id)
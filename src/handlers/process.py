@@ -0,0 +1,273 @@
+"""
+Process batches of Strava events received from a message queue.
+
+The records have the format of the SQS records of a Lambda event : the Lambda function and the worker share
+this module.
+"""
+import json
+import logging
+import os
+from typing import Any, Optional
+
+from src.database.interface import DatabaseInterface
+from src.handlers.actions import Action, CreateActivity, Pipeline, UpdateActivity
+from src.handlers.coalesce import coalesce, fold
+from src.handlers.debounce import is_superseded
+from src.handlers.idempotency import IdempotencyGuard
+from src.handlers.ledger import TargetLedger
+from src.handlers.retry import retry_delay
+from src.handlers.strava_subscription import get_event_key
+from src.registry import ClientRegistry, get_registry
+from src.strava.rate_limit import Priority
+from src.types.event import StravaEvent
+from src.utils.deadline import deadline_scope
+from src.utils.exceptions import PrecedingTaskFailed
+from src.utils.metrics import METRICS
+
+logger = logging.getLogger()
+
+actions = {"create.activity": CreateActivity, "update.activity": UpdateActivity}
+
+
+def fold_records(
+    records: list[dict[str, Any]], guard: IdempotencyGuard, database: DatabaseInterface
+) -> Optional[tuple[StravaEvent, list[StravaEvent]]]:
+    """
+    Fold the events of a group of SQS records not processed yet into a single event, see coalesce.
+
+    :param records:
+    :param guard:
+    :param database:
+    :return: the folded event and the events it folds, None if every event was dropped
+    """
+    message_ids = ", ".join(record["messageId"] for record in records)
+    logger.info(f"processing messages : {message_ids} ...")
+    events = []
+    for event in (json.loads(record["body"]) for record in records):
+        if guard.is_processed(event):
+            continue
+        if is_superseded(event, database):
+            METRICS.increment("events.superseded")
+            guard.mark_processed(event)
+            continue
+        events.append(event)
+    if len(events) == 0:
+        logger.info(f"duplicate or superseded events dropped : {message_ids}")
+        return None
+    if len(events) > 1:
+        METRICS.increment("events.coalesced", len(events) - 1)
+    return fold(events), events
+
+
+def engine_actions() -> dict[str, type[Action]]:
+    """
+    Return the concrete actions run by the engine of PROCESS_EVENTS_ENGINE, see build_pipeline.
+
+    :return: dict with the action of an event as key and the class of the action as value
+    """
+    if os.environ.get("PROCESS_EVENTS_ENGINE", "threads") == "asyncio":
+        # imported when used : the threads engine does not depend on httpx
+        from src.handlers.actions.async_actions import async_actions
+
+        return async_actions
+    return actions
+
+
+def build_action(
+    body: StravaEvent,
+    database: DatabaseInterface,
+    registry: ClientRegistry,
+    attempt: int = 1,
+) -> Action:
+    """
+    Return the action of an event, for the engine of PROCESS_EVENTS_ENGINE.
+
+    The Strava requests of a debounced or retried update are background requests : they are deferred first
+    when the rate limits run low, before those of the new activities and of the first sync of updates.
+
+    :param body:
+    :param database:
+    :param registry:
+    :param attempt: number of receives of the event
+    :return:
+    """
+    action = f"{body['aspect_type']}.{body['object_type']}"
+    concrete_action = engine_actions().get(action)
+    if concrete_action is None:
+        raise NotImplementedError(f"action {action} not implemented yet")
+    # the changes of the updates superseded by a debounced update are unknown : fetch the activity
+    updates = None if body.get("debounced") else body.get("updates")
+    # a redelivered event skips the databases which already succeeded
+    ledger = TargetLedger(registry.store(), get_event_key(body))
+    background = body["aspect_type"] == "update" and (
+        body.get("debounced") or attempt > 1
+    )
+    return concrete_action(
+        str(body["owner_id"]),
+        str(body["object_id"]),
+        database,
+        registry,
+        updates=updates,
+        ledger=ledger,
+        priority=Priority.BACKGROUND if background else Priority.REALTIME,
+    )
+
+
+def build_pipeline(database: DatabaseInterface, registry: ClientRegistry) -> Pipeline:
+    """
+    Return the pipeline running the actions, with the engine of PROCESS_EVENTS_ENGINE.
+
+    - threads (default) : blocking clients, PROCESS_EVENTS_MAX_WORKERS (10 by default) threads per stage
+    - asyncio : asyncio clients, PROCESS_EVENTS_MAX_CONCURRENCY (50 by default) tasks in flight per stage,
+      requires httpx
+
+    At equal concurrency both engines process a batch in about the same time (see benchmarks.engines) : the
+    defaults differ, the asyncio engine runs five times more requests in flight.
+
+    :param database:
+    :param registry:
+    :return:
+    """
+    engine = os.environ.get("PROCESS_EVENTS_ENGINE", "threads")
+    if engine == "threads":
+        return Pipeline(
+            database, registry, int(os.environ.get("PROCESS_EVENTS_MAX_WORKERS", 10))
+        )
+    if engine == "asyncio":
+        from src.handlers.actions.async_pipeline import AsyncPipeline
+
+        return AsyncPipeline(
+            database,
+            registry,
+            int(os.environ.get("PROCESS_EVENTS_MAX_CONCURRENCY", 50)),
+        )
+    raise ValueError(f"unknown engine {engine}, expected threads or asyncio")
+
+
+def _owner_id(records: list[dict[str, Any]]) -> Optional[str]:
+    """
+    Return the athlete of the events of a group of SQS records.
+
+    :param records:
+    :return: None if the body of the first record is not a Strava event
+    """
+    try:
+        return str(json.loads(records[0]["body"])["owner_id"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _fail_following_groups(
+    groups: list[list[dict[str, Any]]], errors: list[Optional[Exception]]
+) -> None:
+    """
+    Fail the groups of an athlete following one of its failed groups, in place.
+
+    The events of an athlete share a FIFO message group, see get_message_group_id : if a later event succeeded
+    while an earlier one is retried, the earlier event would be applied last.
+
+    :param groups: groups of SQS records, in the order of the queue
+    :param errors: for each group, the exception raised while processing it
+    :return:
+    """
+    failed_owners = set()
+    for index, records in enumerate(groups):
+        owner_id = _owner_id(records)
+        if owner_id is None:
+            continue
+        if errors[index] is not None:
+            failed_owners.add(owner_id)
+        elif owner_id in failed_owners:
+            errors[index] = PrecedingTaskFailed(owner_id)
+
+
+def process_groups(groups: list[list[dict[str, Any]]]) -> list[Optional[Exception]]:
+    """
+    Process groups of SQS records relative to the same object, see coalesce.
+
+    The events of a group are folded into a single event and the actions of all groups run together in a
+    pipeline, see build_pipeline.
+
+    :param groups:
+    :return: for each group, the exception raised while processing it, None if it succeeded
+    """
+    registry = get_registry()
+    database = registry.database()
+    guard = IdempotencyGuard.from_env(registry.store())
+    errors: list[Optional[Exception]] = [None] * len(groups)
+    batch = []
+    for index, records in enumerate(groups):
+        try:
+            folded = fold_records(records, guard, database)
+            if folded is None:
+                continue
+            body, events = folded
+            attempt = max(
+                int(record.get("attributes", {}).get("ApproximateReceiveCount", 1))
+                for record in records
+            )
+            batch.append(
+                (index, events, build_action(body, database, registry, attempt))
+            )
+        except Exception as e:
+            errors[index] = e
+    outcomes = build_pipeline(database, registry).run(
+        [action for _, _, action in batch]
+    )
+    for (index, _, _), outcome in zip(batch, outcomes):
+        errors[index] = outcome["exception"]
+    _fail_following_groups(groups, errors)
+    for (index, events, action), outcome in zip(batch, outcomes):
+        if errors[index] is not None:
+            if outcome["exception"] is None:
+                # retried after the failed event of the athlete : its targets are written again
+                action.forget_targets()
+            continue
+        for event in events:
+            guard.mark_processed(event)
+        logger.info(outcome["result"])
+    return errors
+
+
+def process_records(
+    records: list[dict[str, Any]], budget: Optional[float] = None
+) -> list[Optional[Exception]]:
+    """
+    Process a batch of SQS records, the records folded together succeed or fail together, see coalesce.
+
+    :param records: SQS records, in the order of the queue
+    :param budget: number of seconds to process the records, None for no deadline
+    :return: for each record, the exception raised while processing it, None if it succeeded
+    """
+    groups = coalesce(records)
+    with deadline_scope(budget):
+        errors = process_groups(groups)
+    errors_by_id = {}
+    for group, exception in zip(groups, errors):
+        for record in group:
+            if exception is not None:
+                logger.error(
+                    f"exception encountered while processing {record['messageId']}",
+                    exc_info=exception,
+                )
+            errors_by_id[record["messageId"]] = exception
+    return [errors_by_id[record["messageId"]] for record in records]
+
+
+def record_retry_delay(record: dict[str, Any], exception: BaseException) -> int:
+    """
+    Return the number of seconds before the next receive of a failed record, with an exponential backoff.
+
+    PROCESS_EVENTS_RETRY_BASE_SECONDS (30 by default) is the delay after the first failure,
+    PROCESS_EVENTS_RETRY_MAX_SECONDS (240 by default) the maximum delay.
+
+    :param record:
+    :param exception:
+    :return:
+    """
+    return retry_delay(
+        record,
+        exception,
+        float(os.environ.get("PROCESS_EVENTS_RETRY_BASE_SECONDS", 30)),
+        float(os.environ.get("PROCESS_EVENTS_RETRY_MAX_SECONDS", 240)),
+    )
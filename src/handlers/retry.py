@@ -0,0 +1,36 @@
+"""Define the delay before a failed SQS record is received again."""
+from typing import Any
+
+
+def queue_url_from_arn(arn: str) -> str:
+    """
+    Return the URL of a SQS queue from its ARN.
+
+    :param arn: e.g. arn:aws:sqs:eu-north-1:123456789012:queue.fifo
+    :return:
+    """
+    _, partition, _, region, account_id, name = arn.split(":")
+    domain = "amazonaws.com.cn" if partition == "aws-cn" else "amazonaws.com"
+    return f"https://sqs.{region}.{domain}/{account_id}/{name}"
+
+
+def retry_delay(
+    record: dict[str, Any], exception: BaseException, base: float, maximum: float
+) -> int:
+    """
+    Return the number of seconds before retrying a failed record.
+
+    The delay doubles at each receive of the record, exceptions telling when to retry (rate limits) are
+    honoured, within the maximum.
+
+    :param record: SQS record
+    :param exception: exception raised by the processing of the record
+    :param base: delay after the first receive
+    :param maximum: maximum delay
+    :return:
+    """
+    attempt = int(record.get("attributes", {}).get("ApproximateReceiveCount", 1))
+    delay = max(
+        base * 2 ** (attempt - 1), float(getattr(exception, "retry_after", 0) or 0)
+    )
+    return int(min(delay, maximum))
@@ -1,4 +1,10 @@
 """Define handlers for Strava subscriptions."""
+import zlib
+from typing import Optional
+
+from src.types.event import StravaEvent
+
+DEFAULT_MESSAGE_GROUP_ID = "1"
 
 
 def callback_validation(
@@ -19,3 +25,36 @@ def callback_validation(
             f"hub.verify token incorrect, value received : {query_parameters['hub.verify_token']}"
         )
     return {"hub.challenge": query_parameters["hub.challenge"]}
+
+
+def get_message_group_id(event: StravaEvent, shards: Optional[int] = None) -> str:
+    """
+    Return the SQS message group id of a Strava event.
+
+    Messages of a same group are processed in order, different groups are processed concurrently.
+    The group is derived from the athlete (owner_id) so that events of an athlete stay ordered.
+    With `shards`, athletes are hashed into a fixed number of groups.
+
+    :param event: body of the Strava webhook event
+    :param shards: number of message groups, None to use one group per athlete
+    :return:
+    """
+    owner_id = str(event.get("owner_id", ""))
+    if owner_id == "":
+        return DEFAULT_MESSAGE_GROUP_ID
+    if shards is None:
+        return owner_id
+    if shards <= 0:
+        raise ValueError(f"shards must be a positive integer, got {shards}")
+    # crc32 is stable across processes unlike the builtin hash
+    return str(zlib.crc32(owner_id.encode("utf-8")) % shards)
+
+
+def get_event_key(event: StravaEvent) -> str:
+    """
+    Return the key identifying a Strava event, the same for all deliveries of the event.
+
+    :param event:
+    :return:
+    """
+    return f"{event['object_type']}:{event['object_id']}:{event['aspect_type']}:{event['event_time']}"
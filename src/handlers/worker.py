@@ -0,0 +1,283 @@
+"""
+Run the processor as a long-running worker polling message queues, an alternative to the Lambda function.
+
+Pollers long-poll the queues and process the received batches as the Lambda function processes its SQS events.
+The visibility of the messages being processed is extended, so that a long batch is not received again.
+"""
+import logging
+import os
+import threading
+from typing import Any, Callable, Optional
+
+from src.handlers.process import process_records, record_retry_delay
+from src.queue.interface import Message, MessageQueue
+from src.utils.metrics import METRICS
+
+logger = logging.getLogger()
+
+ProcessRecords = Callable[
+    [list[dict[str, Any]], Optional[float]], list[Optional[Exception]]
+]
+
+
+def to_record(message: Message) -> dict[str, Any]:
+    """
+    Return the SQS record of a Lambda event carrying a received message.
+
+    :param message:
+    :return:
+    """
+    return {
+        "messageId": message["message_id"],
+        "receiptHandle": message["receipt_handle"],
+        "body": message["body"],
+        "attributes": {"ApproximateReceiveCount": str(message["receive_count"])},
+    }
+
+
+class VisibilityExtender:
+    """Extend periodically the visibility of the messages being processed."""
+
+    def __init__(self, visibility_timeout: float, interval: Optional[float] = None):
+        """
+        Init instance.
+
+        :param visibility_timeout: number of seconds the messages are hidden from now at each extension
+        :param interval: number of seconds between two extensions, a third of the visibility timeout by default
+        """
+        self.visibility_timeout = visibility_timeout
+        self.interval = interval or visibility_timeout / 3
+        # queue of the receipt handles being processed
+        self._queues: dict[str, MessageQueue] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, queue: MessageQueue, receipt_handles: list[str]) -> None:
+        """
+        Extend the visibility of messages until they are removed.
+
+        :param queue:
+        :param receipt_handles:
+        :return:
+        """
+        with self._lock:
+            for receipt_handle in receipt_handles:
+                self._queues[receipt_handle] = queue
+
+    def remove(self, receipt_handles: list[str]) -> None:
+        """
+        Stop extending the visibility of messages, no extension is in progress when it returns.
+
+        :param receipt_handles:
+        :return:
+        """
+        with self._lock:
+            for receipt_handle in receipt_handles:
+                self._queues.pop(receipt_handle, None)
+
+    def extend(self) -> int:
+        """
+        Extend the visibility of the messages being processed, a failure is only logged.
+
+        :return: number of extended messages
+        """
+        extended = 0
+        with self._lock:
+            for receipt_handle, queue in self._queues.items():
+                try:
+                    queue.change_visibility(receipt_handle, self.visibility_timeout)
+                    extended += 1
+                except Exception:
+                    logger.exception(
+                        f"failed to extend the visibility of {receipt_handle}"
+                    )
+        METRICS.increment("worker.visibility_extended", extended)
+        return extended
+
+    def _run(self) -> None:
+        """
+        Extend the visibility at each interval until stopped.
+
+        :return:
+        """
+        while not self._stopped.wait(self.interval):
+            self.extend()
+
+    def start(self) -> None:
+        """
+        Start extending in a background thread.
+
+        :return:
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="visibility-extender", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop extending and wait for the background thread.
+
+        :return:
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class Worker:
+    """
+    Poll message queues and process the received batches with a pool of pollers.
+
+    Each poller receives a batch at a time : the number of batches processed concurrently is the number of
+    pollers per queue times the number of queues. Within a batch, the actions run concurrently, see
+    build_pipeline.
+    """
+
+    def __init__(
+        self,
+        queues: list[MessageQueue],
+        concurrency: int = 1,
+        batch_size: int = 10,
+        wait_seconds: float = 20,
+        visibility_timeout: float = 60,
+        batch_timeout: Optional[float] = None,
+        process: ProcessRecords = process_records,
+    ):
+        """
+        Init instance.
+
+        :param queues: queues to poll
+        :param concurrency: number of pollers per queue
+        :param batch_size: maximum number of messages received at once
+        :param wait_seconds: maximum number of seconds a receive waits for messages (long polling)
+        :param visibility_timeout: number of seconds the messages being processed are hidden at each extension
+        :param batch_timeout: number of seconds to process a batch, None for no deadline
+        :param process: function processing SQS records, see process_records
+        """
+        self.queues = queues
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.wait_seconds = wait_seconds
+        self.batch_timeout = batch_timeout
+        self.process = process
+        self.extender = VisibilityExtender(visibility_timeout)
+        self._stopping = threading.Event()
+
+    @classmethod
+    def from_env(cls, queues: list[MessageQueue]) -> "Worker":
+        """
+        Build a worker configured with environment variables.
+
+        WORKER_CONCURRENCY (4), WORKER_BATCH_SIZE (10), WORKER_WAIT_SECONDS (20), WORKER_VISIBILITY_TIMEOUT (60)
+        and WORKER_BATCH_TIMEOUT (no deadline) are optional.
+
+        :param queues: queues to poll
+        :return:
+        """
+        batch_timeout = os.getenv("WORKER_BATCH_TIMEOUT")
+        return cls(
+            queues,
+            concurrency=int(os.getenv("WORKER_CONCURRENCY", 4)),
+            batch_size=int(os.getenv("WORKER_BATCH_SIZE", 10)),
+            wait_seconds=float(os.getenv("WORKER_WAIT_SECONDS", 20)),
+            visibility_timeout=float(os.getenv("WORKER_VISIBILITY_TIMEOUT", 60)),
+            batch_timeout=float(batch_timeout) if batch_timeout else None,
+        )
+
+    def process_batch(self, queue: MessageQueue, messages: list[Message]) -> int:
+        """
+        Process received messages, delete the succeeded ones and delay the retry of the failed ones.
+
+        :param queue: queue of the messages
+        :param messages:
+        :return: number of failed messages
+        """
+        records = [to_record(message) for message in messages]
+        receipt_handles = [message["receipt_handle"] for message in messages]
+        self.extender.add(queue, receipt_handles)
+        try:
+            errors = self.process(records, self.batch_timeout)
+        except Exception as e:
+            logger.exception("failed to process a batch")
+            errors = [e] * len(records)
+        finally:
+            self.extender.remove(receipt_handles)
+        failed = 0
+        for record, exception in zip(records, errors):
+            try:
+                if exception is None:
+                    queue.delete(record["receiptHandle"])
+                else:
+                    failed += 1
+                    queue.change_visibility(
+                        record["receiptHandle"], record_retry_delay(record, exception)
+                    )
+            except Exception:
+                logger.exception(f"failed to settle message {record['messageId']}")
+        METRICS.increment("worker.messages", len(records))
+        METRICS.increment("worker.failures", failed)
+        return failed
+
+    def poll(self, queue: MessageQueue) -> int:
+        """
+        Receive a batch of messages and process it.
+
+        :param queue:
+        :return: number of received messages
+        """
+        messages = queue.receive(self.batch_size, self.wait_seconds)
+        if len(messages) > 0:
+            self.process_batch(queue, messages)
+        return len(messages)
+
+    def _run_poller(self, queue: MessageQueue) -> None:
+        """
+        Poll a queue until the worker is stopped.
+
+        :param queue:
+        :return:
+        """
+        while not self._stopping.is_set():
+            try:
+                self.poll(queue)
+            except Exception:
+                logger.exception("failed to poll the queue")
+                # e.g. the queue is unreachable : do not spin
+                self._stopping.wait(self.wait_seconds or 1)
+
+    def run(self) -> None:
+        """
+        Run the pollers until the worker is stopped, then wait for the batches being processed.
+
+        :return:
+        """
+        self._stopping.clear()
+        self.extender.start()
+        pollers = [
+            threading.Thread(
+                target=self._run_poller, args=(queue,), name=f"poller-{i}-{j}"
+            )
+            for i, queue in enumerate(self.queues)
+            for j in range(self.concurrency)
+        ]
+        for poller in pollers:
+            poller.start()
+        for poller in pollers:
+            poller.join()
+        self.extender.stop()
+        logger.info(f"metrics : {METRICS.snapshot()}")
+
+    def stop(self) -> None:
+        """
+        Stop the pollers gracefully.
+
+        The batches being processed are completed, a receive in progress returns within wait_seconds and its
+        messages are processed. It may be called from a signal handler.
+
+        :return:
+        """
+        self._stopping.set()
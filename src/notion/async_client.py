@@ -0,0 +1,197 @@
+"""Define a class AsyncClient to interact with Notion API with asyncio."""
+import json
+from typing import AsyncIterator, Optional
+
+from src.const import NOTION_DATABASE_ACTIVITY_ID
+from src.notion.client import Client
+from src.utils.async_transport import AsyncTransport, get_async_transport
+from src.utils.metrics import METRICS
+from src.utils.pagination import apaginate
+from src.utils.rate_limit import KeyedRateLimiter, get_notion_rate_limiter
+
+
+class AsyncClient:
+    """
+    Client to interact with Notion API with asyncio.
+
+    It implements the endpoints used to synchronize activities, with the same behaviour as Client.
+    """
+
+    base_url = Client.base_url
+
+    def __init__(
+        self,
+        access_token: str,
+        version="2022-06-28",
+        transport: Optional[AsyncTransport] = None,
+        bot_id: Optional[str] = None,
+        rate_limiter: Optional[KeyedRateLimiter] = None,
+        max_rate_limited_retries: int = 3,
+    ):
+        """
+        Init instance.
+
+        :param access_token:
+        :param version:
+        :param transport: HTTP transport, the shared one by default
+        :param bot_id: id of the integration, requests are rate limited per integration
+        :param rate_limiter: rate limiter of requests, the shared one by default
+        :param max_rate_limited_retries: number of retries of a request answered with status 429
+        """
+        self.access_token = access_token
+        self.transport = transport or get_async_transport()
+        self.version = version
+        self.bot_id = bot_id
+        self.rate_limiter = rate_limiter or get_notion_rate_limiter()
+        self.max_rate_limited_retries = max_rate_limited_retries
+
+    async def _request(self, method: str, url: str, **kwargs):
+        """
+        Send a request once a token of the integration is available, see Client._request.
+
+        :param method:
+        :param url:
+        :return:
+        """
+        bucket = self.rate_limiter.bucket(self.bot_id or self.access_token)
+        for _ in range(self.max_rate_limited_retries + 1):
+            METRICS.gauge("notion.rate_limit.queue_depth", bucket.queue_depth)
+            METRICS.observe("notion.rate_limit.wait", await bucket.acquire_async())
+            res = await self.transport.request(method, url, **kwargs)
+            if res.status_code != 429:
+                break
+            METRICS.increment("notion.rate_limit.throttled")
+            bucket.pause(float(res.headers.get("Retry-After", 1)))
+        return res
+
+    @property
+    def header(self) -> dict:
+        """
+        Returns base headers.
+
+        :return:
+        """
+        return {
+            "Authorization": f"Bearer {self.access_token}",
+            "Notion-Version": self.version,
+        }
+
+    async def create_page(
+        self, parent_id: str, properties: dict, to_database: bool = True
+    ) -> dict:
+        """
+        Create a page.
+
+        :param parent_id:
+        :param properties:
+        :param to_database:
+        :return:
+        """
+        parent = "database_id" if to_database else "page_id"
+        body = {"parent": {parent: parent_id}, "properties": properties}
+        res = await self._request(
+            "POST", f"{self.base_url}v1/pages", headers=self.header, json=body
+        )
+        if res.status_code != 200:
+            raise Exception(res.text)
+        return json.loads(res.content)
+
+    async def query_database(
+        self,
+        database_id: str,
+        filter_properties: list[str] = None,
+        filter_: dict = None,
+        start_cursor: str = None,
+    ) -> dict:
+        """
+        Call the Query database endpoint.
+
+        :param database_id:
+        :param filter_properties:
+        :param filter_:
+        :param start_cursor:
+        :return:
+        """
+        url = f"{self.base_url}v1/databases/{database_id}/query"
+        params = None
+        if filter_properties is not None:
+            params = [("filter_properties", prop) for prop in filter_properties]
+        body = {}
+        for k, v in {"filter": filter_, "start_cursor": start_cursor}.items():
+            if v is not None:
+                body[k] = v
+        res = await self._request(
+            "POST", url, headers=self.header, json=body, params=params
+        )
+        if res.status_code != 200:
+            raise Exception(res.text)
+        return json.loads(res.content)
+
+    def iter_query_database(
+        self,
+        database_id: str,
+        filter_properties: list[str] = None,
+        filter_: dict = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Iterate over the pages of a database across all result pages of the Query database endpoint.
+
+        :param database_id:
+        :param filter_properties: ids of the properties to return
+        :param filter_:
+        :return:
+        """
+
+        async def fetch_page(cursor: Optional[str]) -> tuple[list[dict], Optional[str]]:
+            res = await self.query_database(
+                database_id, filter_properties, filter_, cursor
+            )
+            return res["results"], res["next_cursor"] if res.get("has_more") else None
+
+        return apaginate(fetch_page)
+
+    async def update_page_properties(
+        self, page_id: str, properties: dict = None, archived: bool = None
+    ) -> dict:
+        """
+        Update properties of an existing page.
+
+        :param page_id:
+        :param properties:
+        :param archived:
+        :return:
+        """
+        body = {}
+        for k, v in {"properties": properties, "archived": archived}.items():
+            if v is not None:
+                body[k] = v
+        res = await self._request(
+            "PATCH",
+            f"{self.base_url}v1/pages/{page_id}",
+            headers=self.header,
+            json=body,
+        )
+        if res.status_code != 200:
+            raise Exception(res.text)
+        return json.loads(res.content)
+
+
+async def get_ids_of_page_activity(
+    client: AsyncClient, database_id: str, activity_id: str
+) -> list[str]:
+    """
+    Get list of page ids that have the value of Activity ID equals to activity_id, see src.notion.utils.get_ids_of_page_activity.
+
+    :param client:
+    :param database_id:
+    :param activity_id:
+    :return:
+    """
+    _filter = {
+        "property": NOTION_DATABASE_ACTIVITY_ID,
+        "rich_text": {"equals": activity_id},
+    }
+    pages = client.iter_query_database(
+        database_id, filter_properties=["title"], filter_=_filter
+    )
+    return [page["id"] async for page in pages]
@@ -1,23 +1,68 @@
 """Define a class Client to interact with Notion API."""
 import json
+from typing import Iterator, Optional
 
 import requests
 
+from src.utils.metrics import METRICS
+from src.utils.pagination import paginate
+from src.utils.rate_limit import KeyedRateLimiter, get_notion_rate_limiter
+from src.utils.transport import Transport, get_transport
+
 
 class Client:
     """Client to interact with Notion API."""
 
     base_url = "https://api.notion.com/"
 
-    def __init__(self, access_token: str, version="2022-06-28"):
+    def __init__(
+        self,
+        access_token: str,
+        version="2022-06-28",
+        transport: Optional[Transport] = None,
+        bot_id: Optional[str] = None,
+        rate_limiter: Optional[KeyedRateLimiter] = None,
+        max_rate_limited_retries: int = 3,
+    ):
         """
         Init instance.
 
         :param access_token:
         :param version:
+        :param transport: HTTP transport, the shared one by default
+        :param bot_id: id of the integration, requests are rate limited per integration
+        :param rate_limiter: rate limiter of requests, the shared one by default
+        :param max_rate_limited_retries: number of retries of a request answered with status 429
         """
         self.access_token = access_token
+        self.transport = transport or get_transport()
         self.version = version
+        self.bot_id = bot_id
+        self.rate_limiter = rate_limiter or get_notion_rate_limiter()
+        self.max_rate_limited_retries = max_rate_limited_retries
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request once a token of the integration is available.
+
+        A request answered with status 429 is retried after the delay of its Retry-After header,
+        all requests of the integration wait meanwhile.
+
+        :param method:
+        :param url:
+        :return:
+        """
+        # without bot id, the access token identifies the integration in a workspace
+        bucket = self.rate_limiter.bucket(self.bot_id or self.access_token)
+        for _ in range(self.max_rate_limited_retries + 1):
+            METRICS.gauge("notion.rate_limit.queue_depth", bucket.queue_depth)
+            METRICS.observe("notion.rate_limit.wait", bucket.acquire())
+            res = self.transport.request(method, url, **kwargs)
+            if res.status_code != 429:
+                break
+            METRICS.increment("notion.rate_limit.throttled")
+            bucket.pause(float(res.headers.get("Retry-After", 1)))
+        return res
 
     @property
     def header(self) -> dict:
@@ -63,7 +108,7 @@ class Client:
             if v is not None:
                 body[k] = v
 
-        res = requests.post(url, headers=self.header, json=body)
+        res = self._request("POST", url, headers=self.header, json=body)
         if res.status_code != 200:
             raise Exception(res.text)
         else:
@@ -104,12 +149,42 @@ class Client:
         }.items():
             if v is not None:
                 body[k] = v
-        res = requests.post(url, headers=self.header, json=body, params=params)
+        res = self._request("POST", url, headers=self.header, json=body, params=params)
         if res.status_code != 200:
             raise Exception(res.text)
         else:
             return json.loads(res.content)
 
+    def iter_query_database(
+        self,
+        database_id: str,
+        filter_properties: list[str] = None,
+        filter_: dict = None,
+        sorts: list = None,
+        page_size: int = None,
+        prefetch: bool = False,
+    ) -> Iterator[dict]:
+        """
+        Iterate over the pages of a database across all result pages of the Query database endpoint.
+
+        Result pages are fetched lazily.
+        :param database_id:
+        :param filter_properties: ids of the properties to return
+        :param filter_:
+        :param sorts:
+        :param page_size:
+        :param prefetch: fetch the next result page in background
+        :return:
+        """
+
+        def fetch_page(cursor: Optional[str]) -> tuple[list[dict], Optional[str]]:
+            res = self.query_database(
+                database_id, filter_properties, filter_, sorts, cursor, page_size
+            )
+            return res["results"], res["next_cursor"] if res.get("has_more") else None
+
+        return paginate(fetch_page, prefetch)
+
     def update_page_properties(
         self,
         page_id: str,
@@ -138,7 +213,7 @@ class Client:
         }.items():
             if v is not None:
                 body[k] = v
-        res = requests.patch(url, headers=self.header, json=body)
+        res = self._request("PATCH", url, headers=self.header, json=body)
         if res.status_code != 200:
             raise Exception(res.text)
         else:
@@ -174,12 +249,38 @@ class Client:
         }.items():
             if v is not None:
                 body[k] = v
-        res = requests.post(url, headers=self.header, json=body)
+        res = self._request("POST", url, headers=self.header, json=body)
         if res.status_code != 200:
             raise Exception(res.text)
         else:
             return json.loads(res.content)
 
+    def iter_search(
+        self,
+        query: str = None,
+        sort: dict = None,
+        _filter: dict = None,
+        page_size: int = None,
+        prefetch: bool = False,
+    ) -> Iterator[dict]:
+        """
+        Iterate over the objects of all result pages of the search endpoint.
+
+        Result pages are fetched lazily.
+        :param query:
+        :param sort:
+        :param _filter:
+        :param page_size:
+        :param prefetch: fetch the next result page in background
+        :return:
+        """
+
+        def fetch_page(cursor: Optional[str]) -> tuple[list[dict], Optional[str]]:
+            res = self.search(query, sort, _filter, cursor, page_size)
+            return res["results"], res["next_cursor"] if res.get("has_more") else None
+
+        return paginate(fetch_page, prefetch)
+
     def create_database(self, parent: dict, title: list, properties: dict) -> dict:
         """
         Call the database endpoint to create a new one.
@@ -191,7 +292,7 @@ class Client:
         """
         url = f"{self.base_url}v1/databases"
         body = {"parent": parent, "title": title, "properties": properties}
-        res = requests.post(url, headers=self.header, json=body)
+        res = self._request("POST", url, headers=self.header, json=body)
         if res.status_code != 200:
             raise Exception(res.text)
         else:
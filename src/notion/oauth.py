@@ -1,12 +1,20 @@
 """Handle the OAuth flow of Notion to allow access to the public integration."""
 import base64
 import json
+from typing import Optional
 
 import requests
 
+from src.utils.transport import Transport, get_transport
+
 
 def exchange_token(
-    *, code: str, client_id: str, client_secret: str, redirect_uri: str
+    *,
+    code: str,
+    client_id: str,
+    client_secret: str,
+    redirect_uri: str,
+    transport: Optional[Transport] = None,
 ) -> requests.Response:
     """
     Exchange the temporary code for an access token.
@@ -15,6 +23,7 @@ def exchange_token(
     :param client_id:
     :param client_secret:
     :param redirect_uri:
+    :param transport: HTTP transport, the shared one by default
     :return:
     """
     url = "https://api.notion.com/v1/oauth/token"
@@ -31,5 +40,5 @@ def exchange_token(
         "redirect_uri": redirect_uri,
     }
 
-    res = requests.post(url, headers=headers, json=body)
+    res = (transport or get_transport()).post(url, headers=headers, json=body)
     return json.loads(res.content)
@@ -0,0 +1,115 @@
+"""
+Build Notion page properties from Strava activities.
+
+The builder is compiled once from a column spec : for each property, the key of the activity holding its value
+and the function building the property value of its type. Properties are built as dicts, no JSON is parsed.
+"""
+from typing import Any, Callable, Iterable
+
+from src.const import NOTION_DATABASE_PROPERTIES_COLUMNS, NOTION_DATABASE_SCHEMA
+
+# maximum length of the content of a text object accepted by Notion
+RICH_TEXT_MAX_LENGTH = 2000
+
+
+def _text(value: Any) -> list[dict]:
+    """
+    Return a rich text array holding a value.
+
+    :param value:
+    :return: empty array if value is None
+    """
+    if value is None:
+        return []
+    return [{"text": {"content": str(value)[:RICH_TEXT_MAX_LENGTH]}}]
+
+
+PROPERTY_VALUE_BUILDERS: dict[str, Callable[[Any], dict]] = {
+    "title": lambda value: {"title": _text(value)},
+    "rich_text": lambda value: {"rich_text": _text(value)},
+    "number": lambda value: {"number": value},
+    "select": lambda value: {
+        "select": {"name": str(value)} if value is not None else None
+    },
+    "date": lambda value: {"date": {"start": value} if value is not None else None},
+}
+
+
+class PropertiesBuilder:
+    """Build the properties of Notion pages from a column spec."""
+
+    def __init__(self, columns: dict[str, str], schema: dict[str, dict]):
+        """
+        Init instance.
+
+        :param columns: dict with property name as key and key of the activity as value
+        :param schema: Notion database schema, giving the type of each property
+        """
+        self._builders: dict[str, Callable[[Any], dict]] = {}
+        for name in columns:
+            property_type = next(iter(schema[name]))
+            if property_type not in PROPERTY_VALUE_BUILDERS:
+                raise ValueError(f"unsupported type {property_type} of property {name}")
+            self._builders[name] = PROPERTY_VALUE_BUILDERS[property_type]
+        self._columns = [
+            (name, key, self._builders[name]) for name, key in columns.items()
+        ]
+
+    def build_property(self, name: str, value: Any) -> dict:
+        """
+        Return the value of a single property.
+
+        :param name: name of the property
+        :param value:
+        :return:
+        """
+        return self._builders[name](value)
+
+    def build(self, activity: dict) -> dict:
+        """
+        Return the properties of an activity.
+
+        Missing keys build empty properties.
+
+        :param activity:
+        :return:
+        """
+        return {name: build(activity.get(key)) for name, key, build in self._columns}
+
+    def build_many(self, activities: Iterable[dict]) -> list[dict]:
+        """
+        Return the properties of several activities.
+
+        :param activities:
+        :return:
+        """
+        columns = self._columns
+        return [
+            {name: build(activity.get(key)) for name, key, build in columns}
+            for activity in activities
+        ]
+
+
+ACTIVITY_PROPERTIES = PropertiesBuilder(
+    NOTION_DATABASE_PROPERTIES_COLUMNS, NOTION_DATABASE_SCHEMA
+)
+
+
+def build_properties(activity: dict) -> dict:
+    """
+    Return the Notion properties of a projected Strava activity with its username.
+
+    :param activity:
+    :return:
+    """
+    return ACTIVITY_PROPERTIES.build(activity)
+
+
+def build_properties_many(activities: Iterable[dict]) -> list[dict]:
+    """
+    Return the Notion properties of several projected Strava activities with their username.
+
+    :param activities:
+    :return:
+    """
+    return ACTIVITY_PROPERTIES.build_many(activities)
@@ -1,4 +1,8 @@
 """Utility functions to interact with Notion API."""
+import hashlib
+import json
+from typing import Optional
+
 from src.const import NOTION_DATABASE_ACTIVITY_ID
 from src.notion.client import Client
 
@@ -19,5 +23,41 @@ def get_ids_of_page_activity(
         "rich_text": {"equals": activity_id},
     }
 
-    pages = client.query_database(database_id, filter_=_filter)
-    return [page["id"] for page in pages["results"]]
+    # only the title property is returned since the ids are the only values used
+    pages = client.iter_query_database(
+        database_id, filter_properties=["title"], filter_=_filter
+    )
+    return [page["id"] for page in pages]
+
+
+def property_hashes(properties: dict) -> dict[str, str]:
+    """
+    Return a content hash of each property.
+
+    :param properties: Notion properties
+    :return: dict with property name as key and hash as value
+    """
+    return {
+        name: hashlib.sha1(
+            json.dumps(value, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        for name, value in properties.items()
+    }
+
+
+def changed_properties(properties: dict, last_hashes: Optional[dict[str, str]]) -> dict:
+    """
+    Return the properties whose content differs from the last written one.
+
+    :param properties: Notion properties to write
+    :param last_hashes: hashes of the last written properties, None if unknown
+    :return:
+    """
+    if last_hashes is None:
+        return properties
+    hashes = property_hashes(properties)
+    return {
+        name: value
+        for name, value in properties.items()
+        if last_hashes.get(name) != hashes[name]
+    }
@@ -0,0 +1,6 @@
+"""
+Message queues carrying Strava events to the processor.
+
+One interface that declares methods (send, receive, delete ...).
+Concrete classes that perform the methods with a given queue system (example : SQS, memory, SQLite).
+"""
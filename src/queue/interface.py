@@ -0,0 +1,58 @@
+"""Declare the message queue interface."""
+from abc import ABC, abstractmethod
+from typing import Optional, TypedDict
+
+
+class Message(TypedDict):
+    """Message received from a queue, the receipt handle is used to delete it."""
+
+    message_id: str
+    receipt_handle: str
+    body: str
+    receive_count: int
+
+
+class MessageQueue(ABC):
+    """Message queue interface."""
+
+    @abstractmethod
+    def send(
+        self, body: str, group_id: Optional[str] = None, delay_seconds: int = 0
+    ) -> None:
+        """
+        Send a message.
+
+        :param body:
+        :param group_id: group of the message, messages of a group are received in order (FIFO queues)
+        :param delay_seconds: number of seconds before the message can be received
+        :return:
+        """
+
+    @abstractmethod
+    def receive(self, max_messages: int = 10, wait_seconds: float = 0) -> list[Message]:
+        """
+        Receive messages, hidden from other receivers until deleted or until their visibility timeout.
+
+        :param max_messages:
+        :param wait_seconds: maximum number of seconds to wait for a message (long polling)
+        :return:
+        """
+
+    @abstractmethod
+    def delete(self, receipt_handle: str) -> None:
+        """
+        Delete a received message.
+
+        :param receipt_handle:
+        :return:
+        """
+
+    @abstractmethod
+    def change_visibility(self, receipt_handle: str, visibility_timeout: float) -> None:
+        """
+        Hide a received message for a number of seconds from now, e.g. to extend the processing or delay a retry.
+
+        :param receipt_handle:
+        :param visibility_timeout: number of seconds, 0 to make the message visible again
+        :return:
+        """
@@ -0,0 +1,188 @@
+"""Concrete implementation of message queue in the memory of the process."""
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from src.queue.interface import Message, MessageQueue
+
+
+class MemoryQueue(MessageQueue):
+    """
+    Concrete implementation of MessageQueue, a local stand-in of SQS.
+
+    Messages become visible after their delay, visible messages are received in order of sending. A received
+    message is hidden for the visibility timeout, then received again unless deleted. Messages of a group are
+    not received while an earlier message of the group is in flight, as with SQS FIFO queues.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Init instance.
+
+        :param visibility_timeout: number of seconds a received message is hidden
+        :param clock: function returning the current time in seconds
+        """
+        self.visibility_timeout = visibility_timeout
+        self.clock = clock
+        # heap of (visible_at, sequence, message_id), entries of deleted or rescheduled messages are skipped
+        self._heap: list[tuple[float, int, str]] = []
+        self._visible_at: dict[str, float] = {}
+        self._sent_at: dict[str, int] = {}
+        self._messages: dict[str, Message] = {}
+        self._group_ids: dict[str, str] = {}
+        # ids of the messages of each group, in order of sending
+        self._groups: dict[str, list[str]] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        """
+        Return the number of messages not deleted, visible or not.
+
+        :return:
+        """
+        with self._condition:
+            return len(self._messages)
+
+    def _push(self, message_id: str, visible_at: float) -> None:
+        """
+        Schedule the visibility of a message, lock must be held.
+
+        :param message_id:
+        :param visible_at:
+        :return:
+        """
+        self._visible_at[message_id] = visible_at
+        heapq.heappush(self._heap, (visible_at, next(self._sequence), message_id))
+        self._condition.notify_all()
+
+    def send(
+        self, body: str, group_id: Optional[str] = None, delay_seconds: int = 0
+    ) -> None:
+        """
+        Send a message.
+
+        :param body:
+        :param group_id: group of the message, messages of a group are received in order
+        :param delay_seconds: number of seconds before the message can be received
+        :return:
+        """
+        message_id = uuid.uuid4().hex
+        with self._condition:
+            self._messages[message_id] = {
+                "message_id": message_id,
+                "receipt_handle": "",
+                "body": body,
+                "receive_count": 0,
+            }
+            self._sent_at[message_id] = next(self._sequence)
+            if group_id is not None:
+                self._group_ids[message_id] = group_id
+                self._groups.setdefault(group_id, []).append(message_id)
+            self._push(message_id, self.clock() + delay_seconds)
+
+    def receive(self, max_messages: int = 10, wait_seconds: float = 0) -> list[Message]:
+        """
+        Receive messages, hidden from other receivers until deleted or until their visibility timeout.
+
+        :param max_messages:
+        :param wait_seconds: maximum number of seconds to wait for a message
+        :return:
+        """
+        deadline = self.clock() + wait_seconds
+        with self._condition:
+            while True:
+                now = self.clock()
+                visible = []
+                while self._heap and self._heap[0][0] <= now:
+                    entry = heapq.heappop(self._heap)
+                    message_id = entry[2]
+                    if (
+                        message_id in self._messages
+                        and self._visible_at[message_id] == entry[0]
+                    ):
+                        # not deleted nor rescheduled
+                        visible.append(entry)
+                visible.sort(key=lambda entry: self._sent_at[entry[2]])
+                received = []
+                received_by_group: dict[str, int] = {}
+                for entry in visible:
+                    message_id = entry[2]
+                    group_id = self._group_ids.get(message_id)
+                    position = (
+                        self._groups[group_id].index(message_id)
+                        if group_id is not None
+                        else None
+                    )
+                    if len(received) == max_messages or (
+                        # received only if all earlier messages of the group are received in this call
+                        group_id is not None
+                        and position != received_by_group.get(group_id, 0)
+                    ):
+                        heapq.heappush(self._heap, entry)
+                        continue
+                    if group_id is not None:
+                        received_by_group[group_id] = position + 1
+                    message = self._messages[message_id]
+                    message["receive_count"] += 1
+                    message[
+                        "receipt_handle"
+                    ] = f"{message_id}:{message['receive_count']}"
+                    self._push(message_id, now + self.visibility_timeout)
+                    received.append(dict(message))
+                if received or now >= deadline:
+                    return received
+                # deferred messages wait for a delete or a change of visibility, which notify
+                next_visible = min(
+                    (entry[0] for entry in self._heap if entry[0] > now),
+                    default=deadline,
+                )
+                self._condition.wait(max(0, min(deadline, next_visible) - now))
+
+    def delete(self, receipt_handle: str) -> None:
+        """
+        Delete a received message.
+
+        The receipt handle of a previous receive of the message is ignored.
+
+        :param receipt_handle:
+        :return:
+        """
+        message_id = receipt_handle.split(":")[0]
+        with self._condition:
+            message = self._messages.get(message_id)
+            if message is None or message["receipt_handle"] != receipt_handle:
+                return
+            del self._messages[message_id]
+            del self._visible_at[message_id]
+            del self._sent_at[message_id]
+            group_id = self._group_ids.pop(message_id, None)
+            if group_id is not None:
+                self._groups[group_id].remove(message_id)
+                if len(self._groups[group_id]) == 0:
+                    del self._groups[group_id]
+            # the next message of the group may be received
+            self._condition.notify_all()
+
+    def change_visibility(self, receipt_handle: str, visibility_timeout: float) -> None:
+        """
+        Hide a received message for a number of seconds from now.
+
+        The receipt handle of a previous receive of the message is ignored.
+
+        :param receipt_handle:
+        :param visibility_timeout: number of seconds, 0 to make the message visible again
+        :return:
+        """
+        message_id = receipt_handle.split(":")[0]
+        with self._condition:
+            message = self._messages.get(message_id)
+            if message is not None and message["receipt_handle"] == receipt_handle:
+                self._push(message_id, self.clock() + visibility_timeout)
@@ -0,0 +1,190 @@
+"""Concrete implementation of message queue with an embedded SQLite file."""
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from src.queue.interface import Message, MessageQueue
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS messages ("
+    "sequence INTEGER PRIMARY KEY AUTOINCREMENT, message_id TEXT UNIQUE, body TEXT, group_id TEXT, "
+    "visible_at REAL, receive_count INTEGER DEFAULT 0, receipt_handle TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_visible_at ON messages (visible_at)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_group_id ON messages (group_id, sequence)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_receipt_handle ON messages (receipt_handle)",
+]
+
+
+class SqliteQueue(MessageQueue):
+    """
+    Concrete implementation of MessageQueue, a local stand-in of SQS shared by the processes of a host.
+
+    Visible messages are received in order of sending, delays, visibility and groups behave as with MemoryQueue.
+    A receive polls the file while waiting. Visibility uses the wall clock.
+    Each thread uses its own connection, the database is in WAL mode.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: float = 30,
+        poll_interval: float = 0.2,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Init instance.
+
+        :param path: path of the SQLite file, created if it does not exist
+        :param visibility_timeout: number of seconds a received message is hidden
+        :param poll_interval: number of seconds between two polls of a receive waiting for messages
+        :param clock: function returning the current unix time in seconds
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self._local = threading.local()
+        with self._connection() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Return the connection of the current thread.
+
+        :return:
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def __len__(self) -> int:
+        """
+        Return the number of messages not deleted, visible or not.
+
+        :return:
+        """
+        return self._connection().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def send(
+        self, body: str, group_id: Optional[str] = None, delay_seconds: int = 0
+    ) -> None:
+        """
+        Send a message.
+
+        :param body:
+        :param group_id: group of the message, messages of a group are received in order
+        :param delay_seconds: number of seconds before the message can be received
+        :return:
+        """
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO messages (message_id, body, group_id, visible_at) VALUES (?, ?, ?, ?)",
+                (uuid.uuid4().hex, body, group_id, self.clock() + delay_seconds),
+            )
+
+    def _receive(self, max_messages: int) -> list[Message]:
+        """
+        Receive the visible messages without waiting.
+
+        :param max_messages:
+        :return:
+        """
+        connection = self._connection()
+        with connection:
+            # lock the file before reading, so that concurrent receivers do not get the same messages
+            connection.execute("BEGIN IMMEDIATE")
+            now = self.clock()
+            received = []
+            received_by_group: dict[str, int] = {}
+            rows = connection.execute(
+                "SELECT sequence, message_id, body, group_id, receive_count FROM messages "
+                "WHERE visible_at <= ? ORDER BY sequence",
+                (now,),
+            )
+            for sequence, message_id, body, group_id, receive_count in rows:
+                if len(received) == max_messages:
+                    break
+                if group_id is not None:
+                    # received only if all earlier messages of the group are received in this call
+                    earlier = connection.execute(
+                        "SELECT COUNT(*) FROM messages WHERE group_id = ? AND sequence < ?",
+                        (group_id, sequence),
+                    ).fetchone()[0]
+                    if earlier != received_by_group.get(group_id, 0):
+                        continue
+                    received_by_group[group_id] = earlier + 1
+                received.append(
+                    {
+                        "message_id": message_id,
+                        "receipt_handle": f"{message_id}:{receive_count + 1}",
+                        "body": body,
+                        "receive_count": receive_count + 1,
+                    }
+                )
+            connection.executemany(
+                "UPDATE messages SET receive_count = ?, receipt_handle = ?, visible_at = ? "
+                "WHERE message_id = ?",
+                [
+                    (
+                        message["receive_count"],
+                        message["receipt_handle"],
+                        now + self.visibility_timeout,
+                        message["message_id"],
+                    )
+                    for message in received
+                ],
+            )
+        return received
+
+    def receive(self, max_messages: int = 10, wait_seconds: float = 0) -> list[Message]:
+        """
+        Receive messages, hidden from other receivers until deleted or until their visibility timeout.
+
+        :param max_messages:
+        :param wait_seconds: maximum number of seconds to wait for a message
+        :return:
+        """
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            received = self._receive(max_messages)
+            left = deadline - time.monotonic()
+            if received or left <= 0:
+                return received
+            time.sleep(min(self.poll_interval, left))
+
+    def delete(self, receipt_handle: str) -> None:
+        """
+        Delete a received message.
+
+        The receipt handle of a previous receive of the message is ignored.
+
+        :param receipt_handle:
+        :return:
+        """
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM messages WHERE receipt_handle = ?", (receipt_handle,)
+            )
+
+    def change_visibility(self, receipt_handle: str, visibility_timeout: float) -> None:
+        """
+        Hide a received message for a number of seconds from now.
+
+        The receipt handle of a previous receive of the message is ignored.
+
+        :param receipt_handle:
+        :param visibility_timeout: number of seconds, 0 to make the message visible again
+        :return:
+        """
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE messages SET visible_at = ? WHERE receipt_handle = ?",
+                (self.clock() + visibility_timeout, receipt_handle),
+            )
@@ -0,0 +1,97 @@
+"""Concrete implementation of message queue with AWS SQS."""
+from typing import Any, Optional
+
+from src.queue.interface import Message, MessageQueue
+
+# maximum delay of a message supported by SQS
+MAX_DELAY_SECONDS = 900
+# maximum visibility timeout of a message supported by SQS
+MAX_VISIBILITY_TIMEOUT = 43200
+
+
+class SqsQueue(MessageQueue):
+    """
+    Concrete implementation of MessageQueue.
+
+    FIFO queues only support a delay per queue : delayed messages must be sent to a standard queue.
+    """
+
+    def __init__(self, url: str, client: Any):
+        """
+        Init instance.
+
+        :param url: URL of the queue
+        :param client: boto3 SQS client
+        """
+        self.url = url
+        self.client = client
+        self.fifo = url.endswith(".fifo")
+
+    def send(
+        self, body: str, group_id: Optional[str] = None, delay_seconds: int = 0
+    ) -> None:
+        """
+        Send a message.
+
+        :param body:
+        :param group_id: group of the message, required by FIFO queues
+        :param delay_seconds: number of seconds before the message can be received, at most 900
+        :return:
+        """
+        parameters = {"QueueUrl": self.url, "MessageBody": body}
+        if group_id is not None:
+            parameters["MessageGroupId"] = group_id
+        if delay_seconds > 0:
+            if self.fifo:
+                raise ValueError("FIFO queues do not support a delay per message")
+            parameters["DelaySeconds"] = min(delay_seconds, MAX_DELAY_SECONDS)
+        self.client.send_message(**parameters)
+
+    def receive(self, max_messages: int = 10, wait_seconds: float = 0) -> list[Message]:
+        """
+        Receive messages, hidden from other receivers until deleted or until their visibility timeout.
+
+        :param max_messages: at most 10
+        :param wait_seconds: maximum number of seconds to wait for a message, at most 20
+        :return:
+        """
+        res = self.client.receive_message(
+            QueueUrl=self.url,
+            MaxNumberOfMessages=min(max_messages, 10),
+            WaitTimeSeconds=int(min(wait_seconds, 20)),
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+        return [
+            {
+                "message_id": m["MessageId"],
+                "receipt_handle": m["ReceiptHandle"],
+                "body": m["Body"],
+                "receive_count": int(
+                    m.get("Attributes", {}).get("ApproximateReceiveCount", 1)
+                ),
+            }
+            for m in res.get("Messages", [])
+        ]
+
+    def delete(self, receipt_handle: str) -> None:
+        """
+        Delete a received message.
+
+        :param receipt_handle:
+        :return:
+        """
+        self.client.delete_message(QueueUrl=self.url, ReceiptHandle=receipt_handle)
+
+    def change_visibility(self, receipt_handle: str, visibility_timeout: float) -> None:
+        """
+        Hide a received message for a number of seconds from now.
+
+        :param receipt_handle:
+        :param visibility_timeout: number of seconds, at most 43200
+        :return:
+        """
+        self.client.change_message_visibility(
+            QueueUrl=self.url,
+            ReceiptHandle=receipt_handle,
+            VisibilityTimeout=int(min(visibility_timeout, MAX_VISIBILITY_TIMEOUT)),
+        )
@@ -0,0 +1,289 @@
+"""
+Define a registry of the database backend, the key-value store, the message queues and API clients.
+
+The registry lives as long as the process so that a warm Lambda container reuses the database backend and
+the API clients across records and invocations instead of rebuilding them for each event.
+"""
+import os
+import threading
+from typing import Callable, Optional
+
+from src.database.airtable import AirtableDatabase
+from src.database.cache import CachedDatabase
+from src.database.interface import DatabaseInterface
+from src.database.sqlite import SqliteDatabase
+from src.notion.client import Client as NotionClient
+from src.queue.interface import MessageQueue
+from src.queue.memory import MemoryQueue
+from src.queue.sqlite import SqliteQueue
+from src.queue.sqs import SqsQueue
+from src.store.dynamodb import DynamoDbStore
+from src.store.interface import KeyValueStore
+from src.store.memory import MemoryStore
+from src.store.sqlite import SqliteStore
+from src.strava.client import Client as StravaClient
+from src.strava.tokens import TokenManager
+from src.types.database import StravaToken
+from src.utils.exceptions import MissingEnvironmentVariable
+
+
+def build_database() -> DatabaseInterface:
+    """
+    Build the database backend configured with environment variables.
+
+    DATABASE_BACKEND selects the backend : airtable (default) or sqlite, in which case
+    SQLITE_DATABASE_PATH is the path of the SQLite file.
+    The backend is wrapped in a read-through cache unless DATABASE_CACHE_MAX_ENTRIES is 0.
+
+    :return:
+    """
+    backend = os.getenv("DATABASE_BACKEND", "airtable")
+    if backend == "airtable":
+        database = AirtableDatabase()
+    elif backend == "sqlite":
+        path = os.getenv("SQLITE_DATABASE_PATH")
+        if path is None:
+            raise MissingEnvironmentVariable("SQLITE_DATABASE_PATH")
+        database = SqliteDatabase(path)
+    else:
+        raise ValueError(f"unknown database backend {backend}")
+    max_entries = int(os.getenv("DATABASE_CACHE_MAX_ENTRIES", 1024))
+    if max_entries > 0:
+        database = CachedDatabase(database, max_entries=max_entries)
+    return database
+
+
+def build_store() -> KeyValueStore:
+    """
+    Build the key-value store configured with environment variables.
+
+    STORE_BACKEND selects the backend :
+    - memory (default) : the memory of the process, for a single process only
+    - sqlite : the SQLite file STORE_SQLITE_PATH, shared by the processes of a host
+    - dynamodb : the DynamoDB table STORE_DYNAMODB_TABLE, shared by every Lambda container and worker
+
+    :return:
+    """
+    backend = os.getenv("STORE_BACKEND", "memory")
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "dynamodb":
+        table_name = os.getenv("STORE_DYNAMODB_TABLE")
+        if table_name is None:
+            raise MissingEnvironmentVariable("STORE_DYNAMODB_TABLE")
+        # provided by the Lambda runtime
+        import boto3
+
+        return DynamoDbStore(table_name, boto3.client("dynamodb"))
+    if backend == "sqlite":
+        path = os.getenv("STORE_SQLITE_PATH")
+        if path is None:
+            raise MissingEnvironmentVariable("STORE_SQLITE_PATH")
+        return SqliteStore(path)
+    raise ValueError(f"unknown store backend {backend}")
+
+
+def build_queues() -> dict[str, MessageQueue]:
+    """
+    Build the message queues configured with environment variables.
+
+    QUEUE_BACKEND selects the backend :
+    - sqs (default) : the events queue is SQS_URL, the debounce queue is SQS_DEBOUNCE_URL if set
+    - memory : a queue in the memory of the process, for the ingress and the worker running in one process
+    - sqlite : a queue in the SQLite file QUEUE_SQLITE_PATH, shared by the processes of a host
+    The local backends support a delay per message : the same queue is used for events and debounced events.
+    QUEUE_VISIBILITY_TIMEOUT (60 by default) is their visibility timeout.
+
+    :return: dict with the name of a queue (events, debounce) as key
+    """
+    backend = os.getenv("QUEUE_BACKEND", "sqs")
+    if backend == "sqs":
+        # provided by the Lambda runtime
+        import boto3
+
+        client = boto3.client("sqs")
+        url = os.getenv("SQS_URL")
+        if url is None:
+            raise MissingEnvironmentVariable("SQS_URL")
+        queues = {"events": SqsQueue(url, client)}
+        debounce_url = os.getenv("SQS_DEBOUNCE_URL")
+        if debounce_url is not None:
+            queues["debounce"] = SqsQueue(debounce_url, client)
+        return queues
+    visibility_timeout = float(os.getenv("QUEUE_VISIBILITY_TIMEOUT", 60))
+    if backend == "memory":
+        queue = MemoryQueue(visibility_timeout)
+    elif backend == "sqlite":
+        path = os.getenv("QUEUE_SQLITE_PATH")
+        if path is None:
+            raise MissingEnvironmentVariable("QUEUE_SQLITE_PATH")
+        queue = SqliteQueue(path, visibility_timeout)
+    else:
+        raise ValueError(f"unknown queue backend {backend}")
+    return {"events": queue, "debounce": queue}
+
+
+class ClientRegistry:
+    """Create the database backend and the API clients once and reuse them."""
+
+    def __init__(
+        self,
+        database_factory: Callable[[], DatabaseInterface] = build_database,
+        store_factory: Callable[[], KeyValueStore] = build_store,
+        queues_factory: Callable[[], dict[str, MessageQueue]] = build_queues,
+    ):
+        """
+        Init instance.
+
+        :param database_factory: callable building the database backend
+        :param store_factory: callable building the key-value store
+        :param queues_factory: callable building the message queues by name
+        """
+        self.database_factory = database_factory
+        self.store_factory = store_factory
+        self.queues_factory = queues_factory
+        self._database: Optional[DatabaseInterface] = None
+        self._store: Optional[KeyValueStore] = None
+        self._queues: Optional[dict[str, MessageQueue]] = None
+        self._strava_clients: dict[tuple[str, str], StravaClient] = {}
+        self._notion_clients: dict[str, NotionClient] = {}
+        self.token_manager = TokenManager.from_env()
+        self._lock = threading.Lock()
+
+    def database(self) -> DatabaseInterface:
+        """
+        Return the database backend, built on first use.
+
+        :return:
+        """
+        if self._database is None:
+            with self._lock:
+                if self._database is None:
+                    self._database = self.database_factory()
+        return self._database
+
+    def store(self) -> KeyValueStore:
+        """
+        Return the key-value store, built on first use.
+
+        :return:
+        """
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self.store_factory()
+        return self._store
+
+    def queues(self) -> dict[str, MessageQueue]:
+        """
+        Return the message queues by name, built on first use.
+
+        :return:
+        """
+        if self._queues is None:
+            with self._lock:
+                if self._queues is None:
+                    self._queues = self.queues_factory()
+        return self._queues
+
+    def queue(self, name: str) -> MessageQueue:
+        """
+        Return a message queue, see build_queues.
+
+        :param name: events or debounce
+        :return:
+        """
+        queues = self.queues()
+        if name not in queues:
+            raise ValueError(f"no {name} queue configured")
+        return queues[name]
+
+    def strava_client(
+        self, athlete_id: str, user_email: str, token: StravaToken
+    ) -> StravaClient:
+        """
+        Return the Strava client of an athlete account.
+
+        The cached client is replaced if the stored token differs from the one held by the client, i.e. when the
+        credentials were rotated by someone else.
+
+        :param athlete_id:
+        :param user_email:
+        :param token: credentials stored in the database
+        :return:
+        """
+        key = (athlete_id, user_email)
+        with self._lock:
+            client = self._strava_clients.get(key)
+            if (
+                client is None
+                or client.access_token != token["access_token"]
+                or client.refresh_token != token["refresh_token"]
+            ):
+                client = StravaClient(
+                    token["access_token"],
+                    token["refresh_token"],
+                    int(token["expires_at"]),
+                )
+                self._strava_clients[key] = client
+            return client
+
+    def notion_client(self, bot_id: str, access_token: str) -> NotionClient:
+        """
+        Return the Notion client of an integration.
+
+        The cached client is replaced if the access token changed.
+
+        :param bot_id:
+        :param access_token:
+        :return:
+        """
+        with self._lock:
+            client = self._notion_clients.get(bot_id)
+            if client is None or client.access_token != access_token:
+                client = NotionClient(access_token, bot_id=bot_id)
+                self._notion_clients[bot_id] = client
+            return client
+
+    def invalidate_strava_client(self, athlete_id: str, user_email: str) -> None:
+        """
+        Drop the cached Strava client of an athlete account.
+
+        :param athlete_id:
+        :param user_email:
+        :return:
+        """
+        with self._lock:
+            self._strava_clients.pop((athlete_id, user_email), None)
+
+    def clear(self) -> None:
+        """
+        Drop the database backend and all cached clients.
+
+        The message queues are kept : the memory queue holds messages not processed yet.
+
+        :return:
+        """
+        with self._lock:
+            self._database = None
+            self._store = None
+            self._strava_clients.clear()
+            self._notion_clients.clear()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ClientRegistry:
+    """
+    Return the registry shared by the process.
+
+    :return:
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+    return _registry
@@ -0,0 +1,6 @@
+"""
+Key-value stores with expiration.
+
+One interface that declares methods (get, set, add if absent ...).
+Concrete classes that perform the methods with a given storage (example : memory, SQLite, DynamoDB).
+"""
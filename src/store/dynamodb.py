@@ -0,0 +1,102 @@
+"""Concrete implementation of key-value store with an AWS DynamoDB table."""
+import time
+from typing import Any, Callable, Optional
+
+from src.store.interface import KeyValueStore
+
+
+class DynamoDbStore(KeyValueStore):
+    """
+    Concrete implementation of KeyValueStore, shared by every Lambda container and worker.
+
+    The table has the string partition key "key", items hold the attributes value and expires_at, a unix time
+    in seconds. DynamoDB deletes expired items up to days late when expires_at is its TTL attribute : reads
+    ignore them. Reads are strongly consistent, add is a conditional write.
+    """
+
+    def __init__(
+        self, table_name: str, client: Any, clock: Callable[[], float] = time.time
+    ):
+        """
+        Init instance.
+
+        :param table_name:
+        :param client: boto3 DynamoDB client
+        :param clock: function returning the current unix time in seconds
+        """
+        self.table_name = table_name
+        self.client = client
+        self.clock = clock
+
+    def _item(self, key: str, value: str, ttl: Optional[float]) -> dict:
+        """
+        Return the item of a key.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return:
+        """
+        item = {"key": {"S": key}, "value": {"S": value}}
+        if ttl is not None:
+            item["expires_at"] = {"N": str(self.clock() + ttl)}
+        return item
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the value of a key.
+
+        :param key:
+        :return: None if the key is missing or expired
+        """
+        item = self.client.get_item(
+            TableName=self.table_name, Key={"key": {"S": key}}, ConsistentRead=True
+        ).get("Item")
+        if item is None:
+            return None
+        if "expires_at" in item and float(item["expires_at"]["N"]) <= self.clock():
+            return None
+        return item["value"]["S"]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Set the value of a key.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return:
+        """
+        self.client.put_item(
+            TableName=self.table_name, Item=self._item(key, value, ttl)
+        )
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """
+        Set the value of a key only if it is missing or expired, atomically.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return: True if the value was set
+        """
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item=self._item(key, value, ttl),
+                ConditionExpression="attribute_not_exists(#key) OR expires_at <= :now",
+                ExpressionAttributeNames={"#key": "key"},
+                ExpressionAttributeValues={":now": {"N": str(self.clock())}},
+            )
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def delete(self, key: str) -> None:
+        """
+        Delete a key.
+
+        :param key:
+        :return:
+        """
+        self.client.delete_item(TableName=self.table_name, Key={"key": {"S": key}})
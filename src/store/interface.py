@@ -0,0 +1,47 @@
+"""Declare the key-value store interface."""
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class KeyValueStore(ABC):
+    """Key-value store interface, values expire after their time to live."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the value of a key.
+
+        :param key:
+        :return: None if the key is missing or expired
+        """
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Set the value of a key.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return:
+        """
+
+    @abstractmethod
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """
+        Set the value of a key only if it is missing or expired, atomically.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return: True if the value was set
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Delete a key.
+
+        :param key:
+        :return:
+        """
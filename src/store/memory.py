@@ -0,0 +1,107 @@
+"""Concrete implementation of key-value store in the memory of the process."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from src.store.interface import KeyValueStore
+
+
+class MemoryStore(KeyValueStore):
+    """
+    Concrete implementation of KeyValueStore.
+
+    Values live as long as the process. The store is bounded, the least recently written keys are dropped first.
+    """
+
+    def __init__(
+        self, max_entries: int = 100000, clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Init instance.
+
+        :param max_entries: maximum number of keys
+        :param clock: function returning the current time in seconds
+        """
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[Optional[float], str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        """
+        Return the value of a key, lock must be held.
+
+        :param key:
+        :return:
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        return value
+
+    def _set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        """
+        Set the value of a key, lock must be held.
+
+        :param key:
+        :param value:
+        :param ttl:
+        :return:
+        """
+        expires_at = self.clock() + ttl if ttl is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the value of a key.
+
+        :param key:
+        :return: None if the key is missing or expired
+        """
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Set the value of a key.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return:
+        """
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """
+        Set the value of a key only if it is missing or expired, atomically.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return: True if the value was set
+        """
+        with self._lock:
+            if self._get(key) is not None:
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        """
+        Delete a key.
+
+        :param key:
+        :return:
+        """
+        with self._lock:
+            self._entries.pop(key, None)
@@ -0,0 +1,124 @@
+"""Concrete implementation of key-value store with an embedded SQLite file."""
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from src.store.interface import KeyValueStore
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)",
+    "CREATE INDEX IF NOT EXISTS idx_kv_expires_at ON kv (expires_at)",
+]
+
+
+class SqliteStore(KeyValueStore):
+    """
+    Concrete implementation of KeyValueStore.
+
+    This implementation uses a SQLite file shared by the processes of a host. Expiration uses the wall clock.
+    Each thread uses its own connection, the database is in WAL mode.
+    """
+
+    def __init__(self, path: str):
+        """
+        Init instance.
+
+        :param path: path of the SQLite file, created if it does not exist
+        """
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Return the connection of the current thread.
+
+        :return:
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the value of a key.
+
+        :param key:
+        :return: None if the key is missing or expired
+        """
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return row[0] if row is not None else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Set the value of a key.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return:
+        """
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """
+        Set the value of a key only if it is missing or expired, atomically.
+
+        :param key:
+        :param value:
+        :param ttl: time to live in seconds, None to never expire
+        :return: True if the value was set
+        """
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._connection() as connection:
+            return (
+                connection.execute(
+                    "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE "
+                    "SET value = excluded.value, expires_at = excluded.expires_at "
+                    "WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+                    (key, value, expires_at, now),
+                ).rowcount
+                == 1
+            )
+
+    def delete(self, key: str) -> None:
+        """
+        Delete a key.
+
+        :param key:
+        :return:
+        """
+        with self._connection() as connection:
+            connection.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def purge(self) -> int:
+        """
+        Delete the expired keys.
+
+        :return: number of deleted keys
+        """
+        with self._connection() as connection:
+            return connection.execute(
+                "DELETE FROM kv WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
@@ -0,0 +1,146 @@
+"""Implement a client that handles Strava API calls with asyncio."""
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from src.strava.client import Client
+from src.strava.rate_limit import StravaRateLimit, get_strava_rate_limit
+from src.strava.types import DetailedActivity
+from src.types.strava import Token
+from src.utils.async_transport import AsyncTransport, get_async_transport
+from src.utils.exceptions import MissingEnvironmentVariable, RateLimitExceeded
+
+
+class AsyncClient:
+    """
+    Strava API manager with asyncio.
+
+    It implements the endpoints used to synchronize activities, with the same behaviour as Client.
+    """
+
+    base_url = Client.base_url
+
+    def __init__(
+        self,
+        access_token: str,
+        refresh_token: str,
+        expires_at: int,
+        version_label="v3",
+        transport: Optional[AsyncTransport] = None,
+        rate_limit: Optional[StravaRateLimit] = None,
+    ):
+        """
+        Init instance.
+
+        :param access_token:
+        :param refresh_token:
+        :param expires_at:
+        :param version_label:
+        :param transport: HTTP transport, the shared one by default
+        :param rate_limit: model of the rate limits of the application, the shared one by default
+        """
+        self.access_token = access_token
+        self.transport = transport or get_async_transport()
+        self.rate_limit = rate_limit or get_strava_rate_limit()
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.url = f"{self.base_url}{version_label}/"
+        self.client_id = os.getenv("STRAVA_CLIENT_ID")
+        self.client_secret = os.getenv("STRAVA_CLIENT_SECRET")
+
+        for var, name in [
+            (self.client_id, "STRAVA_CLIENT_ID"),
+            (self.client_secret, "STRAVA_CLIENT_SECRET"),
+        ]:
+            if var is None:
+                raise MissingEnvironmentVariable(name)
+
+    @property
+    def authorization(self) -> dict:
+        """
+        Get the authorization header.
+
+        :return:
+        """
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+    async def _request(self, method: str, url: str, **kwargs):
+        """
+        Send a request within the rate limits of the application, see Client._request.
+
+        :param method:
+        :param url:
+        :return:
+        """
+        await self.rate_limit.reserve_async()
+        res = await self.transport.request(method, url, **kwargs)
+        self.rate_limit.update(res.headers)
+        if res.status_code == 429:
+            raise RateLimitExceeded("Strava", self.rate_limit.exhaust())
+        return res
+
+    def expires_within(self, seconds: float, ref: Optional[datetime] = None) -> bool:
+        """
+        Tell whether the access token expires within a number of seconds.
+
+        :param seconds:
+        :param ref: reference time, now by default
+        :return:
+        """
+        ref = ref or datetime.now()
+        return datetime.fromtimestamp(self.expires_at) <= ref + timedelta(
+            seconds=seconds
+        )
+
+    async def refresh_access_token(
+        self, ref: Optional[datetime] = None, margin: float = 10
+    ) -> Optional[Token]:
+        """
+        Refresh access_token if it expires within a margin.
+
+        Set the instance variables and returns the token.
+
+        :param ref: reference time, now by default
+        :param margin: number of seconds before expiry from which the token is refreshed
+        :return: None if the token is still valid
+        """
+        if not self.expires_within(margin, ref):
+            return None
+        params = {
+            "grant_type": "refresh_token",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "refresh_token": self.refresh_token,
+        }
+        res = await self._request("POST", f"{self.url}oauth/token", params=params)
+        if res.status_code != 200:
+            raise Exception(res.text)
+        content = json.loads(res.content)
+        self.access_token = content["access_token"]
+        self.refresh_token = content["refresh_token"]
+        self.expires_at = content["expires_at"]
+        return {
+            "access_token": self.access_token,
+            "refresh_token": self.refresh_token,
+            "expires_at": self.expires_at,
+        }
+
+    async def get_activity(
+        self, activity_id: str, include_all_efforts: bool = False
+    ) -> DetailedActivity:
+        """
+        Call the get activity endpoint.
+
+        :param activity_id:
+        :param include_all_efforts:
+        :return:
+        """
+        url = f"{self.url}activities/{activity_id}"
+        # httpx sends booleans as true/false, as requests sends True/False
+        param = {"include_all_efforts": str(include_all_efforts)}
+        await self.refresh_access_token()
+        res = await self._request("GET", url, params=param, headers=self.authorization)
+        if res.status_code != 200:
+            raise Exception(res.text)
+        return json.loads(res.content)
@@ -6,9 +6,11 @@ from typing import Optional
 
 import requests
 
+from src.strava.rate_limit import StravaRateLimit, get_strava_rate_limit
 from src.strava.types import DetailedActivity
 from src.types.strava import Token
-from src.utils.exceptions import MissingEnvironmentVariable
+from src.utils.exceptions import MissingEnvironmentVariable, RateLimitExceeded
+from src.utils.transport import Transport, get_transport
 
 
 class Client:
@@ -17,7 +19,13 @@ class Client:
     base_url = "https://www.strava.com/api/"
 
     def __init__(
-        self, access_token: str, refresh_token: str, expires_at: int, version_label="v3"
+        self,
+        access_token: str,
+        refresh_token: str,
+        expires_at: int,
+        version_label="v3",
+        transport: Optional[Transport] = None,
+        rate_limit: Optional[StravaRateLimit] = None,
     ):
         """
         Init instance.
@@ -26,8 +34,12 @@ class Client:
         :param refresh_token:
         :param expires_at:
         :param version_label:
+        :param transport: HTTP transport, the shared one by default
+        :param rate_limit: model of the rate limits of the application, the shared one by default
         """
         self.access_token = access_token
+        self.transport = transport or get_transport()
+        self.rate_limit = rate_limit or get_strava_rate_limit()
         self.refresh_token = refresh_token
         self.expires_at = expires_at
         self.url = f"{self.base_url}{version_label}/"
@@ -50,16 +62,49 @@ class Client:
         """
         return {"Authorization": f"Bearer {self.access_token}"}
 
-    def refresh_access_token(self, ref=datetime.now()) -> Optional[Token]:
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
         """
-        Refresh access_token if expired.
+        Send a request within the rate limits of the application.
 
-        Set the instance variables and returns the token.
+        Raise RateLimitExceeded if Strava answered with status 429.
+
+        :param method:
+        :param url:
+        :return:
+        """
+        self.rate_limit.reserve()
+        res = self.transport.request(method, url, **kwargs)
+        self.rate_limit.update(res.headers)
+        if res.status_code == 429:
+            raise RateLimitExceeded("Strava", self.rate_limit.exhaust())
+        return res
+
+    def expires_within(self, seconds: float, ref: Optional[datetime] = None) -> bool:
+        """
+        Tell whether the access token expires within a number of seconds.
 
+        :param seconds:
+        :param ref: reference time, now by default
         :return:
         """
-        now = ref - timedelta(seconds=10)  # take a security of few seconds
-        if datetime.fromtimestamp(self.expires_at) <= now:
+        ref = ref or datetime.now()
+        return datetime.fromtimestamp(self.expires_at) <= ref + timedelta(
+            seconds=seconds
+        )
+
+    def refresh_access_token(
+        self, ref: Optional[datetime] = None, margin: float = 10
+    ) -> Optional[Token]:
+        """
+        Refresh access_token if it expires within a margin.
+
+        Set the instance variables and returns the token.
+
+        :param ref: reference time, now by default
+        :param margin: number of seconds before expiry from which the token is refreshed
+        :return: None if the token is still valid
+        """
+        if self.expires_within(margin, ref):
             url = f"{self.url}oauth/token"
             params = {
                 "grant_type": "refresh_token",
@@ -67,7 +112,7 @@ class Client:
                 "client_secret": self.client_secret,
                 "refresh_token": self.refresh_token,
             }
-            res = requests.post(url, params=params)
+            res = self._request("POST", url, params=params)
             if res.status_code != 200:
                 raise Exception(res.text)
             content = json.loads(res.content)
@@ -93,7 +138,7 @@ class Client:
         url = f"{self.url}activities/{activity_id}"
         param = {"include_all_efforts": include_all_efforts}
         self.refresh_access_token()
-        res = requests.get(url, params=param, headers=self.authorization)
+        res = self._request("GET", url, params=param, headers=self.authorization)
         if res.status_code != 200:
             raise Exception(res.text)
         else:
@@ -107,7 +152,7 @@ class Client:
         """
         url = f"{self.url}athlete/"
         self.refresh_access_token()
-        res = requests.get(url, headers=self.authorization)
+        res = self._request("GET", url, headers=self.authorization)
         if res.status_code != 200:
             raise Exception(res.text)
         else:
@@ -1,11 +1,18 @@
 """Handle the OAuth flow for Strava."""
 import json
+from typing import Optional
 
 import requests
 
+from src.utils.transport import Transport, get_transport
+
 
 def exchange_code(
-    *, code: str, client_id: str, client_secret: str
+    *,
+    code: str,
+    client_id: str,
+    client_secret: str,
+    transport: Optional[Transport] = None,
 ) -> requests.Response:
     """
     Exchange the code received by the client with Strava to receive access token and refresh token.
@@ -13,6 +20,7 @@ def exchange_code(
     :param code: code received by the client
     :param client_id: client id of the Strava app
     :param client_secret: client secret of the Strava app
+    :param transport: HTTP transport, the shared one by default
     :return:
     """
     url = "https://www.strava.com/oauth/token"
@@ -24,5 +32,5 @@ def exchange_code(
         "code": code,
     }
 
-    res = requests.post(url, json=body)
+    res = (transport or get_transport()).post(url, json=body)
     return json.loads(res.content)
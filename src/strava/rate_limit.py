@@ -0,0 +1,282 @@
+"""
+Track the usage of the Strava rate limits, shared by all athletes of the application.
+
+Strava limits the requests of an application over 15 minutes windows, starting at each quarter hour, and over
+days, starting at midnight UTC. Every response reports the limits and the usage of both windows in its
+X-RateLimit-Limit and X-RateLimit-Usage headers, e.g. "200,2000" and "12,130".
+The requests are attributed to an athlete and a priority with request_scope.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Callable, Iterator, Mapping, Optional
+
+from src.utils.deadline import remaining
+from src.utils.exceptions import RateLimitExceeded, WorkDeferred
+from src.utils.metrics import METRICS
+
+# duration in seconds of the short and long windows
+WINDOWS = (15 * 60, 24 * 60 * 60)
+
+
+class Priority(IntEnum):
+    """Priority of the requests of a scope."""
+
+    REALTIME = 0
+    BACKGROUND = 1
+
+
+# athlete on behalf of whom the requests of the scope are sent, None if unknown, and their priority
+_origin: contextvars.ContextVar[
+    tuple[Optional[str], Priority]
+] = contextvars.ContextVar("strava_request_origin", default=(None, Priority.REALTIME))
+
+
+@contextmanager
+def request_scope(
+    athlete_id: Optional[str], priority: Priority = Priority.REALTIME
+) -> Iterator[None]:
+    """
+    Attribute the Strava requests sent within the scope to an athlete and a priority, see StravaRateLimit.
+
+    :param athlete_id:
+    :param priority:
+    :return:
+    """
+    token = _origin.set((athlete_id, priority))
+    try:
+        yield
+    finally:
+        _origin.reset(token)
+
+
+def parse_rate_limit_header(value: Optional[str]) -> Optional[tuple[int, int]]:
+    """
+    Parse a rate limit header holding the values of the short and long windows.
+
+    :param value: e.g. "200,2000"
+    :return: None if the header is missing or malformed
+    """
+    try:
+        short, long = value.split(",")
+        return int(short), int(long)
+    except (AttributeError, ValueError):
+        return None
+
+
+class StravaRateLimit:
+    """
+    Model of the usage of the Strava rate limits of the application.
+
+    The usage is reset from response headers and counted locally between responses. When the short window is
+    almost exhausted, requests are spread over its remaining time, concurrent requests included, unless the wait
+    outlasts the deadline of the invocation : the work is then deferred to a retry of the message.
+    Background requests are deferred first, once a window is used above their share, leaving the rest for
+    realtime synchronization. The requests of an athlete are deferred once they used the share of an athlete of
+    the short window, counted by the process, so that a single athlete cannot exhaust it.
+    """
+
+    def __init__(
+        self,
+        limits: tuple[int, int] = (200, 2000),
+        throttle_threshold: float = 0.8,
+        background_share: float = 0.5,
+        athlete_share: float = 0.25,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Init instance.
+
+        :param limits: limits of the short and long windows, until reported by Strava
+        :param throttle_threshold: usage ratio of the short window above which requests are spread
+        :param background_share: usage ratio of a window above which background requests are deferred
+        :param athlete_share: ratio of the short window an athlete may use
+        :param clock: function returning the current unix time in seconds
+        :param sleep: function sleeping a number of seconds
+        """
+        self.limits = list(limits)
+        self.usage = [0, 0]
+        self.throttle_threshold = throttle_threshold
+        self.background_share = background_share
+        self.athlete_share = athlete_share
+        self.clock = clock
+        self.sleep = sleep
+        self._window_starts = [0.0, 0.0]
+        # requests sent by the process per athlete in the short window
+        self._athlete_usage: dict[str, int] = {}
+        # unix time of the last slot taken by a throttled request
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "StravaRateLimit":
+        """
+        Build a model configured with environment variables.
+
+        STRAVA_RATE_LIMIT_THROTTLE_THRESHOLD, STRAVA_RATE_LIMIT_BACKGROUND_SHARE and
+        STRAVA_RATE_LIMIT_ATHLETE_SHARE are optional.
+
+        :return:
+        """
+        return cls(
+            throttle_threshold=float(
+                os.getenv("STRAVA_RATE_LIMIT_THROTTLE_THRESHOLD", 0.8)
+            ),
+            background_share=float(
+                os.getenv("STRAVA_RATE_LIMIT_BACKGROUND_SHARE", 0.5)
+            ),
+            athlete_share=float(os.getenv("STRAVA_RATE_LIMIT_ATHLETE_SHARE", 0.25)),
+        )
+
+    def _roll(self, now: float) -> None:
+        """
+        Reset the usage of the windows that ended, lock must be held.
+
+        :param now:
+        :return:
+        """
+        for i, duration in enumerate(WINDOWS):
+            start = now - now % duration
+            if start != self._window_starts[i]:
+                self._window_starts[i] = start
+                self.usage[i] = 0
+                if i == 0:
+                    self._athlete_usage = {}
+
+    def _retry_after(self, window: int, now: float) -> float:
+        """
+        Return the number of seconds before the end of a window.
+
+        :param window: index of the window
+        :param now:
+        :return:
+        """
+        return self._window_starts[window] + WINDOWS[window] - now
+
+    def _reserve(self) -> float:
+        """
+        Count a request about to be sent, see reserve.
+
+        :return: number of seconds to wait before sending the request
+        """
+        athlete_id, priority = _origin.get()
+        with self._lock:
+            now = self.clock()
+            self._roll(now)
+            for i in range(len(WINDOWS)):
+                ratio = self.usage[i] / self.limits[i]
+                if ratio >= 1:
+                    raise RateLimitExceeded("Strava", self._retry_after(i, now))
+                if priority == Priority.BACKGROUND and ratio >= self.background_share:
+                    METRICS.increment("strava.rate_limit.background_deferred")
+                    raise WorkDeferred("Strava", self._retry_after(i, now))
+            athlete_usage = self._athlete_usage.get(athlete_id, 0)
+            if (
+                athlete_id is not None
+                and athlete_usage >= self.athlete_share * self.limits[0]
+            ):
+                METRICS.increment("strava.rate_limit.athlete_deferred")
+                raise WorkDeferred("Strava", self._retry_after(0, now))
+            delay = 0
+            if self.usage[0] / self.limits[0] >= self.throttle_threshold:
+                # spread the remaining requests over the remaining time of the window : each request takes the
+                # next slot, so that concurrent callers do not wake up together
+                spacing = self._retry_after(0, now) / (self.limits[0] - self.usage[0])
+                send_at = max(now, self._next_at) + spacing
+                delay = send_at - now
+                left = remaining()
+                if left is not None and delay > left:
+                    # the runtime would stop the invocation while waiting : retry the message later instead
+                    METRICS.increment("strava.rate_limit.deferred")
+                    raise RateLimitExceeded("Strava", delay)
+                self._next_at = send_at
+            self.usage[0] += 1
+            self.usage[1] += 1
+            if athlete_id is not None:
+                self._athlete_usage[athlete_id] = athlete_usage + 1
+        if delay > 0:
+            METRICS.observe("strava.rate_limit.wait", delay)
+        return delay
+
+    def reserve(self) -> float:
+        """
+        Count a request about to be sent, waiting if the short window is almost exhausted.
+
+        Raise RateLimitExceeded if a window is exhausted or if the wait outlasts the deadline of the invocation,
+        WorkDeferred for a background request over its share or for an athlete over theirs.
+
+        :return: number of seconds waited
+        """
+        delay = self._reserve()
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+    async def reserve_async(self) -> float:
+        """
+        Count a request about to be sent, waiting without blocking the event loop, see reserve.
+
+        :return: number of seconds waited
+        """
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """
+        Reset the limits and the usage from the headers of a response.
+
+        :param headers:
+        :return:
+        """
+        limits = parse_rate_limit_header(headers.get("X-RateLimit-Limit"))
+        usage = parse_rate_limit_header(headers.get("X-RateLimit-Usage"))
+        if limits is None or usage is None:
+            return
+        with self._lock:
+            self._roll(self.clock())
+            self.limits = list(limits)
+            # requests sent concurrently may not be counted by the response yet
+            self.usage = [max(u, v) for u, v in zip(self.usage, usage)]
+            METRICS.gauge(
+                "strava.rate_limit.usage_15min", self.usage[0] / self.limits[0]
+            )
+            METRICS.gauge(
+                "strava.rate_limit.usage_daily", self.usage[1] / self.limits[1]
+            )
+
+    def exhaust(self) -> float:
+        """
+        Mark the short window as exhausted, e.g. when Strava answered with status 429.
+
+        :return: number of seconds before the end of the short window
+        """
+        with self._lock:
+            now = self.clock()
+            self._roll(now)
+            self.usage[0] = max(self.usage[0], self.limits[0])
+            return self._retry_after(0, now)
+
+
+_rate_limit: Optional[StravaRateLimit] = None
+_rate_limit_lock = threading.Lock()
+
+
+def get_strava_rate_limit() -> StravaRateLimit:
+    """
+    Return the model of the Strava rate limits shared by the process.
+
+    :return:
+    """
+    global _rate_limit
+    if _rate_limit is None:
+        with _rate_limit_lock:
+            if _rate_limit is None:
+                _rate_limit = StravaRateLimit.from_env()
+    return _rate_limit
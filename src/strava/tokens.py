@@ -0,0 +1,136 @@
+"""
+Refresh the Strava tokens of athletes once per expiry window.
+
+A refresh rotates the refresh token, so two concurrent refreshes of the same athlete account would overwrite
+each other. Refreshes are serialized by a lock per athlete account in the process and by a lease stored in the
+database across processes. Callers arriving during a refresh wait for it and reuse the new token.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable
+
+from src.database.interface import DatabaseInterface
+from src.strava.client import Client as StravaClient
+from src.utils.deadline import check_deadline, remaining
+from src.utils.exceptions import InternalException
+
+logger = logging.getLogger()
+
+
+class TokenManager:
+    """Single-flight proactive refresh of Strava tokens."""
+
+    def __init__(
+        self,
+        margin: float = 300,
+        lease_seconds: float = 30,
+        poll_interval: float = 0.5,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Init instance.
+
+        :param margin: number of seconds before expiry from which a token is refreshed
+        :param lease_seconds: duration of the lease, also the maximum wait for a refresh made elsewhere
+        :param poll_interval: number of seconds between two attempts to acquire the lease
+        :param sleep: function sleeping a number of seconds
+        """
+        self.margin = margin
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+        self.owner = uuid.uuid4().hex
+        self._locks: dict[tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TokenManager":
+        """
+        Build a token manager configured with environment variables.
+
+        STRAVA_TOKEN_REFRESH_MARGIN and STRAVA_TOKEN_REFRESH_LEASE are optional.
+
+        :return:
+        """
+        return cls(
+            margin=float(os.getenv("STRAVA_TOKEN_REFRESH_MARGIN", 300)),
+            lease_seconds=float(os.getenv("STRAVA_TOKEN_REFRESH_LEASE", 30)),
+        )
+
+    def _lock_for(self, athlete_id: str, user_email: str) -> threading.Lock:
+        """
+        Return the lock of an athlete account.
+
+        :param athlete_id:
+        :param user_email:
+        :return:
+        """
+        with self._lock:
+            return self._locks.setdefault((athlete_id, user_email), threading.Lock())
+
+    def _acquire_lease(
+        self, database: DatabaseInterface, athlete_id: str, user_email: str
+    ) -> None:
+        """
+        Acquire the lease of an athlete account, waiting while another process holds it.
+
+        :param database:
+        :param athlete_id:
+        :param user_email:
+        :return:
+        """
+        deadline = time.monotonic() + self.lease_seconds
+        while not database.acquire_token_refresh_lease(
+            athlete_id, user_email, self.owner, self.lease_seconds
+        ):
+            if time.monotonic() >= deadline:
+                raise InternalException(
+                    f"token of athlete {athlete_id} is being refreshed by another process"
+                )
+            # do not poll past the deadline of the invocation
+            check_deadline()
+            left = remaining()
+            self.sleep(
+                self.poll_interval if left is None else min(self.poll_interval, left)
+            )
+
+    def refresh(
+        self,
+        database: DatabaseInterface,
+        athlete_id: str,
+        user_email: str,
+        strava_client: StravaClient,
+    ) -> None:
+        """
+        Make sure the token of a client is valid for at least the margin, refreshing it if needed.
+
+        :param database:
+        :param athlete_id:
+        :param user_email:
+        :param strava_client:
+        :return:
+        """
+        if not strava_client.expires_within(self.margin):
+            return
+        with self._lock_for(athlete_id, user_email):
+            # the client may be shared with a thread which refreshed it meanwhile
+            if not strava_client.expires_within(self.margin):
+                return
+            self._acquire_lease(database, athlete_id, user_email)
+            try:
+                # another process may have refreshed the token before releasing the lease
+                stored = database.get_strava_credentials(athlete_id, user_email)
+                if int(stored["expires_at"]) > strava_client.expires_at:
+                    strava_client.access_token = stored["access_token"]
+                    strava_client.refresh_token = stored["refresh_token"]
+                    strava_client.expires_at = int(stored["expires_at"])
+                token = strava_client.refresh_access_token(margin=self.margin)
+                if token is not None:
+                    logger.debug(f"refreshing token of athlete {athlete_id}")
+                    token["expires_at"] = str(token["expires_at"])
+                    database.update_strava_credentials(athlete_id, user_email, token)
+            finally:
+                database.release_token_refresh_lease(athlete_id, user_email, self.owner)
@@ -1,5 +1,5 @@
 """Types for modules of database package."""
-from typing import TypedDict
+from typing import Optional, TypedDict
 
 
 class StravaToken(TypedDict):
@@ -8,3 +8,34 @@ class StravaToken(TypedDict):
     refresh_token: str
     access_token: str
     expires_at: str
+
+
+class NotionDatabase(TypedDict):
+    """Notion database linked to an athlete account with the access token of its integration."""
+
+    bot_id: str
+    database_id: str
+    access_token: Optional[str]
+
+
+class AthleteAccount(TypedDict):
+    """App account of a Strava athlete."""
+
+    user_email: str
+    strava_token: StravaToken
+    username: str
+    databases: list[NotionDatabase]
+
+
+class AthleteContext(TypedDict):
+    """Everything needed to process an event of a Strava athlete."""
+
+    athlete_id: str
+    accounts: list[AthleteAccount]
+
+
+class NotionPage(TypedDict):
+    """Indexed Notion page of a Strava activity."""
+
+    page_id: str
+    property_hashes: Optional[dict[str, str]]
@@ -1,5 +1,5 @@
 """Define types for object event sent by AWS Lambda runtime."""
-from typing import Any, TypedDict
+from typing import Any, NotRequired, TypedDict
 
 
 class Iam(TypedDict):
@@ -57,3 +57,17 @@ class SqsEvent(TypedDict):
     """Type of SQS event."""
 
     Records: list[dict[Any, Any]]
+
+
+class StravaEvent(TypedDict):
+    """Type of the body of a Strava webhook event."""
+
+    aspect_type: str
+    event_time: int
+    object_id: int
+    object_type: str
+    owner_id: int
+    subscription_id: int
+    updates: dict[str, str]
+    # set by the ingress on the updates it delayed, see src.handlers.debounce
+    debounced: NotRequired[bool]
@@ -0,0 +1,136 @@
+"""
+Define the HTTP transport shared by the asyncio API clients.
+
+It mirrors Transport with httpx, an optional dependency (poetry install --extras async). Its connection pool is
+bound to the event loop of its first request : it is meant to be used from the loop of run_coroutine only, see event_loop.
+"""
+import asyncio
+import os
+import threading
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Optional
+
+from src.utils.deadline import cap_timeout, remaining
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+# methods retried on 502, 503 and 504, as urllib3 does for the blocking transport
+IDEMPOTENT_METHODS = frozenset(["DELETE", "GET", "HEAD", "OPTIONS", "PUT", "TRACE"])
+
+
+class AsyncTransport:
+    """HTTP transport with a keep-alive connection pool, retries and default timeouts."""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        max_retries: int = 2,
+        backoff_factor: float = 0.3,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 20,
+    ):
+        """
+        Init instance.
+
+        :param max_connections: maximum number of concurrent connections, across hosts
+        :param max_keepalive_connections: maximum number of idle connections kept
+        :param max_retries: number of retries on connection errors and 502, 503, 504 of idempotent requests
+        :param backoff_factor: backoff factor between retries
+        :param connect_timeout: default connect timeout in seconds
+        :param read_timeout: default read timeout in seconds
+        """
+        if httpx is None:
+            raise ImportError("httpx is required by the asyncio engine")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=max_retries),
+            # the client is shared by all users, cookies must not leak between them
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        )
+
+    @classmethod
+    def from_env(cls) -> "AsyncTransport":
+        """
+        Build a transport configured with environment variables.
+
+        HTTP_ASYNC_MAX_CONNECTIONS, HTTP_MAX_RETRIES, HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT are optional.
+
+        :return:
+        """
+        return cls(
+            max_connections=int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", 100)),
+            max_retries=int(os.getenv("HTTP_MAX_RETRIES", 2)),
+            connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05)),
+            read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", 20)),
+        )
+
+    async def request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+        """
+        Send a request through the pooled client.
+
+        Accept the same keyword arguments as httpx.AsyncClient.request, the timeout as for requests.
+        The timeout is capped to the time left before the deadline of the invocation.
+
+        :param method:
+        :param url:
+        :return:
+        """
+        timeout = kwargs.pop("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            capped = cap_timeout(timeout)
+            connect, read = capped if isinstance(capped, tuple) else (capped, capped)
+            res = await self.client.request(
+                method, url, timeout=httpx.Timeout(read, connect=connect), **kwargs
+            )
+            backoff = float(
+                res.headers.get("Retry-After", self.backoff_factor * 2**attempt)
+            )
+            left = remaining()
+            if (
+                res.status_code not in (502, 503, 504)
+                or method.upper() not in IDEMPOTENT_METHODS
+                or attempt == self.max_retries
+                # the retry would not be sent before the deadline
+                or (left is not None and backoff >= left)
+            ):
+                return res
+            await asyncio.sleep(backoff)
+        return res
+
+    async def aclose(self) -> None:
+        """
+        Close all pooled connections.
+
+        :return:
+        """
+        await self.client.aclose()
+
+
+_async_transport: Optional[AsyncTransport] = None
+_async_transport_lock = threading.Lock()
+
+
+def get_async_transport() -> AsyncTransport:
+    """
+    Return the asyncio transport shared by the process.
+
+    It is created from the environment on first use.
+
+    :return:
+    """
+    global _async_transport
+    if _async_transport is None:
+        with _async_transport_lock:
+            if _async_transport is None:
+                _async_transport = AsyncTransport.from_env()
+    return _async_transport
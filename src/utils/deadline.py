@@ -0,0 +1,99 @@
+"""
+Propagate the deadline of an invocation down to every blocking call.
+
+The deadline is held in a context variable : it follows the calls of a thread without being passed as an
+argument, and is copied to the threads started with run_in_context.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Union
+
+from src.utils.exceptions import DeadlineExceeded
+
+# time.monotonic() value at which the current invocation must be over, None if unbounded
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+Timeout = Union[None, float, tuple[float, float]]
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Bound the calls made within the scope to a number of seconds.
+
+    An enclosing deadline is kept if it is sooner.
+
+    :param seconds: None for no additional bound
+    :return:
+    """
+    deadline = _deadline.get()
+    if seconds is not None:
+        bound = time.monotonic() + seconds
+        deadline = bound if deadline is None else min(deadline, bound)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Return the number of seconds left before the deadline.
+
+    :return: None if there is no deadline
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """
+    Raise DeadlineExceeded if the deadline is reached.
+
+    :return:
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+
+def cap_timeout(timeout: Timeout) -> Timeout:
+    """
+    Cap a requests timeout, single value or (connect, read), to the time left before the deadline.
+
+    Raise DeadlineExceeded if the deadline is reached.
+
+    :param timeout:
+    :return:
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded()
+    if timeout is None:
+        return left
+    if isinstance(timeout, tuple):
+        return tuple(min(t, left) if t is not None else left for t in timeout)
+    return min(timeout, left)
+
+
+def run_in_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a function so that it runs with a copy of the current context, deadline included, in any thread.
+
+    The copy is made once : the wrapper must not run in several threads at the same time.
+
+    :param fn:
+    :return:
+    """
+    context = contextvars.copy_context()
+
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return context.run(fn, *args, **kwargs)
+
+    return wrapper
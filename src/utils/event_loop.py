@@ -0,0 +1,92 @@
+"""
+Run coroutines from blocking code on an event loop kept by the process.
+
+The loop outlives the calls, as the transport does for the blocking clients : a warm Lambda container keeps the
+connections of the asyncio transport open between invocations. It runs in a dedicated thread, so that threads
+may run coroutines concurrently, e.g. the pollers of the worker.
+The blocking calls of the coroutines (asyncio.to_thread) run in the executor of the loop, sized with
+reserve_threads : the default one has min(32, cpu + 4) threads.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_threads = 0
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the event loop of the process, running in a daemon thread started on first use.
+
+    :return:
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            if _executor is not None:
+                _loop.set_default_executor(_executor)
+            threading.Thread(
+                target=_loop.run_forever, name="event-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def reserve_threads(max_threads: int) -> None:
+    """
+    Size the executor of the blocking calls of the coroutines to at least a number of threads.
+
+    A smaller executor is replaced, the calls it already runs complete.
+
+    :param max_threads:
+    :return:
+    """
+    global _executor, _executor_threads
+    loop = get_event_loop()
+    with _loop_lock:
+        if max_threads <= _executor_threads:
+            return
+        previous = _executor
+        _executor_threads = max_threads
+        _executor = concurrent.futures.ThreadPoolExecutor(
+            max_threads, thread_name_prefix="event-loop-executor"
+        )
+        loop.set_default_executor(_executor)
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def run_coroutine(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine on the event loop of the process and wait for its result.
+
+    The coroutine runs with the context of the caller, deadline included. Calls may overlap.
+
+    :param coroutine:
+    :return:
+    """
+    loop = get_event_loop()
+    context = contextvars.copy_context()
+    future: concurrent.futures.Future = concurrent.futures.Future()
+
+    def done(task: asyncio.Task) -> None:
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def start() -> None:
+        # run_coroutine_threadsafe would run the coroutine with the context of the loop thread
+        loop.create_task(coroutine, context=context).add_done_callback(done)
+
+    loop.call_soon_threadsafe(start)
+    return future.result()
@@ -45,3 +45,71 @@ class NoSharedPage(InternalException):
         :param bot_id:
         """
         super().__init__(f"Integration of bot_id : {bot_id} is shared with any page.")
+
+
+class PrecedingTaskFailed(InternalException):
+    """Raised for a task not executed because a previous task of the same key failed."""
+
+    def __init__(self, key: Any):
+        """
+        Init instance.
+
+        :param key:
+        """
+        super().__init__(f"a preceding task of key {key} failed.")
+
+
+class RateLimitExceeded(InternalException):
+    """Raised when the rate limit of an API is exhausted."""
+
+    def __init__(self, service: str, retry_after: float):
+        """
+        Init instance.
+
+        :param service: name of the API
+        :param retry_after: number of seconds before the limit is reset
+        """
+        self.retry_after = retry_after
+        super().__init__(
+            f"rate limit of {service} exceeded, retry in {retry_after:.0f} seconds."
+        )
+
+
+class WorkDeferred(InternalException):
+    """Raised when low priority work is postponed to preserve the rate limit of an API."""
+
+    def __init__(self, service: str, retry_after: float):
+        """
+        Init instance.
+
+        :param service: name of the API
+        :param retry_after: number of seconds before the work may be retried
+        """
+        self.retry_after = retry_after
+        super().__init__(
+            f"low priority work on {service} deferred for {retry_after:.0f} seconds."
+        )
+
+
+class DeadlineExceeded(InternalException):
+    """Raised when the time budget of the invocation is spent."""
+
+    def __init__(self):
+        """Init instance."""
+        super().__init__("deadline of the invocation exceeded.")
+
+
+class PartialFailure(InternalException):
+    """Raised when an event was processed for some of its targets only."""
+
+    def __init__(self, failed_targets: list[str], message: str):
+        """
+        Init instance.
+
+        :param failed_targets: keys of the targets which failed
+        :param message: message of the processing of all targets
+        """
+        self.failed_targets = failed_targets
+        super().__init__(
+            f"{len(failed_targets)} target(s) failed : {', '.join(failed_targets)}\n{message}"
+        )
@@ -0,0 +1,89 @@
+"""Execute tasks concurrently while preserving the order of the tasks sharing a key."""
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Hashable, Optional, TypedDict
+
+from src.utils.deadline import check_deadline, run_in_context
+from src.utils.exceptions import DeadlineExceeded, PrecedingTaskFailed
+
+
+class TaskOutcome(TypedDict):
+    """Outcome of a task, exception is None if the task succeeded."""
+
+    result: Any
+    exception: Optional[BaseException]
+
+
+class KeyedExecutor:
+    """
+    Bounded thread pool keyed on an arbitrary value.
+
+    Tasks of different keys run concurrently, tasks of a same key run sequentially in submission order.
+    """
+
+    def __init__(self, max_workers: int = 10, stop_key_on_failure: bool = True):
+        """
+        Init instance.
+
+        :param max_workers: maximum number of threads
+        :param stop_key_on_failure: if True, the tasks following a failed task of the same key are not executed
+        """
+        if max_workers <= 0:
+            raise ValueError(
+                f"max_workers must be a positive integer, got {max_workers}"
+            )
+        self.max_workers = max_workers
+        self.stop_key_on_failure = stop_key_on_failure
+
+    def run(
+        self,
+        tasks: list[tuple[Hashable, Callable[[], Any]]],
+        timeout: Optional[float] = None,
+    ) -> list[TaskOutcome]:
+        """
+        Execute the tasks and wait for their completion.
+
+        Tasks run with the context of the caller, deadline included : a task is not started once the deadline
+        is reached.
+
+        :param tasks: list of (key, callable without argument)
+        :param timeout: maximum number of seconds to wait, unfinished tasks fail with DeadlineExceeded
+        :return: outcomes in the same order as the tasks
+        """
+        outcomes: list[Optional[TaskOutcome]] = [None] * len(tasks)
+        lanes: dict[Hashable, list[int]] = {}
+        for index, (key, _) in enumerate(tasks):
+            lanes.setdefault(key, []).append(index)
+
+        def run_lane(key: Hashable, indexes: list[int]) -> None:
+            failed = False
+            for index in indexes:
+                if failed and self.stop_key_on_failure:
+                    outcomes[index] = {
+                        "result": None,
+                        "exception": PrecedingTaskFailed(key),
+                    }
+                    continue
+                try:
+                    check_deadline()
+                    outcomes[index] = {"result": tasks[index][1](), "exception": None}
+                except Exception as e:
+                    failed = True
+                    outcomes[index] = {"result": None, "exception": e}
+
+        workers = min(self.max_workers, len(lanes)) or 1
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [
+                pool.submit(run_in_context(run_lane), k, idx)
+                for k, idx in lanes.items()
+            ]
+            wait(futures, timeout=timeout)
+        finally:
+            # do not wait for the tasks still running after the timeout
+            pool.shutdown(wait=False, cancel_futures=True)
+        return [
+            outcome
+            if outcome is not None
+            else {"result": None, "exception": DeadlineExceeded()}
+            for outcome in list(outcomes)
+        ]
@@ -0,0 +1,111 @@
+"""Define counters and timings shared by the process."""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator, TypedDict
+
+
+class Timing(TypedDict):
+    """Aggregated durations of an operation."""
+
+    count: int
+    total: float
+    max: float
+
+
+class Gauge(TypedDict):
+    """Last and maximum values of a level."""
+
+    last: float
+    max: float
+
+
+class Metrics:
+    """Thread-safe counters and timings, logged by the entrypoints."""
+
+    def __init__(self):
+        """Init instance."""
+        self._counters: defaultdict[str, int] = defaultdict(int)
+        self._timings: dict[str, Timing] = {}
+        self._gauges: dict[str, Gauge] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Increment a counter.
+
+        :param name:
+        :param value:
+        :return:
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Record the duration of an operation.
+
+        :param name:
+        :param seconds:
+        :return:
+        """
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total": 0, "max": 0})
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Record the duration of the enclosed block, even if it raises.
+
+        :param name:
+        :return:
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def gauge(self, name: str, value: float) -> None:
+        """
+        Record the current value of a level, e.g. a queue depth.
+
+        :param name:
+        :param value:
+        :return:
+        """
+        with self._lock:
+            gauge = self._gauges.setdefault(name, {"last": value, "max": value})
+            gauge["last"] = value
+            gauge["max"] = max(gauge["max"], value)
+
+    def snapshot(self) -> dict:
+        """
+        Return a copy of all metrics.
+
+        :return:
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timings": {k: dict(v) for k, v in self._timings.items()},
+                "gauges": {k: dict(v) for k, v in self._gauges.items()},
+            }
+
+    def reset(self) -> None:
+        """
+        Reset all metrics.
+
+        :return:
+        """
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+            self._gauges.clear()
+
+
+METRICS = Metrics()
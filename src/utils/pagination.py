@@ -0,0 +1,63 @@
+"""Utility functions to iterate over paginated API endpoints."""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+from src.utils.deadline import run_in_context
+
+FetchPage = Callable[[Optional[str]], tuple[list[Any], Optional[str]]]
+AsyncFetchPage = Callable[[Optional[str]], Awaitable[tuple[list[Any], Optional[str]]]]
+
+
+def paginate(fetch_page: FetchPage, prefetch: bool = False) -> Iterator[Any]:
+    """
+    Yield the items of a paginated endpoint, fetching the pages lazily.
+
+    Pages are only fetched when the caller consumes the items of the previous one, so that a caller
+    that stops iterating does not fetch the remaining pages.
+
+    :param fetch_page: function receiving the cursor of a page (None for the first one) and returning
+     the items of the page with the cursor of the next page (None for the last one)
+    :param prefetch: if True, the next page is fetched in background while the items of the current one are consumed
+    :return:
+    """
+    if not prefetch:
+        cursor = None
+        while True:
+            items, cursor = fetch_page(cursor)
+            yield from items
+            if cursor is None:
+                return
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    future: Optional[Future] = executor.submit(run_in_context(fetch_page), None)
+    try:
+        while future is not None:
+            items, cursor = future.result()
+            future = (
+                executor.submit(run_in_context(fetch_page), cursor)
+                if cursor is not None
+                else None
+            )
+            yield from items
+    finally:
+        # reached when the caller stops iterating : drop the page being prefetched
+        if future is not None:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+async def apaginate(fetch_page: AsyncFetchPage) -> AsyncIterator[Any]:
+    """
+    Yield the items of a paginated endpoint, fetching the pages lazily with a coroutine.
+
+    :param fetch_page: coroutine function receiving the cursor of a page (None for the first one) and returning
+     the items of the page with the cursor of the next page (None for the last one)
+    :return:
+    """
+    cursor = None
+    while True:
+        items, cursor = await fetch_page(cursor)
+        for item in items:
+            yield item
+        if cursor is None:
+            return
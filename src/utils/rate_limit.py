@@ -0,0 +1,194 @@
+"""Define token buckets to space out the requests sent to rate limited APIs."""
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from src.utils.deadline import remaining
+from src.utils.exceptions import DeadlineExceeded
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket queuing callers instead of failing.
+
+    Each caller takes a token, possibly making the balance negative, and sleeps until its token is refilled :
+    callers are served at the rate of the bucket in their order of arrival.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Init instance.
+
+        :param rate: number of tokens refilled per second
+        :param capacity: maximum number of tokens, i.e. the allowed burst
+        :param clock: function returning the current time in seconds
+        :param sleep: function sleeping a number of seconds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """
+        Add the tokens refilled since the last update, lock must be held.
+
+        :param now:
+        :return:
+        """
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Return the number of callers waiting for a token.
+
+        :return:
+        """
+        return self._waiting
+
+    def _take(self) -> float:
+        """
+        Take a token, counting the caller as waiting if it is not available yet.
+
+        Raise DeadlineExceeded without taking the token if it is not available before the deadline.
+
+        :return: number of seconds to wait for the token
+        """
+        left = remaining()
+        with self._lock:
+            self._refill(self.clock())
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+            if left is not None and wait > left:
+                self._tokens += 1
+                raise DeadlineExceeded()
+            if wait > 0:
+                self._waiting += 1
+        return wait
+
+    def _waited(self) -> None:
+        """
+        Stop counting a caller as waiting.
+
+        :return:
+        """
+        with self._lock:
+            self._waiting -= 1
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting until it is available.
+
+        :return: number of seconds waited
+        """
+        wait = self._take()
+        if wait > 0:
+            try:
+                self.sleep(wait)
+            finally:
+                self._waited()
+        return wait
+
+    async def acquire_async(self) -> float:
+        """
+        Take a token, waiting until it is available without blocking the event loop.
+
+        :return: number of seconds waited
+        """
+        wait = self._take()
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waited()
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold every caller for a number of seconds, e.g. when the API answered with Retry-After.
+
+        :param seconds:
+        :return:
+        """
+        with self._lock:
+            self._refill(self.clock())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class KeyedRateLimiter:
+    """Token buckets with the same rate, one per key (e.g. per integration)."""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Init instance.
+
+        :param rate: number of requests per second allowed for each key
+        :param capacity: allowed burst for each key
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, key: str) -> TokenBucket:
+        """
+        Return the bucket of a key, created on first use.
+
+        :param key:
+        :return:
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self._buckets[key] = bucket
+            return bucket
+
+    def queue_depth(self) -> int:
+        """
+        Return the number of callers waiting for a token across all keys.
+
+        :return:
+        """
+        with self._lock:
+            return sum(bucket.queue_depth for bucket in self._buckets.values())
+
+
+_notion_rate_limiter: Optional[KeyedRateLimiter] = None
+_notion_rate_limiter_lock = threading.Lock()
+
+
+def get_notion_rate_limiter() -> KeyedRateLimiter:
+    """
+    Return the rate limiter of Notion requests shared by the process.
+
+    Notion allows an average of 3 requests per second per integration, NOTION_RATE_LIMIT and
+    NOTION_RATE_BURST are optional.
+
+    :return:
+    """
+    global _notion_rate_limiter
+    if _notion_rate_limiter is None:
+        with _notion_rate_limiter_lock:
+            if _notion_rate_limiter is None:
+                _notion_rate_limiter = KeyedRateLimiter(
+                    float(os.getenv("NOTION_RATE_LIMIT", 3)),
+                    float(os.getenv("NOTION_RATE_BURST", 3)),
+                )
+    return _notion_rate_limiter
@@ -4,7 +4,7 @@ from urllib.parse import quote_plus
 
 def encode_url_params(params: dict) -> None:
     """
-    Encode string parameters.
+    Encode string parameters and the strings of list parameters.
 
     Changes are made in place.
     :param params:
@@ -14,6 +14,10 @@ def encode_url_params(params: dict) -> None:
         for key, val in params.items():
             if isinstance(val, str):
                 params[key] = quote_plus(val, safe="'")
+            elif isinstance(val, list):
+                params[key] = [
+                    quote_plus(v, safe="'") if isinstance(v, str) else v for v in val
+                ]
 
 
 def params_dict_to_str(params: dict) -> str:
@@ -21,7 +25,20 @@ def params_dict_to_str(params: dict) -> str:
     Return a string of url parameters based on a dict.
 
     It is used to prevent the library requests to url encode already encoded parameters.
+    List parameters are expanded as key[]=value, or key[index][name]=value for lists of dict.
     :param params:
     :return:
     """
-    return "&".join(f"{k}={v}" for k, v in params.items())
+    if not params:
+        return ""
+    pairs = []
+    for k, v in params.items():
+        if isinstance(v, list):
+            for i, item in enumerate(v):
+                if isinstance(item, dict):
+                    pairs.extend(f"{k}[{i}][{n}]={m}" for n, m in item.items())
+                else:
+                    pairs.append(f"{k}[]={item}")
+        else:
+            pairs.append(f"{k}={v}")
+    return "&".join(pairs)
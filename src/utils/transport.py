@@ -0,0 +1,185 @@
+"""
+Define the HTTP transport shared by the API clients.
+
+The transport keeps a pool of keep-alive connections per host. It is meant to live as long as the
+process (the warm Lambda container) so that consecutive calls to a same API skip the TCP and TLS handshakes.
+"""
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional, TypedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.utils.deadline import cap_timeout
+
+
+class ConnectionStats(TypedDict):
+    """Connection statistics of a host."""
+
+    requests: int
+    connections: int
+    reused: int
+
+
+class Transport:
+    """HTTP transport with a keep-alive connection pool per host, retries and default timeouts."""
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        max_retries: int = 2,
+        backoff_factor: float = 0.3,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 20,
+    ):
+        """
+        Init instance.
+
+        :param pool_connections: number of hosts for which a pool is kept
+        :param pool_maxsize: maximum number of connections kept per host
+        :param max_retries: number of retries on connection errors and 502, 503, 504 of idempotent requests
+        :param backoff_factor: backoff factor between retries
+        :param connect_timeout: default connect timeout in seconds
+        :param read_timeout: default read timeout in seconds
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        retries = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries,
+        )
+        self.session = requests.Session()
+        # the session is shared by all users, cookies must not leak between them
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    @classmethod
+    def from_env(cls) -> "Transport":
+        """
+        Build a transport configured with environment variables.
+
+        HTTP_POOL_MAXSIZE, HTTP_MAX_RETRIES, HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT are optional.
+
+        :return:
+        """
+        return cls(
+            pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", 10)),
+            max_retries=int(os.getenv("HTTP_MAX_RETRIES", 2)),
+            connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05)),
+            read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", 20)),
+        )
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session.
+
+        Accept the same keyword arguments as requests.request.
+        The timeout is capped to the time left before the deadline of the invocation.
+
+        :param method:
+        :param url:
+        :return:
+        """
+        kwargs["timeout"] = cap_timeout(kwargs.get("timeout", self.timeout))
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a GET request.
+
+        :param url:
+        :return:
+        """
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a POST request.
+
+        :param url:
+        :return:
+        """
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a PATCH request.
+
+        :param url:
+        :return:
+        """
+        return self.request("PATCH", url, **kwargs)
+
+    def stats(self) -> dict[str, ConnectionStats]:
+        """
+        Return the connection reuse statistics per host.
+
+        Only hosts whose pool is still alive are reported.
+
+        :return:
+        """
+        stats: dict[str, ConnectionStats] = {}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = stats.setdefault(
+                pool.host, {"requests": 0, "connections": 0, "reused": 0}
+            )
+            host["requests"] += pool.num_requests
+            host["connections"] += pool.num_connections
+            host["reused"] = host["requests"] - host["connections"]
+        return stats
+
+    def close(self) -> None:
+        """
+        Close all pooled connections.
+
+        :return:
+        """
+        self.session.close()
+
+
+_transport: Optional[Transport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """
+    Return the transport shared by the process.
+
+    It is created from the environment on first use.
+
+    :return:
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = Transport.from_env()
+    return _transport
+
+
+def set_transport(transport: Optional[Transport]) -> None:
+    """
+    Replace the transport shared by the process.
+
+    :param transport: new transport, None to recreate it from the environment on next use
+    :return:
+    """
+    global _transport
+    with _transport_lock:
+        _transport = transport
@@ -1,11 +1,18 @@
 """Define functions that interact with different entities."""
-import json
 import logging
+from typing import Optional
 
-from src.const import NOTION_DATABASE_PROPERTIES_TEMPLATE, NOTION_DATABASE_SCHEMA
+from src.const import (
+    NOTION_DATABASE_SCHEMA,
+    STRAVA_EVENT_UPDATES_IGNORED,
+    STRAVA_EVENT_UPDATES_PROPERTIES,
+)
 from src.database.interface import DatabaseInterface
 from src.notion.client import Client as NotionClient
+from src.notion.properties import ACTIVITY_PROPERTIES, build_properties
+from src.registry import get_registry
 from src.strava.client import Client as StravaClient
+from src.strava.tokens import TokenManager
 
 logger = logging.getLogger()
 
@@ -15,25 +22,23 @@ def refresh_strava_token(
     user_email: str,
     strava_client: StravaClient,
     database_client: DatabaseInterface,
+    token_manager: Optional[TokenManager] = None,
 ) -> None:
     """
     Refresh the strava tokens of an athlete.
 
-    Generate new tokens with the Strava API and stores the new tokens in the database
+    Generate new tokens with the Strava API shortly before expiry and stores the new tokens in the database.
+    A single refresh per athlete account runs at a time, see TokenManager.
 
     :param athlete_id:
     :param user_email:
     :param strava_client:
     :param database_client:
+    :param token_manager: the one of the shared registry by default
     :return:
     """
-    token = strava_client.refresh_access_token()
-    if token is not None:
-        logger.debug(f"refreshing token of athlete {athlete_id}")
-        token["expires_at"] = str(token["expires_at"])
-        database_client.update_strava_credentials(athlete_id, user_email, token)
-    else:
-        logger.debug(f"token of athlete {athlete_id} still valid")
+    token_manager = token_manager or get_registry().token_manager
+    token_manager.refresh(database_client, athlete_id, user_email, strava_client)
 
 
 def strava_activity_to_notion_properties(activity: dict) -> dict:
@@ -43,26 +48,25 @@ def strava_activity_to_notion_properties(activity: dict) -> dict:
     :param activity:
     :return:
     """
-    mapping = {
-        "name": activity["name"],
-        "description": activity["description"],
-        "type": activity["sport_type"],
-        "calories": activity["calories"],
-        "start": activity["start_date"],
-        "activity_id": activity["id"],
-        "avg_speed": activity["average_speed"],
-        "max_speed": activity["max_speed"],
-        "total_elevation_gain": activity["total_elevation_gain"],
-        "external_id": activity["external_id"],
-        "upload_id": activity["upload_id"],
-        "time": activity["moving_time"],
-        "distance": activity["distance"],
-        "username": activity["username"],
-    }
-
-    return json.loads(
-        NOTION_DATABASE_PROPERTIES_TEMPLATE.substitute(**mapping), strict=False
-    )
+    return build_properties(activity)
+
+
+def strava_updates_to_notion_properties(updates: dict[str, str]) -> Optional[dict]:
+    """
+    Interface between the updates of a Strava event and Notion properties data.
+
+    :param updates: updates of a Strava update event
+    :return: None if an update has no matching property, the activity has to be fetched
+    """
+    properties = {}
+    for key, value in updates.items():
+        if key in STRAVA_EVENT_UPDATES_IGNORED:
+            continue
+        name = STRAVA_EVENT_UPDATES_PROPERTIES.get(key)
+        if name is None:
+            return None
+        properties[name] = ACTIVITY_PROPERTIES.build_property(name, value)
+    return properties
 
 
 def create_notion_database(notion_client: NotionClient, parent_id: str) -> str:
@@ -0,0 +1,29 @@
+"""Unit test module for the client.py module of the airtable package."""
+import json
+from unittest.mock import MagicMock
+
+from src.airtable.client import Client
+
+
+def _response(body: dict) -> MagicMock:
+    response = MagicMock(status_code=200)
+    response.content = json.dumps(body).encode()
+    return response
+
+
+def test_upsert_records_batches():
+    """Test that upserts are sent by batches of 10 records merged on fields."""
+    transport = MagicMock()
+    transport.patch.side_effect = lambda url, json, headers: _response(
+        {"records": [{"id": "rec", "fields": r["fields"]} for r in json["records"]]}
+    )
+    client = Client("pat", transport=transport)
+
+    records = client.upsert_records(
+        "base", "table", [{"key": i} for i in range(23)], ["key"]
+    )
+
+    assert len(records) == 23
+    bodies = [call.kwargs["json"] for call in transport.patch.call_args_list]
+    assert [len(body["records"]) for body in bodies] == [10, 10, 3]
+    assert all(b["performUpsert"] == {"fieldsToMergeOn": ["key"]} for b in bodies)
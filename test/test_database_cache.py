@@ -0,0 +1,103 @@
+"""Unit test module for the cache.py module of the database package."""
+from unittest.mock import MagicMock
+
+from src.database.cache import CachedDatabase
+from src.database.interface import DatabaseInterface
+
+
+def _backend() -> MagicMock:
+    backend = MagicMock(spec=DatabaseInterface)
+    backend.get_strava_credentials.side_effect = lambda a, u: {"access_token": a + u}
+    backend.get_athlete_context.side_effect = lambda a: {
+        "athlete_id": a,
+        "accounts": [{"databases": [{"bot_id": f"bot{a}"}]}],
+    }
+    return backend
+
+
+def test_read_through():
+    """Test that repeated reads are served from the cache until they expire."""
+    now = [0]
+    backend = _backend()
+    database = CachedDatabase(backend, clock=lambda: now[0])
+
+    assert database.get_strava_credentials("1", "a") == {"access_token": "1a"}
+    assert database.get_strava_credentials("1", "a") == {"access_token": "1a"}
+    assert backend.get_strava_credentials.call_count == 1
+    assert database.stats()["get_strava_credentials"] == {"hits": 1, "misses": 1}
+
+    now[0] = 301
+    database.get_strava_credentials("1", "a")
+
+    assert backend.get_strava_credentials.call_count == 2
+
+
+def test_write_invalidation():
+    """Test that writes invalidate the affected entries."""
+    backend = _backend()
+    database = CachedDatabase(backend)
+    database.get_strava_credentials("1", "a")
+    database.get_athlete_context("1")
+    database.get_athlete_context("2")
+
+    database.update_strava_credentials("1", "a", {})
+    database.get_strava_credentials("1", "a")
+    database.get_athlete_context("1")
+
+    assert backend.get_strava_credentials.call_count == 2
+    assert backend.get_athlete_context.call_count == 3
+
+    database.add_or_update_notion({"bot_id": "bot2"}, "b", "3")
+    database.get_athlete_context("1")
+    database.get_athlete_context("2")
+
+    assert backend.get_athlete_context.call_count == 4
+
+
+def test_notion_page():
+    """Test that a missing page is not cached and that an indexed page expires within seconds."""
+    now = [0]
+    backend = _backend()
+    backend.get_notion_page.side_effect = [None, {"page_id": "p"}, {"page_id": "p"}]
+    database = CachedDatabase(backend, clock=lambda: now[0])
+
+    assert database.get_notion_page("db", "1") is None
+    assert database.get_notion_page("db", "1") == {"page_id": "p"}
+    assert database.get_notion_page("db", "1") == {"page_id": "p"}
+    assert backend.get_notion_page.call_count == 2
+
+    now[0] = 6
+    database.get_notion_page("db", "1")
+
+    assert backend.get_notion_page.call_count == 3
+
+
+def test_lru_bound():
+    """Test that the least recently used entry is evicted."""
+    backend = _backend()
+    database = CachedDatabase(backend, max_entries=2)
+    database.get_strava_credentials("1", "a")
+    database.get_strava_credentials("2", "a")
+    database.get_strava_credentials("1", "a")
+    database.get_strava_credentials("3", "a")
+    database.get_strava_credentials("1", "a")
+    database.get_strava_credentials("2", "a")
+
+    assert backend.get_strava_credentials.call_count == 4
+
+
+def test_batched_contexts():
+    """Test that a batched read only reads the athletes missing from the cache."""
+    backend = _backend()
+    backend.get_athlete_contexts.side_effect = lambda ids: {
+        a: backend.get_athlete_context(a) for a in ids
+    }
+    database = CachedDatabase(backend)
+    database.get_athlete_context("1")
+
+    contexts = database.get_athlete_contexts(["1", "2", "3"])
+
+    assert list(contexts) == ["1", "2", "3"]
+    backend.get_athlete_contexts.assert_called_once_with(["2", "3"])
+    database.get_athlete_context("3")
+    assert backend.get_athlete_context.call_count == 3
@@ -0,0 +1,132 @@
+"""Unit test module for the sqlite.py module of the database package."""
+import pytest
+
+from src.database.sqlite import SqliteDatabase
+from src.utils.exceptions import InternalException
+
+STRAVA_CREDENTIALS = {
+    "access_token": "access",
+    "refresh_token": "refresh",
+    "expires_at": "1700000000",
+    "athlete": "111",
+}
+
+NOTION_CREDENTIALS = {
+    "access_token": "secret",
+    "bot_id": "bot",
+    "duplicated_template_id": None,
+    "owner": {"type": "user"},
+    "workspace_icon": None,
+    "workspace_id": "workspace",
+    "workspace_name": "Workspace",
+}
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = SqliteDatabase(str(tmp_path / "test.db"))
+    database.add_or_update_strava(
+        STRAVA_CREDENTIALS,
+        "a@b.c",
+        {"username": "", "firstname": "John", "lastname": "Doe"},
+    )
+    database.add_or_update_notion(NOTION_CREDENTIALS, "a@b.c", "111")
+    database.update_database_id("a@b.c", "111", "bot", "db")
+    return database
+
+
+def test_round_trip(database):
+    """Test reads after the onboarding writes."""
+    assert database.get_athlete_accounts("111") == ["a@b.c"]
+    assert database.get_athlete_username("111", "a@b.c") == "John Doe"
+    assert database.get_notion_access_token("bot") == "secret"
+    assert database.list_databases("111", "a@b.c") == [
+        {"bot_id": "bot", "database_id": "db"}
+    ]
+    assert database.get_athlete_context("111") == {
+        "athlete_id": "111",
+        "accounts": [
+            {
+                "user_email": "a@b.c",
+                "strava_token": {
+                    "access_token": "access",
+                    "refresh_token": "refresh",
+                    "expires_at": "1700000000",
+                },
+                "username": "John Doe",
+                "databases": [
+                    {"bot_id": "bot", "database_id": "db", "access_token": "secret"}
+                ],
+            }
+        ],
+    }
+    assert database.get_athlete_contexts(["111", "222", "111"]) == {
+        "111": database.get_athlete_context("111"),
+        "222": {"athlete_id": "222", "accounts": []},
+    }
+
+
+def test_upsert(database):
+    """Test that onboarding twice updates the existing rows."""
+    database.add_or_update_strava(
+        {**STRAVA_CREDENTIALS, "access_token": "access2"},
+        "a@b.c",
+        {"username": "", "firstname": "John", "lastname": "Doe"},
+    )
+    database.add_or_update_notion(
+        {**NOTION_CREDENTIALS, "access_token": "secret2"}, "a@b.c", "111"
+    )
+
+    assert database.get_strava_credentials("111", "a@b.c")["access_token"] == "access2"
+    assert database.get_notion_access_token("bot") == "secret2"
+    assert database.get_notion_database_id("a@b.c", "111", "bot") == "db"
+
+
+def test_missing_records(database):
+    """Test that missing records raise as with airtable."""
+    with pytest.raises(InternalException):
+        database.get_strava_credentials("222", "a@b.c")
+    with pytest.raises(InternalException):
+        database.update_strava_credentials("222", "a@b.c", STRAVA_CREDENTIALS)
+
+
+def test_indexes(database):
+    """Test that lookups use the indexes and that the database is in WAL mode."""
+    connection = database._connection()
+    plan = connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM strava WHERE athlete_id = ? AND user_email = ?",
+        ["111", "a@b.c"],
+    ).fetchall()
+
+    assert "idx_strava_athlete_user" in str([tuple(row) for row in plan])
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_notion_page_hashes(tmp_path):
+    """Test the index of pages, including a file created without the property_hashes column."""
+    path = str(tmp_path / "old.db")
+    SqliteDatabase(path)._execute(
+        "ALTER TABLE notion_pages DROP COLUMN property_hashes"
+    )
+    database = SqliteDatabase(path)
+    database.set_notion_page_id("db", "42", "page")
+
+    assert database.get_notion_page("db", "42") == {
+        "page_id": "page",
+        "property_hashes": None,
+    }
+
+    database.set_notion_page("db", "42", "page", {"Name": "abc"})
+
+    assert database.get_notion_page("db", "42")["property_hashes"] == {"Name": "abc"}
+    assert database.get_notion_page_id("db", "42") == "page"
+    assert database.get_notion_page("db", "43") is None
+
+
+def test_latest_event_time(database):
+    """Test that the latest event time of an activity only moves forward."""
+    assert database.get_latest_event_time("42") is None
+    assert database.set_latest_event_time("42", 1700000010) == 1700000010
+    assert database.set_latest_event_time("42", 1700000005) == 1700000010
+    assert database.set_latest_event_time("42", 1700000020) == 1700000020
+    assert database.get_latest_event_time("42") == 1700000020
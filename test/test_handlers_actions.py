@@ -0,0 +1,155 @@
+"""Unit test module for the actions package of the handlers package."""
+import json
+import re
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.const import STRAVA_ACTIVITY_FIELDS
+from src.database.sqlite import SqliteDatabase
+from src.handlers.actions import CreateActivity, Pipeline, UpdateActivity
+from src.handlers.actions.async_actions import AsyncCreateActivity
+from src.handlers.actions.async_pipeline import AsyncPipeline
+from src.registry import ClientRegistry
+from src.utils.async_transport import AsyncTransport
+
+ACTIVITY = {key: None for key in STRAVA_ACTIVITY_FIELDS}
+
+
+class FakeRegistry(ClientRegistry):
+    """Registry returning mocked API clients."""
+
+    def __init__(self, database):
+        super().__init__(lambda: database)
+        self.strava = MagicMock(expires_at=10**10)
+        self.strava.expires_within.return_value = False
+        self.strava.get_activity.side_effect = self._get_activity
+        self.notion = MagicMock()
+        self.notion.create_page.side_effect = lambda database_id, properties: {
+            "id": f"page-{len(self.notion.create_page.call_args_list)}"
+        }
+
+    @staticmethod
+    def _get_activity(activity_id):
+        if activity_id == "404":
+            raise RuntimeError("not found")
+        return {**ACTIVITY, "id": int(activity_id), "name": f"activity {activity_id}"}
+
+    def strava_client(self, athlete_id, user_email, token):
+        return self.strava
+
+    def notion_client(self, bot_id, access_token):
+        return self.notion
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = SqliteDatabase(str(tmp_path / "test.db"))
+    for athlete_id, user_email in [("111", "a@b.c"), ("222", "d@e.f")]:
+        database.add_or_update_strava(
+            {
+                "access_token": "access",
+                "refresh_token": "refresh",
+                "expires_at": "9999999999",
+                "athlete": athlete_id,
+            },
+            user_email,
+            {"username": user_email, "firstname": "", "lastname": ""},
+        )
+        database.add_or_update_notion(
+            {
+                "access_token": "secret",
+                "bot_id": f"bot{athlete_id}",
+                "duplicated_template_id": None,
+                "owner": {"type": "user"},
+                "workspace_icon": None,
+                "workspace_id": "workspace",
+                "workspace_name": "Workspace",
+            },
+            user_email,
+            athlete_id,
+        )
+        database.update_database_id(
+            user_email, athlete_id, f"bot{athlete_id}", f"db{athlete_id}"
+        )
+    return database
+
+
+def test_pipeline(database):
+    """Test that the actions of a batch are run together and fail independently."""
+    registry = FakeRegistry(database)
+    actions = [
+        CreateActivity("111", "1", database, registry),
+        CreateActivity("111", "404", database, registry),
+        CreateActivity("222", "2", database, registry),
+        CreateActivity("333", "3", database, registry),
+    ]
+
+    outcomes = Pipeline(database, registry).run(actions)
+
+    assert outcomes[0]["result"]["message"].startswith("page page-")
+    assert "could not be fetched" in str(outcomes[1]["exception"])
+    assert outcomes[2]["exception"] is None
+    assert outcomes[3]["result"]["message"] == "no account for athlete 333"
+    assert registry.notion.create_page.call_count == 2
+    assert database.get_notion_page_id("db111", "1") is not None
+
+    # a duplicate create is skipped before fetching the activity
+    registry.strava.get_activity.reset_mock()
+    result = CreateActivity("111", "1", database, registry).run()
+
+    assert "already exists" in result["message"]
+    registry.strava.get_activity.assert_not_called()
+
+
+def test_update_patch(database):
+    """Test that an update carrying a new title patches the indexed page without fetching the activity."""
+    registry = FakeRegistry(database)
+    CreateActivity("111", "1", database, registry).run()
+    registry.strava.get_activity.reset_mock()
+
+    result = UpdateActivity(
+        "111", "1", database, registry, updates={"title": "renamed"}
+    ).run()
+
+    assert "patched" in result["message"]
+    registry.strava.get_activity.assert_not_called()
+    (page_id, properties), _ = registry.notion.update_page_properties.call_args
+    assert list(properties) == ["Name"]
+
+
+def test_async_pipeline(database, monkeypatch):
+    """Test that the asyncio engine runs the actions of a batch as the threads engine does."""
+    httpx = pytest.importorskip("httpx")
+    monkeypatch.setenv("STRAVA_CLIENT_ID", "id")
+    monkeypatch.setenv("STRAVA_CLIENT_SECRET", "secret")
+    created = []
+
+    def handler(request):
+        match = re.search(r"/activities/(\d+)$", request.url.path)
+        if match is not None:
+            if match.group(1) == "404":
+                return httpx.Response(404, text="not found")
+            return httpx.Response(200, json={**ACTIVITY, "id": int(match.group(1))})
+        created.append(json.loads(request.content)["parent"]["database_id"])
+        return httpx.Response(200, json={"id": f"page-{len(created)}"})
+
+    transport = AsyncTransport()
+    transport.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    registry = FakeRegistry(database)
+    actions = [
+        AsyncCreateActivity("111", "1", database, registry),
+        AsyncCreateActivity("111", "404", database, registry),
+        AsyncCreateActivity("222", "2", database, registry),
+        AsyncCreateActivity("333", "3", database, registry),
+    ]
+
+    outcomes = AsyncPipeline(database, registry, transport=transport).run(actions)
+
+    assert outcomes[0]["result"]["message"].startswith("page page-")
+    assert "could not be fetched" in str(outcomes[1]["exception"])
+    assert outcomes[2]["exception"] is None
+    assert outcomes[3]["result"]["message"] == "no account for athlete 333"
+    assert sorted(created) == ["db111", "db222"]
+    assert database.get_notion_page_id("db111", "1") is not None
+    registry.notion.create_page.assert_not_called()
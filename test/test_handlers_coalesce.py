@@ -0,0 +1,50 @@
+"""Unit test module for the coalesce.py module of the handlers package."""
+import json
+
+from src.handlers.coalesce import coalesce, fold
+
+
+def _record(message_id, aspect_type, object_id, event_time, updates=None):
+    event = {
+        "aspect_type": aspect_type,
+        "event_time": event_time,
+        "object_id": object_id,
+        "object_type": "activity",
+        "owner_id": 111,
+        "subscription_id": 1,
+        "updates": updates or {},
+    }
+    return {"messageId": message_id, "body": json.dumps(event)}
+
+
+def _ids(groups):
+    return [[record["messageId"] for record in group] for group in groups]
+
+
+def test_coalesce():
+    """Test that create and updates of an activity are grouped until another aspect type."""
+    records = [
+        _record("1", "create", 42, 1),
+        _record("2", "create", 43, 1),
+        _record("3", "update", 42, 2, {"title": "a"}),
+        _record("4", "delete", 43, 3),
+        _record("5", "update", 43, 4),
+        {"messageId": "6", "body": "not json"},
+        _record("7", "update", 42, 5, {"type": "Ride"}),
+    ]
+
+    assert _ids(coalesce(records)) == [["1", "3", "7"], ["2"], ["4"], ["5"], ["6"]]
+
+
+def test_fold():
+    """Test that a create absorbs updates and that updates are merged."""
+    create = json.loads(_record("1", "create", 42, 1)["body"])
+    rename = json.loads(_record("2", "update", 42, 2, {"title": "a"})["body"])
+    retype = json.loads(_record("3", "update", 42, 3, {"type": "Ride"})["body"])
+    rename_again = json.loads(_record("4", "update", 42, 4, {"title": "b"})["body"])
+
+    assert fold([create, rename, retype]) == create
+    assert fold([rename, retype, rename_again]) == {
+        **rename_again,
+        "updates": {"title": "b", "type": "Ride"},
+    }
@@ -0,0 +1,60 @@
+"""Unit test module for the debounce.py module of the handlers package."""
+import json
+
+from src.database.interface import DatabaseInterface
+from src.handlers.debounce import debounce, is_superseded, should_debounce
+from src.queue.memory import MemoryQueue
+
+UPDATE = {
+    "aspect_type": "update",
+    "event_time": 1700000000,
+    "object_id": 42,
+    "object_type": "activity",
+    "owner_id": 111,
+    "subscription_id": 1,
+    "updates": {"title": "Morning Run"},
+}
+
+
+class EventTimes(DatabaseInterface):
+    """Database recording the latest event times only."""
+
+    get_athlete_accounts = get_strava_credentials = None
+    update_strava_credentials = get_notion_database_id = list_databases = None
+    get_notion_access_token = add_or_update_strava = add_or_update_notion = None
+    update_database_id = get_athlete_username = None
+
+    def __init__(self):
+        self.times = {}
+
+    def get_latest_event_time(self, activity_id):
+        return self.times.get(activity_id)
+
+    def set_latest_event_time(self, activity_id, event_time):
+        self.times[activity_id] = max(self.times.get(activity_id, 0), event_time)
+        return self.times[activity_id]
+
+
+def test_should_debounce():
+    """Test that only activity updates are debounced, when enabled."""
+    assert should_debounce(UPDATE, 60)
+    assert not should_debounce(UPDATE, 0)
+    assert not should_debounce({**UPDATE, "aspect_type": "create"}, 60)
+
+
+def test_latest_update_wins():
+    """Test that a debounced update is superseded by a later update of its activity."""
+    now = [0.0]
+    database = EventTimes()
+    queue = MemoryQueue(clock=lambda: now[0])
+    debounce(UPDATE, database, queue, 60)
+    debounce({**UPDATE, "event_time": 1700000005}, database, queue, 60)
+    assert queue.receive() == []
+
+    now[0] = 60
+    first, second = [json.loads(m["body"]) for m in queue.receive()]
+    assert first["debounced"]
+    assert is_superseded(first, database)
+    assert not is_superseded(second, database)
+    # events which were not debounced are always processed
+    assert not is_superseded(UPDATE, database)
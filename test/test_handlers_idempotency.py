@@ -0,0 +1,31 @@
+"""Unit test module for the idempotency.py module of the handlers package."""
+from src.handlers.idempotency import IdempotencyGuard
+from src.store.memory import MemoryStore
+
+EVENT = {
+    "aspect_type": "create",
+    "event_time": 1700000000,
+    "object_id": 42,
+    "object_type": "activity",
+    "owner_id": 111,
+    "subscription_id": 1,
+    "updates": {},
+}
+
+
+def test_idempotency_guard():
+    """Test that duplicate deliveries are detected, at receipt and after processing."""
+    guard = IdempotencyGuard(MemoryStore())
+
+    assert guard.claim_receipt(EVENT)
+    assert not guard.claim_receipt(dict(EVENT))
+    assert guard.claim_receipt({**EVENT, "event_time": 1700000001})
+
+    guard.release_receipt(EVENT)
+
+    assert guard.claim_receipt(EVENT)
+    assert not guard.is_processed(EVENT)
+
+    guard.mark_processed(EVENT)
+
+    assert guard.is_processed(EVENT)
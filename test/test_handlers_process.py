@@ -0,0 +1,67 @@
+"""Unit test module for the process.py module of the handlers package."""
+import json
+from test.test_handlers_actions import FakeRegistry, database  # noqa: F401
+
+import src.registry
+from src.handlers.idempotency import IdempotencyGuard
+from src.handlers.ledger import TargetLedger
+from src.handlers.process import build_action, process_records
+from src.handlers.strava_subscription import get_event_key
+from src.strava.rate_limit import Priority
+from src.utils.exceptions import PrecedingTaskFailed
+
+
+def _record(message_id, owner_id, object_id):
+    event = {
+        "aspect_type": "create",
+        "event_time": 1,
+        "object_id": object_id,
+        "object_type": "activity",
+        "owner_id": owner_id,
+        "subscription_id": 1,
+        "updates": {},
+    }
+    return {"messageId": message_id, "body": json.dumps(event)}
+
+
+def test_athlete_order(database, monkeypatch):  # noqa: F811
+    """Test that the records of an athlete following a failed one fail too and are written again on retry."""
+    registry = FakeRegistry(database)
+    monkeypatch.setattr(src.registry, "_registry", registry)
+    records = [
+        _record("a", 111, 404),
+        _record("b", 111, 1),
+        _record("c", 222, 2),
+    ]
+
+    errors = process_records(records)
+
+    assert "could not be fetched" in str(errors[0])
+    assert isinstance(errors[1], PrecedingTaskFailed)
+    assert errors[2] is None
+    guard = IdempotencyGuard(registry.store())
+    assert not guard.is_processed(json.loads(records[1]["body"]))
+    assert guard.is_processed(json.loads(records[2]["body"]))
+
+    # the retry writes the targets of the following record again instead of skipping them
+    ledger = TargetLedger(
+        registry.store(), get_event_key(json.loads(records[1]["body"]))
+    )
+    assert not ledger.is_done("a@b.c:bot111:db111")
+    ledger = TargetLedger(
+        registry.store(), get_event_key(json.loads(records[2]["body"]))
+    )
+    assert ledger.is_done("d@e.f:bot222:db222")
+
+
+def test_action_priority(database):  # noqa: F811
+    """Test that debounced and retried updates are background work, new activities are not."""
+    registry = FakeRegistry(database)
+    create = {**json.loads(_record("a", 1, 1)["body"])}
+    update = {**create, "aspect_type": "update"}
+
+    assert build_action(create, database, registry, 3).priority == Priority.REALTIME
+    assert build_action(update, database, registry).priority == Priority.REALTIME
+    assert build_action(update, database, registry, 2).priority == Priority.BACKGROUND
+    debounced = {**update, "debounced": True}
+    assert build_action(debounced, database, registry).priority == Priority.BACKGROUND
@@ -0,0 +1,21 @@
+"""Unit test module for the retry.py module of the handlers package."""
+from src.handlers.retry import queue_url_from_arn, retry_delay
+from src.utils.exceptions import RateLimitExceeded
+
+
+def test_retry_delay():
+    """Test the exponential backoff, capped, and the delays asked by rate limits."""
+    record = {"attributes": {"ApproximateReceiveCount": "3"}}
+
+    assert retry_delay(record, Exception(), 30, 240) == 120
+    assert retry_delay(record, Exception(), 100, 240) == 240
+    assert retry_delay(record, RateLimitExceeded("Strava", 200), 30, 240) == 200
+    assert retry_delay({}, Exception(), 30, 240) == 30
+
+
+def test_queue_url_from_arn():
+    """Test the URL of a queue."""
+    assert (
+        queue_url_from_arn("arn:aws:sqs:eu-north-1:123456789012:dev_events.fifo")
+        == "https://sqs.eu-north-1.amazonaws.com/123456789012/dev_events.fifo"
+    )
@@ -0,0 +1,27 @@
+"""Unit test module for the strava_subscription.py module."""
+import pytest
+
+from src.handlers.strava_subscription import (
+    DEFAULT_MESSAGE_GROUP_ID,
+    get_message_group_id,
+)
+
+
+def test_get_message_group_id():
+    """Test that events of an athlete always share the same group."""
+    event = {"aspect_type": "create", "object_type": "activity", "owner_id": 1234}
+
+    assert get_message_group_id(event) == "1234"
+    assert get_message_group_id({}) == DEFAULT_MESSAGE_GROUP_ID
+
+
+def test_get_message_group_id_sharded():
+    """Test the hash sharding of message groups."""
+    groups = {get_message_group_id({"owner_id": i}, shards=4) for i in range(100)}
+
+    assert groups <= {"0", "1", "2", "3"}
+    assert get_message_group_id({"owner_id": 42}, 4) == get_message_group_id(
+        {"owner_id": "42"}, 4
+    )
+    with pytest.raises(ValueError):
+        get_message_group_id({"owner_id": 42}, 0)
@@ -0,0 +1,105 @@
+"""Unit test module for the worker.py module of the handlers package."""
+import json
+import threading
+
+import pytest
+
+import src.registry
+from src.database.sqlite import SqliteDatabase
+from src.handlers.worker import VisibilityExtender, Worker
+from src.queue.memory import MemoryQueue
+from src.registry import ClientRegistry
+
+
+def test_process_batch(monkeypatch):
+    """Test that succeeded messages are deleted and failed ones are retried after a backoff."""
+    monkeypatch.setenv("PROCESS_EVENTS_RETRY_BASE_SECONDS", "30")
+    queue = MemoryQueue(visibility_timeout=60)
+    queue.send(json.dumps({"fail": False}))
+    queue.send(json.dumps({"fail": True}))
+    processed = []
+
+    def process(records, budget):
+        processed.extend(records)
+        return [
+            RuntimeError("failed") if json.loads(r["body"])["fail"] else None
+            for r in records
+        ]
+
+    worker = Worker([queue], wait_seconds=0, process=process)
+
+    assert worker.poll(queue) == 2
+    assert [r["attributes"]["ApproximateReceiveCount"] for r in processed] == ["1", "1"]
+    assert len(queue) == 1
+    # the failed message is hidden for the backoff, longer than the visibility timeout
+    visible_at = queue._visible_at[processed[1]["receiptHandle"].split(":")[0]]
+    assert visible_at - queue.clock() > 25
+
+
+def test_visibility_extended():
+    """Test that the visibility of the messages being processed is extended until they are settled."""
+    queue = MemoryQueue(visibility_timeout=60)
+    queue.send("message")
+    message = queue.receive()[0]
+    extender = VisibilityExtender(visibility_timeout=120)
+
+    extender.add(queue, [message["receipt_handle"]])
+    assert extender.extend() == 1
+    assert queue._visible_at[message["message_id"]] - queue.clock() > 100
+    extender.remove([message["receipt_handle"]])
+    assert extender.extend() == 0
+
+
+def test_graceful_stop():
+    """Test that a stopped worker completes the batches in flight before returning."""
+    queue = MemoryQueue()
+    started, release = threading.Event(), threading.Event()
+
+    def process(records, budget):
+        started.set()
+        release.wait(5)
+        return [None] * len(records)
+
+    worker = Worker([queue], concurrency=2, wait_seconds=0.1, process=process)
+    runner = threading.Thread(target=worker.run)
+    runner.start()
+    queue.send("message")
+    assert started.wait(5)
+
+    worker.stop()
+    release.set()
+    runner.join(5)
+
+    assert not runner.is_alive()
+    assert len(queue) == 0
+
+
+def test_asyncio_engine_pollers(monkeypatch, tmp_path):
+    """Test that the pollers of a worker process batches concurrently with the asyncio engine."""
+    pytest.importorskip("httpx")
+    monkeypatch.setenv("PROCESS_EVENTS_ENGINE", "asyncio")
+    database = SqliteDatabase(str(tmp_path / "test.db"))
+    monkeypatch.setattr(src.registry, "_registry", ClientRegistry(lambda: database))
+    queue = MemoryQueue()
+    for i in range(16):
+        event = {
+            "aspect_type": "create",
+            "event_time": i,
+            "object_id": i,
+            "object_type": "activity",
+            "owner_id": i,
+            "subscription_id": 1,
+            "updates": {},
+        }
+        queue.send(json.dumps(event))
+    worker = Worker([queue], batch_size=2, wait_seconds=0)
+    # as many pollers as batches, their calls to the engine overlap
+    pollers = [threading.Thread(target=worker.poll, args=(queue,)) for _ in range(8)]
+
+    for poller in pollers:
+        poller.start()
+    for poller in pollers:
+        poller.join(10)
+
+    # the athletes have no account : every event succeeds with nothing to do
+    assert len(queue) == 0
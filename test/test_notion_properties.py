@@ -0,0 +1,52 @@
+"""Unit test module for the properties.py module of the notion package."""
+import pytest
+
+from src.notion.properties import (
+    RICH_TEXT_MAX_LENGTH,
+    PropertiesBuilder,
+    build_properties,
+    build_properties_many,
+)
+
+ACTIVITY = {
+    "name": 'Morning "tempo" run',
+    "description": "a\\b\n" * 1000,
+    "sport_type": "Run",
+    "calories": None,
+    "start_date": "2024-01-01T07:00:00Z",
+    "id": 42,
+    "average_speed": 3.2,
+    "max_speed": 5.1,
+    "total_elevation_gain": 0,
+    "external_id": None,
+    "upload_id": 7,
+    "moving_time": 3600,
+    "distance": 11520.4,
+    "username": "athlete",
+}
+
+
+def test_build_properties():
+    """Test that values are kept as is, without escaping issues, and that None builds empty properties."""
+    properties = build_properties(ACTIVITY)
+
+    assert properties["Name"] == {
+        "title": [{"text": {"content": 'Morning "tempo" run'}}]
+    }
+    assert len(properties["Description"]["rich_text"][0]["text"]["content"]) == (
+        RICH_TEXT_MAX_LENGTH
+    )
+    assert properties["Calories"] == {"number": None}
+    assert properties["External ID"] == {"rich_text": []}
+    assert properties["Activity ID"] == {"rich_text": [{"text": {"content": "42"}}]}
+    assert properties["Type"] == {"select": {"name": "Run"}}
+    assert properties["Start"] == {"date": {"start": "2024-01-01T07:00:00Z"}}
+    assert build_properties_many([ACTIVITY, ACTIVITY]) == [properties, properties]
+
+
+def test_unsupported_type():
+    """Test that a column of a type without builder is rejected when compiling."""
+    with pytest.raises(ValueError):
+        PropertiesBuilder(
+            {"Time (min)": "moving_time"}, {"Time (min)": {"formula": {}}}
+        )
@@ -0,0 +1,18 @@
+"""Unit test module for the utils.py module of the notion package."""
+from src.notion.utils import changed_properties, property_hashes
+
+
+def test_changed_properties():
+    """Test that only the properties whose content changed are returned."""
+    properties = {
+        "Name": {"title": [{"text": {"content": "Morning Run"}}]},
+        "Distance": {"number": 10.0},
+    }
+    hashes = property_hashes(properties)
+
+    assert changed_properties(properties, hashes) == {}
+    assert changed_properties(properties, None) == properties
+
+    renamed = {**properties, "Name": {"title": [{"text": {"content": "Evening"}}]}}
+
+    assert changed_properties(renamed, hashes) == {"Name": renamed["Name"]}
@@ -0,0 +1,77 @@
+"""Unit test module for the sqlite.py module of the queue package."""
+from src.queue.sqlite import SqliteQueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_delay_and_visibility(tmp_path):
+    """Test that messages are received after their delay and again after their visibility timeout."""
+    clock = Clock()
+    queue = SqliteQueue(str(tmp_path / "queue.db"), visibility_timeout=30, clock=clock)
+    queue.send("delayed", delay_seconds=10)
+    queue.send("now")
+
+    messages = queue.receive()
+    assert [m["body"] for m in messages] == ["now"]
+    assert queue.receive() == []
+
+    clock.now = 10
+    messages = queue.receive()
+    assert [(m["body"], m["receive_count"]) for m in messages] == [("delayed", 1)]
+    queue.delete(messages[0]["receipt_handle"])
+
+    clock.now = 31
+    messages = queue.receive()
+    assert [(m["body"], m["receive_count"]) for m in messages] == [("now", 2)]
+    assert len(queue) == 1
+
+
+def test_stale_receipt_handle(tmp_path):
+    """Test that the receipt handle of a previous receive neither deletes nor hides a message."""
+    clock = Clock()
+    queue = SqliteQueue(str(tmp_path / "queue.db"), visibility_timeout=30, clock=clock)
+    queue.send("message")
+    first = queue.receive()[0]
+    clock.now = 30
+    second = queue.receive()[0]
+
+    queue.delete(first["receipt_handle"])
+    queue.change_visibility(first["receipt_handle"], 0)
+    assert len(queue) == 1
+    assert queue.receive() == []
+    queue.delete(second["receipt_handle"])
+    assert len(queue) == 0
+
+
+def test_group_order(tmp_path):
+    """Test that the messages of a group are received in order and not while an earlier one is in flight."""
+    clock = Clock()
+    queue = SqliteQueue(str(tmp_path / "queue.db"), visibility_timeout=30, clock=clock)
+    for body in ["a1", "a2", "a3"]:
+        queue.send(body, group_id="a")
+    queue.send("b1", group_id="b")
+
+    first = queue.receive(max_messages=2)
+    assert [m["body"] for m in first] == ["a1", "a2"]
+    assert [m["body"] for m in queue.receive()] == ["b1"]
+
+    # a2 succeeded, a1 is retried later : a3 waits for a1
+    queue.delete(first[1]["receipt_handle"])
+    queue.change_visibility(first[0]["receipt_handle"], 0)
+    assert [m["body"] for m in queue.receive()] == ["a1", "a3"]
+
+
+def test_shared_file(tmp_path):
+    """Test that a message is received once by the queues of a same file."""
+    path = str(tmp_path / "queue.db")
+    sender, receiver = SqliteQueue(path), SqliteQueue(path)
+    sender.send("message")
+
+    assert [m["body"] for m in receiver.receive(wait_seconds=1)] == ["message"]
+    assert sender.receive() == []
@@ -0,0 +1,87 @@
+"""Unit test module for the registry.py module."""
+import pytest
+
+from src.registry import ClientRegistry, build_database, build_store
+from src.store.dynamodb import DynamoDbStore
+from src.utils.exceptions import MissingEnvironmentVariable
+
+
+def test_database_built_once():
+    """Test that the database backend is built on first use only."""
+    built = []
+    registry = ClientRegistry(lambda: built.append(1) or object())
+
+    assert registry.database() is registry.database()
+    assert len(built) == 1
+
+
+def test_strava_client_rotation(monkeypatch):
+    """Test that a Strava client is reused until its credentials rotate."""
+    monkeypatch.setenv("STRAVA_CLIENT_ID", "id")
+    monkeypatch.setenv("STRAVA_CLIENT_SECRET", "secret")
+    registry = ClientRegistry(object)
+    token = {"access_token": "a", "refresh_token": "r", "expires_at": "0"}
+
+    client = registry.strava_client("1", "a@b.c", token)
+
+    assert registry.strava_client("1", "a@b.c", dict(token)) is client
+    assert registry.strava_client("2", "a@b.c", token) is not client
+
+    rotated = {"access_token": "a2", "refresh_token": "r2", "expires_at": "1"}
+    new_client = registry.strava_client("1", "a@b.c", rotated)
+
+    assert new_client is not client
+    assert new_client.refresh_token == "r2"
+
+
+def test_notion_client_rotation():
+    """Test that a Notion client is replaced when its access token changes."""
+    registry = ClientRegistry(object)
+    client = registry.notion_client("bot", "token")
+
+    assert registry.notion_client("bot", "token") is client
+    assert registry.notion_client("bot", "token2") is not client
+
+
+def test_local_queues(monkeypatch, tmp_path):
+    """Test that the local queue backends use a single queue for events and debounced events."""
+    monkeypatch.setenv("QUEUE_BACKEND", "sqlite")
+    monkeypatch.setenv("QUEUE_SQLITE_PATH", str(tmp_path / "queue.db"))
+    registry = ClientRegistry(object)
+
+    assert registry.queue("events") is registry.queue("debounce")
+
+
+def test_airtable_debounce_requires_events_table(monkeypatch):
+    """Test that the Airtable backend does not start debouncing without the table of the activity events."""
+    for name in [
+        "AIRTABLE_PAT",
+        "AIRTABLE_BASE_ID",
+        "AIRTABLE_TABLE_STRAVA_ID",
+        "AIRTABLE_TABLE_REL_STRAVA_NOTION_ID",
+        "AIRTABLE_TABLE_NOTION",
+    ]:
+        monkeypatch.setenv(name, "id")
+    monkeypatch.setenv("UPDATE_DEBOUNCE_SECONDS", "60")
+    monkeypatch.delenv("AIRTABLE_TABLE_ACTIVITY_EVENTS", raising=False)
+
+    with pytest.raises(MissingEnvironmentVariable):
+        build_database()
+
+    monkeypatch.setenv("AIRTABLE_TABLE_ACTIVITY_EVENTS", "events")
+    assert build_database().get_notion_page("db", "1") is None
+
+
+def test_dynamodb_store(monkeypatch):
+    """Test that the DynamoDB store is selected with its table."""
+    monkeypatch.setenv("STORE_BACKEND", "dynamodb")
+    monkeypatch.delenv("STORE_DYNAMODB_TABLE", raising=False)
+
+    with pytest.raises(MissingEnvironmentVariable):
+        build_store()
+
+    monkeypatch.setenv("STORE_DYNAMODB_TABLE", "dev_strava-notion-store")
+    store = build_store()
+
+    assert isinstance(store, DynamoDbStore)
+    assert store.table_name == "dev_strava-notion-store"
@@ -0,0 +1,62 @@
+"""Unit test module for the implementations of the store package."""
+import time
+
+import pytest
+
+from src.store.dynamodb import DynamoDbStore
+from src.store.memory import MemoryStore
+from src.store.sqlite import SqliteStore
+
+
+class _FakeDynamoDb:
+    """DynamoDB client keeping the items of a table in memory, with the condition of DynamoDbStore.add."""
+
+    class exceptions:
+        class ConditionalCheckFailedException(Exception):
+            pass
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, TableName, Key, ConsistentRead):
+        item = self.items.get(Key["key"]["S"])
+        return {} if item is None else {"Item": item}
+
+    def put_item(self, TableName, Item, **condition):
+        current = self.items.get(Item["key"]["S"])
+        if condition and current is not None:
+            now = float(condition["ExpressionAttributeValues"][":now"]["N"])
+            if "expires_at" not in current or float(current["expires_at"]["N"]) > now:
+                raise self.exceptions.ConditionalCheckFailedException()
+        self.items[Item["key"]["S"]] = Item
+
+    def delete_item(self, TableName, Key):
+        self.items.pop(Key["key"]["S"], None)
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    if request.param == "dynamodb":
+        return DynamoDbStore("store", _FakeDynamoDb())
+    return SqliteStore(str(tmp_path / "store.db"))
+
+
+def test_store(store):
+    """Test that add only sets missing or expired keys."""
+    assert store.get("a") is None
+    assert store.add("a", "1", ttl=60)
+    assert not store.add("a", "2", ttl=60)
+    assert store.get("a") == "1"
+
+    store.set("b", "1", ttl=0.01)
+    time.sleep(0.02)
+
+    assert store.get("b") is None
+    assert store.add("b", "2")
+    assert store.get("b") == "2"
+
+    store.delete("a")
+
+    assert store.get("a") is None
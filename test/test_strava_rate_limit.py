@@ -0,0 +1,122 @@
+"""Unit test module for the rate_limit.py module of the strava package."""
+import pytest
+
+from src.strava.rate_limit import (
+    Priority,
+    StravaRateLimit,
+    parse_rate_limit_header,
+    request_scope,
+)
+from src.utils.deadline import deadline_scope
+from src.utils.exceptions import RateLimitExceeded, WorkDeferred
+
+
+class _Clock:
+    """Fake clock advanced by the fake sleep."""
+
+    def __init__(self, now):
+        self.now = now
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+def test_parse_rate_limit_header():
+    """Test the parsing of the values of both windows."""
+    assert parse_rate_limit_header("200,2000") == (200, 2000)
+    assert parse_rate_limit_header(None) is None
+    assert parse_rate_limit_header("200") is None
+
+
+def test_reserve():
+    """Test that requests are throttled when the short window is almost exhausted, then stopped."""
+    clock = _Clock(900 * 1000)
+    rate_limit = StravaRateLimit(clock=clock, sleep=clock.sleep)
+    rate_limit.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "50,50"})
+
+    assert rate_limit.reserve() == 0
+
+    rate_limit.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "90,90"})
+
+    assert rate_limit.reserve() == pytest.approx(900 / 10)
+
+    rate_limit.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "100,100"})
+
+    with pytest.raises(RateLimitExceeded):
+        rate_limit.reserve()
+
+    # usage of the short window is reset at the next quarter hour
+    clock.now = 900 * 1002
+
+    assert rate_limit.reserve() == 0
+
+
+def test_reserve_concurrent():
+    """Test that concurrent throttled requests take successive slots instead of waking up together."""
+    clock = _Clock(900 * 1000)
+    waits = []
+    rate_limit = StravaRateLimit(clock=clock, sleep=waits.append)
+    rate_limit.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "90,90"})
+
+    # the clock does not move : the callers reserve at the same time
+    for _ in range(3):
+        rate_limit.reserve()
+
+    assert waits == pytest.approx(
+        [900 / 10, 900 / 10 + 900 / 9, 900 / 10 + 900 / 9 + 900 / 8]
+    )
+
+
+def test_reserve_deadline():
+    """Test that a wait outlasting the deadline is deferred to a retry instead of slept."""
+    clock = _Clock(900 * 1000)
+    rate_limit = StravaRateLimit(clock=clock, sleep=clock.sleep)
+    rate_limit.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "90,90"})
+
+    with deadline_scope(30):
+        with pytest.raises(RateLimitExceeded) as e:
+            rate_limit.reserve()
+
+    assert e.value.retry_after == pytest.approx(900 / 10)
+    assert clock.slept == 0
+    assert rate_limit.usage[0] == 90
+
+
+def test_reserve_background():
+    """Test that background requests are deferred once over their share, realtime requests are not."""
+    clock = _Clock(900 * 1000)
+    rate_limit = StravaRateLimit(clock=clock, sleep=clock.sleep)
+    rate_limit.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "60,60"})
+
+    with request_scope("1", Priority.BACKGROUND), pytest.raises(WorkDeferred) as e:
+        rate_limit.reserve()
+
+    assert e.value.retry_after == pytest.approx(900)
+    with request_scope("1"):
+        assert rate_limit.reserve() == 0
+
+
+def test_reserve_athlete_share():
+    """Test that an athlete cannot use more than their share of the short window."""
+    clock = _Clock(900 * 1000)
+    rate_limit = StravaRateLimit(
+        limits=(100, 1000), athlete_share=0.1, clock=clock, sleep=clock.sleep
+    )
+
+    with request_scope("1"):
+        for _ in range(10):
+            rate_limit.reserve()
+        with pytest.raises(WorkDeferred):
+            rate_limit.reserve()
+    with request_scope("2"):
+        assert rate_limit.reserve() == 0
+
+    # the shares are reset with the short window
+    clock.now = 900 * 1001
+    with request_scope("1"):
+        assert rate_limit.reserve() == 0
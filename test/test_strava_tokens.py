@@ -0,0 +1,76 @@
+"""Unit test module for the tokens.py module of the strava package."""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from src.database.sqlite import SqliteDatabase
+from src.strava.tokens import TokenManager
+
+
+class _Client:
+    """Fake Strava client counting the refreshes."""
+
+    def __init__(self, expires_at):
+        self.access_token = "access"
+        self.refresh_token = "refresh"
+        self.expires_at = expires_at
+        self.refreshes = 0
+
+    def expires_within(self, seconds, ref=None):
+        return datetime.fromtimestamp(self.expires_at) <= datetime.now() + timedelta(
+            seconds=seconds
+        )
+
+    def refresh_access_token(self, ref=None, margin=10):
+        if not self.expires_within(margin):
+            return None
+        time.sleep(0.05)
+        self.refreshes += 1
+        self.access_token = f"access-{self.refreshes}"
+        self.refresh_token = f"refresh-{self.refreshes}"
+        self.expires_at = int(time.time()) + 6 * 3600
+        return {
+            "access_token": self.access_token,
+            "refresh_token": self.refresh_token,
+            "expires_at": self.expires_at,
+        }
+
+
+def test_single_flight_refresh(tmp_path):
+    """Test that concurrent callers and another process reuse a single refresh."""
+    database = SqliteDatabase(str(tmp_path / "test.db"))
+    expires_at = int(time.time()) + 60
+    database.add_or_update_strava(
+        {
+            "access_token": "access",
+            "refresh_token": "refresh",
+            "expires_at": str(expires_at),
+            "athlete": "111",
+        },
+        "a@b.c",
+        {"username": "", "firstname": "John", "lastname": "Doe"},
+    )
+    client = _Client(expires_at)
+    manager = TokenManager()
+    threads = [
+        threading.Thread(
+            target=manager.refresh, args=(database, "111", "a@b.c", client)
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert client.refreshes == 1
+    assert database.get_strava_credentials("111", "a@b.c")["access_token"] == (
+        "access-1"
+    )
+
+    # a client of another process, still holding the previous token
+    other_client = _Client(expires_at)
+    TokenManager().refresh(database, "111", "a@b.c", other_client)
+
+    assert other_client.refreshes == 0
+    assert other_client.refresh_token == "refresh-1"
@@ -0,0 +1,35 @@
+"""Unit test module for the deadline.py module."""
+import time
+
+import pytest
+
+from src.utils.deadline import cap_timeout, deadline_scope, remaining
+from src.utils.exceptions import DeadlineExceeded
+from src.utils.executor import KeyedExecutor
+
+
+def test_cap_timeout():
+    """Test that timeouts are capped to the time left and that nested scopes keep the sooner deadline."""
+    assert cap_timeout((3.05, 20)) == (3.05, 20)
+    with deadline_scope(1):
+        connect, read = cap_timeout((3.05, 20))
+        assert read <= 1 and connect <= 1
+        with deadline_scope(10):
+            assert remaining() <= 1
+        with deadline_scope(0):
+            with pytest.raises(DeadlineExceeded):
+                cap_timeout(5)
+    assert remaining() is None
+
+
+def test_executor_deadline():
+    """Test that tasks see the deadline and that unfinished tasks fail with DeadlineExceeded."""
+    with deadline_scope(0.2):
+        outcomes = KeyedExecutor(2).run(
+            [("a", remaining), ("b", lambda: time.sleep(1)), ("b", lambda: 1)],
+            timeout=remaining(),
+        )
+
+    assert 0 < outcomes[0]["result"] <= 0.2
+    assert isinstance(outcomes[1]["exception"], DeadlineExceeded)
+    assert isinstance(outcomes[2]["exception"], DeadlineExceeded)
@@ -0,0 +1,19 @@
+"""Unit test module for the event_loop.py module."""
+import asyncio
+import threading
+
+from src.utils.event_loop import reserve_threads, run_coroutine
+
+
+def test_reserve_threads():
+    """Test that the blocking calls of coroutines run on as many threads as reserved."""
+    reserve_threads(40)
+    barrier = threading.Barrier(40, timeout=5)
+
+    async def wait_all() -> list:
+        # each call blocks until the 40 calls run at once
+        return await asyncio.gather(
+            *(asyncio.to_thread(barrier.wait) for _ in range(40))
+        )
+
+    assert sorted(run_coroutine(wait_all())) == list(range(40))
@@ -0,0 +1,52 @@
+"""Unit test module for the executor.py module."""
+import threading
+import time
+
+from src.utils.exceptions import PrecedingTaskFailed
+from src.utils.executor import KeyedExecutor
+
+
+def test_keyed_executor_order():
+    """Test that tasks of a same key run in submission order."""
+    executed = []
+    lock = threading.Lock()
+
+    def task(key, i):
+        def _run():
+            time.sleep(0.01 * (3 - i))
+            with lock:
+                executed.append((key, i))
+            return i
+
+        return _run
+
+    tasks = [(k, task(k, i)) for i in range(3) for k in ("a", "b")]
+    outcomes = KeyedExecutor(max_workers=2).run(tasks)
+
+    assert [o["result"] for o in outcomes] == [0, 0, 1, 1, 2, 2]
+    for key in ("a", "b"):
+        assert [i for k, i in executed if k == key] == [0, 1, 2]
+
+
+def test_keyed_executor_concurrency():
+    """Test that tasks of different keys run concurrently."""
+    tasks = [(k, lambda: time.sleep(0.2)) for k in range(5)]
+
+    t0 = time.perf_counter()
+    KeyedExecutor(max_workers=5).run(tasks)
+
+    assert time.perf_counter() - t0 < 0.5
+
+
+def test_keyed_executor_failure():
+    """Test that a failure stops the following tasks of the same key only."""
+
+    def fail():
+        raise RuntimeError("fail")
+
+    tasks = [("a", fail), ("b", lambda: 1), ("a", lambda: 2)]
+    outcomes = KeyedExecutor().run(tasks)
+
+    assert isinstance(outcomes[0]["exception"], RuntimeError)
+    assert outcomes[1] == {"result": 1, "exception": None}
+    assert isinstance(outcomes[2]["exception"], PrecedingTaskFailed)
@@ -0,0 +1,50 @@
+"""Unit test module for the pagination.py module."""
+import pytest
+
+from src.utils.event_loop import run_coroutine
+from src.utils.pagination import apaginate, paginate
+
+
+def _pages(fetched: list):
+    pages = {None: ([1, 2], "a"), "a": ([3, 4], "b"), "b": ([5], None)}
+
+    def fetch_page(cursor):
+        fetched.append(cursor)
+        return pages[cursor]
+
+    return fetch_page
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_paginate(prefetch):
+    """Test that all items of all pages are yielded in order."""
+    fetched = []
+
+    assert list(paginate(_pages(fetched), prefetch)) == [1, 2, 3, 4, 5]
+    assert fetched == [None, "a", "b"]
+
+
+def test_paginate_lazy():
+    """Test that pages are only fetched when consumed."""
+    fetched = []
+    items = paginate(_pages(fetched))
+
+    assert next(items) == 1
+    assert fetched == [None]
+    items.close()
+    assert fetched == [None]
+
+
+def test_apaginate():
+    """Test that all items of all pages are yielded in order by the asyncio version."""
+    fetched = []
+    fetch_page = _pages(fetched)
+
+    async def afetch_page(cursor):
+        return fetch_page(cursor)
+
+    async def collect():
+        return [item async for item in apaginate(afetch_page)]
+
+    assert run_coroutine(collect()) == [1, 2, 3, 4, 5]
+    assert fetched == [None, "a", "b"]
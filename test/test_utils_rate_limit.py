@@ -0,0 +1,70 @@
+"""Unit test module for the rate_limit.py module."""
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.notion.client import Client
+from src.utils.deadline import deadline_scope
+from src.utils.exceptions import DeadlineExceeded
+from src.utils.rate_limit import KeyedRateLimiter, TokenBucket
+
+
+class _Clock:
+    """Fake clock advanced by the fake sleep."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket():
+    """Test that a burst is served at the rate of the bucket and that a pause holds callers."""
+    clock = _Clock()
+    bucket = TokenBucket(rate=3, capacity=3, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(6)]
+
+    assert waits[:3] == [0, 0, 0]
+    assert all(wait > 0 for wait in waits[3:])
+    assert abs(clock.now - 1) < 1e-9
+
+    bucket.pause(2)
+    bucket.acquire()
+
+    assert abs(clock.now - 3 - 1 / 3) < 1e-9
+
+
+def test_token_bucket_deadline():
+    """Test that a caller does not wait past its deadline nor consume the token it would wait for."""
+    clock = _Clock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.pause(60)
+
+    with deadline_scope(30), pytest.raises(DeadlineExceeded):
+        bucket.acquire()
+
+    assert clock.now == 0
+    assert abs(bucket.acquire() - 61) < 1e-9
+
+
+def test_notion_client_retry_after():
+    """Test that a request answered with status 429 is retried after Retry-After."""
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "0"})
+    ok = MagicMock(status_code=200, content=b'{"id": "page"}')
+    transport = MagicMock()
+    transport.request.side_effect = [throttled, ok]
+    client = Client(
+        "secret",
+        transport=transport,
+        bot_id="bot",
+        rate_limiter=KeyedRateLimiter(100, 1),
+    )
+
+    assert client.update_page_properties("page", {}) == {"id": "page"}
+    assert transport.request.call_count == 2
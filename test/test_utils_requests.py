@@ -1,5 +1,5 @@
 """Unit test for module requests of package utils."""
-from src.utils.requests import encode_url_params
+from src.utils.requests import encode_url_params, params_dict_to_str
 
 
 def test_encode_url_params():
@@ -20,3 +20,20 @@ def test_encode_url_params():
     encode_url_params(_params)
 
     assert _params == expected
+
+
+def test_params_dict_to_str():
+    _params = {
+        "filterByFormula": "athlete_id%3D'111'",
+        "fields": ["user_email", "access+token"],
+        "sort": [{"field": "athlete_id", "direction": "asc"}],
+    }
+
+    expected = (
+        "filterByFormula=athlete_id%3D'111'"
+        "&fields[]=user_email&fields[]=access+token"
+        "&sort[0][field]=athlete_id&sort[0][direction]=asc"
+    )
+
+    assert params_dict_to_str(_params) == expected
+    assert params_dict_to_str(None) == ""
@@ -0,0 +1,46 @@
+"""Unit test module for the transport.py module."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.transport import Transport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handler answering an empty JSON object with keep-alive."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """Answer GET requests."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        """Silence logs."""
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_transport_reuses_connections(server_url):
+    """Test that consecutive requests to a same host reuse a single connection."""
+    transport = Transport()
+    for _ in range(5):
+        assert transport.get(server_url).status_code == 200
+
+    stats = transport.stats()["127.0.0.1"]
+
+    assert stats == {"requests": 5, "connections": 1, "reused": 4}
+    transport.close()
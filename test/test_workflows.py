@@ -0,0 +1,32 @@
+"""Unit test module for the workflows.py module."""
+from src.workflows import (
+    strava_activity_to_notion_properties,
+    strava_updates_to_notion_properties,
+)
+
+
+def test_strava_updates_to_notion_properties():
+    """Test that event updates build the same properties as a fetched activity."""
+    activity = {
+        "name": "Evening Ride",
+        "description": "",
+        "sport_type": "Ride",
+        "calories": 0,
+        "start_date": "2024-01-01T00:00:00Z",
+        "id": 42,
+        "average_speed": 0,
+        "max_speed": 0,
+        "total_elevation_gain": 0,
+        "external_id": "",
+        "upload_id": 1,
+        "moving_time": 0,
+        "distance": 0,
+        "username": "",
+    }
+    properties = strava_activity_to_notion_properties(activity)
+
+    assert strava_updates_to_notion_properties(
+        {"title": "Evening Ride", "type": "Ride", "private": "true"}
+    ) == {"Name": properties["Name"], "Type": properties["Type"]}
+    assert strava_updates_to_notion_properties({"private": "false"}) == {}
+    assert strava_updates_to_notion_properties({"gear_id": "b1"}) is None